@@ -0,0 +1,319 @@
+"""
+Генератор синтетичних даних для навантажувального тестування.
+
+Категорії, бренди, товари, користувачі, замовлення і позиції з реалістичними
+розподілами: популярність товарів і активність покупців - степеневий закон
+(Zipf), дати замовлень - сезонність по місяцях, днях тижня і годинах,
+замовлення з кількома позиціями. Суми замовлень рахуються з позицій, тому
+reconcile_order_totals після генерації розбіжностей не знаходить.
+
+Рядки пишуться пачками через executemany в кількох великих транзакціях,
+в обхід ORM. Результат детермінований для однакових --seed і параметрів.
+Дописує дані в існуючу БД (id продовжуються після наявних).
+
+    python -m app.core.commands.generate_data --products 100000 --users 200000 --orders 1000000
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Iterable, Iterator
+
+from sqlalchemy import Table, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.models import BaseModel, Brand, Category, Order, OrderItem, Product, User
+from app.core.models.mixins import next_version
+from app.core.models.search import PRODUCTS_FTS_DDL, PRODUCTS_FTS_REBUILD
+from app.core.settings.db import db
+
+# Сезонність: множник для місяця (листопад-грудень - розпродажі і свята) і дня тижня (пн=0)
+MONTH_WEIGHTS = [0.8, 0.7, 0.9, 1.0, 1.0, 0.9, 0.85, 0.9, 1.05, 1.1, 1.6, 1.9]
+WEEKDAY_WEIGHTS = [0.9, 0.95, 1.0, 1.0, 1.1, 1.3, 1.25]
+HOUR_WEIGHTS = [0.2, 0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.6, 0.9, 1.0, 1.1, 1.2,
+                1.3, 1.2, 1.1, 1.1, 1.2, 1.4, 1.7, 1.9, 2.0, 1.8, 1.2, 0.6]
+
+# Кількість позицій в замовленні: переважно 1-2, зрідка більше
+LINE_WEIGHT_DECAY = 1.8
+QUANTITIES, QUANTITY_WEIGHTS = [1, 2, 3, 4], [0.8, 0.13, 0.05, 0.02]
+
+STATUSES_BY_AGE = [(7, "new"), (14, "paid"), (30, "shipped")]  # молодші за N днів; решта - delivered
+NOUNS = ["Кросівки", "Кеди", "Футболка", "Худі", "Куртка", "Шорти", "Штани", "Рюкзак", "Кепка", "Шкарпетки"]
+ADJECTIVES = ["Run", "Classic", "Pro", "Lite", "Street", "Trail", "Court", "Boost", "Retro", "Flex"]
+FIRST_NAMES = ["Олена", "Андрій", "Марія", "Іван", "Софія", "Дмитро", "Анна", "Максим", "Юлія", "Олег"]
+LAST_NAMES = ["Коваль", "Шевченко", "Бондар", "Ткаченко", "Мельник", "Кравець", "Лисенко", "Олійник"]
+CITIES = ["Київ", "Львів", "Одеса", "Харків", "Дніпро", "Запоріжжя", "Вінниця", "Полтава"]
+
+
+@dataclass
+class GenerateConfig:
+    categories: int = 30
+    brands: int = 200
+    products: int = 10_000
+    users: int = 20_000
+    orders: int = 100_000
+    max_lines: int = 6
+    start: date = date(2023, 1, 1)
+    days: int = 730
+    # Показник степеневого закону: більше - сильніша концентрація на топових товарах
+    popularity_alpha: float = 1.1
+    seed: int = 42
+    batch_size: int = 50_000
+
+
+@dataclass
+class GenerateReport:
+    rows: dict[str, int] = field(default_factory=dict)
+    # Час по фазах; фаза "orders" пише і order_items
+    seconds: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        return sum(self.rows.values()) / max(sum(self.seconds.values()), 1e-9)
+
+
+def zipf_cum_weights(n: int, alpha: float) -> list[float]:
+    """Накопичені ваги Zipf для random.choices: ранг k має вагу 1 / k^alpha."""
+    return list(itertools.accumulate(1 / (rank ** alpha) for rank in range(1, n + 1)))
+
+
+def batched(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def insert_sql(table: Table, columns: list[str]) -> str:
+    return f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+class Generator:
+    def __init__(self, config: GenerateConfig, offsets: dict[str, int]):
+        self.config = config
+        self.offsets = offsets
+        self.rnd = random.Random(config.seed)
+        self.version = next_version()
+        self.product_prices: list[float] = []
+
+    def ids(self, table: str, count: int) -> range:
+        start = self.offsets[table] + 1
+        return range(start, start + count)
+
+    def categories(self) -> Iterator[tuple]:
+        for i in self.ids("categories", self.config.categories):
+            yield i, f"Category {i}", self.version
+
+    def brands(self) -> Iterator[tuple]:
+        for i in self.ids("brands", self.config.brands):
+            yield i, f"Brand {i}", f"Brand {i} sportswear", self.version
+
+    def products(self) -> Iterator[tuple]:
+        rnd, config = self.rnd, self.config
+        ids = self.ids("products", config.products)
+        nouns = rnd.choices(NOUNS, k=len(ids))
+        adjectives = rnd.choices(ADJECTIVES, k=len(ids))
+        category_ids = rnd.choices(self.ids("categories", config.categories), k=len(ids))
+        # Кілька великих брендів і довгий хвіст
+        brand_ids = rnd.choices(self.ids("brands", config.brands),
+                                cum_weights=zipf_cum_weights(config.brands, 0.8), k=len(ids))
+        # Логнормальна ціна, медіана ~1200, обрізана в розумні межі
+        self.product_prices = [
+            round(min(max(rnd.lognormvariate(math.log(1200), 0.6), 150), 15000), 2) for _ in ids
+        ]
+        for i, noun, adjective, price, category_id, brand_id in zip(
+                ids, nouns, adjectives, self.product_prices, category_ids, brand_ids):
+            yield (i, f"{noun} {adjective} {i}", f"{noun} для спорту і міста", price,
+                   rnd.random() < 0.85, category_id, brand_id, self.version)
+
+    def users(self) -> Iterator[tuple]:
+        rnd = self.rnd
+        ids = self.ids("users", self.config.users)
+        first_names = rnd.choices(FIRST_NAMES, k=len(ids))
+        last_names = rnd.choices(LAST_NAMES, k=len(ids))
+        for i, first_name, last_name in zip(ids, first_names, last_names):
+            yield (i, f"user{i}@example.com", "!", first_name, last_name,
+                   f"+380{rnd.randrange(10 ** 9):09d}", self.version)
+
+    def order_slots(self) -> tuple[list[str], list[str], list[float]]:
+        """
+        Години періоду (мітка "YYYY-MM-DD HH", статус за віком) з накопиченими
+        вагами: сезонність по місяцях, день тижня, година доби і помірне зростання.
+        """
+        config = self.config
+        today = config.start + timedelta(days=config.days)
+        labels, statuses, weights = [], [], []
+        for n in range(config.days):
+            day = config.start + timedelta(days=n)
+            day_weight = MONTH_WEIGHTS[day.month - 1] * WEEKDAY_WEIGHTS[day.weekday()] * (1 + n / config.days)
+            status = next((name for age, name in STATUSES_BY_AGE if (today - day).days < age), "delivered")
+            for hour, hour_weight in enumerate(HOUR_WEIGHTS):
+                labels.append(f"{day.isoformat()} {hour:02d}")
+                statuses.append(status)
+                weights.append(day_weight * hour_weight)
+        return labels, statuses, list(itertools.accumulate(weights))
+
+    def order_batches(self, size: int) -> Iterator[tuple[list[tuple], list[tuple]]]:
+        """
+        Пачки (замовлення, позиції); сума замовлення - з його позицій.
+        Випадкові величини тягнемо векторно (choices з k=) на всю пачку.
+        """
+        rnd, config, version = self.rnd, self.config, self.version
+        user_ids = self.ids("users", config.users)
+        user_cum = zipf_cum_weights(len(user_ids), 0.6)
+        product_ids = list(self.ids("products", config.products))
+        # Ранги популярності роздаємо товарам випадково, щоб топ не збігався з першими id
+        rnd.shuffle(product_ids)
+        product_cum = zipf_cum_weights(len(product_ids), config.popularity_alpha)
+        product_first = self.offsets["products"] + 1
+        prices = self.product_prices
+        line_counts = list(range(1, config.max_lines + 1))
+        line_cum = list(itertools.accumulate(1 / (k ** LINE_WEIGHT_DECAY) for k in line_counts))
+        addresses = [f"{city}, відділення {n}" for city in CITIES for n in range(1, 301)]
+        slot_labels, slot_statuses, slot_cum = self.order_slots()
+        slots = range(len(slot_labels))
+        minutes = [f":{second // 60:02d}:{second % 60:02d}.000000" for second in range(3600)]
+
+        order_ids = self.ids("orders", config.orders)
+        item_id = self.offsets["order_items"]
+        for offset in range(0, len(order_ids), size):
+            batch_ids = order_ids[offset:offset + size]
+            count = len(batch_ids)
+            picked_slots = rnd.choices(slots, cum_weights=slot_cum, k=count)
+            picked_minutes = rnd.choices(minutes, k=count)
+            lines = rnd.choices(line_counts, cum_weights=line_cum, k=count)
+            buyers = rnd.choices(user_ids, cum_weights=user_cum, k=count)
+            picks = rnd.choices(product_ids, cum_weights=product_cum, k=sum(lines))
+            quantities = rnd.choices(QUANTITIES, QUANTITY_WEIGHTS, k=len(picks))
+            shipping = rnd.choices(addresses, k=count)
+
+            orders, items, position = [], [], 0
+            for order_id, slot, minute, line_count, user_id, address in zip(
+                    batch_ids, picked_slots, picked_minutes, lines, buyers, shipping):
+                total = 0.0
+                lines_end = position + line_count
+                # Один товар - одна позиція в замовленні (повтори зливаємо)
+                lines_picked = dict(zip(picks[position:lines_end], quantities[position:lines_end]))
+                for product_id, quantity in lines_picked.items():
+                    item_id += 1
+                    price = prices[product_id - product_first]
+                    total += quantity * price
+                    items.append((item_id, order_id, product_id, quantity, price))
+                position = lines_end
+                orders.append((order_id, user_id, slot_labels[slot] + minute, slot_statuses[slot], round(total, 2),
+                               address, version))
+            yield orders, items
+
+
+async def current_offsets(conn: AsyncConnection) -> dict[str, int]:
+    offsets = {}
+    for model in (Category, Brand, Product, User, Order, OrderItem):
+        offsets[model.__tablename__] = (await conn.execute(select(func.coalesce(func.max(model.id), 0)))).scalar()
+    return offsets
+
+
+async def bulk_load_pragmas(conn: AsyncConnection) -> None:
+    """Налаштування з'єднання на час генерації: швидкість важливіша за fsync кожної транзакції."""
+    await conn.exec_driver_sql("PRAGMA synchronous = OFF")
+    # Кеш сторінок ~256 МБ: індекси великих таблиць оновлюються в пам'яті
+    await conn.exec_driver_sql("PRAGMA cache_size = -262144")
+
+
+async def insert_batches(conn: AsyncConnection, table: Table, columns: list[str], rows: Iterable[tuple],
+                         batch_size: int) -> int:
+    sql, count = insert_sql(table, columns), 0
+    for batch in batched(rows, batch_size):
+        await conn.exec_driver_sql(sql, batch)
+        count += len(batch)
+    return count
+
+
+async def insert_products(conn: AsyncConnection, columns: list[str], rows: Iterable[tuple], offset: int,
+                          batch_size: int) -> int:
+    """
+    Товари без тригера повнотекстового індексу (він робить підзапити на кожен
+    рядок), а потім нові товари індексуються одним INSERT ... SELECT.
+    """
+    insert_trigger = next(ddl for ddl in PRODUCTS_FTS_DDL if "products_fts_insert" in ddl)
+    await conn.exec_driver_sql("DROP TRIGGER IF EXISTS products_fts_insert")
+    count = await insert_batches(conn, BaseModel.metadata.tables["products"], columns, rows, batch_size)
+    await conn.exec_driver_sql(f"{PRODUCTS_FTS_REBUILD} WHERE p.id > {int(offset)}")
+    await conn.exec_driver_sql(insert_trigger)
+    return count
+
+
+async def generate_data(engine: AsyncEngine, config: GenerateConfig) -> GenerateReport:
+    """Генерує і вставляє всі таблиці; кожна фаза - одна транзакція."""
+    if engine.dialect.name != "sqlite":
+        raise ValueError("generate_data writes with SQLite placeholders; use a SQLite database.")
+
+    report = GenerateReport()
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+        generator = Generator(config, await current_offsets(conn))
+
+    tables = BaseModel.metadata.tables
+    phases = [
+        ("categories", ["id", "name", "version"], generator.categories),
+        ("brands", ["id", "name", "description", "version"], generator.brands),
+        ("products", ["id", "name", "description", "price", "in_stock", "category_id", "brand_id", "version"],
+         generator.products),
+        ("users", ["id", "email", "password", "first_name", "last_name", "phone_number", "version"],
+         generator.users),
+    ]
+    for name, columns, rows in phases:
+        started = time.perf_counter()
+        async with engine.begin() as conn:
+            await bulk_load_pragmas(conn)
+            if name == "products":
+                report.rows[name] = await insert_products(conn, columns, rows(), generator.offsets[name],
+                                                          config.batch_size)
+            else:
+                report.rows[name] = await insert_batches(conn, tables[name], columns, rows(), config.batch_size)
+        report.seconds[name] = time.perf_counter() - started
+
+    # Замовлення і позиції - однією транзакцією, щоб суми завжди відповідали позиціям
+    started = time.perf_counter()
+    order_sql = insert_sql(tables["orders"], ["id", "user_id", "order_date", "status", "total_amount",
+                                              "shipping_address", "version"])
+    item_sql = insert_sql(tables["order_items"], ["id", "order_id", "product_id", "quantity", "unit_price"])
+    orders_count = items_count = 0
+    async with engine.begin() as conn:
+        await bulk_load_pragmas(conn)
+        for orders, items in generator.order_batches(config.batch_size):
+            await conn.exec_driver_sql(order_sql, orders)
+            await conn.exec_driver_sql(item_sql, items)
+            orders_count += len(orders)
+            items_count += len(items)
+    report.rows.update(orders=orders_count, order_items=items_count)
+    report.seconds["orders"] = time.perf_counter() - started
+    return report
+
+
+async def main(config: GenerateConfig) -> None:
+    await db.connect()
+    try:
+        report = await generate_data(db.engine, config)
+    finally:
+        await db.disconnect()
+
+    for name, seconds in report.seconds.items():
+        rows = report.rows[name] + (report.rows["order_items"] if name == "orders" else 0)
+        label = "orders+items" if name == "orders" else name
+        print(f"{label:<12} {rows:>10} rows  {seconds:7.2f}s  {rows / max(seconds, 1e-9):>10.0f} rows/s")
+    print(f"total        {sum(report.rows.values()):>10} rows  {sum(report.seconds.values()):7.2f}s  "
+          f"{report.rows_per_second:>10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-generate a synthetic catalog and order history.")
+    defaults = GenerateConfig()
+    for name in ("categories", "brands", "products", "users", "orders", "max_lines", "days", "seed", "batch_size"):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=getattr(defaults, name))
+    parser.add_argument("--start", type=date.fromisoformat, default=defaults.start, help="YYYY-MM-DD")
+    parser.add_argument("--popularity-alpha", type=float, default=defaults.popularity_alpha)
+    args = parser.parse_args()
+    asyncio.run(main(GenerateConfig(**vars(args))))
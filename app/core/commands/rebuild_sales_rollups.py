@@ -0,0 +1,87 @@
+"""
+Перерахунок зведених продажів (sales_rollups) з позицій замовлень.
+
+Записи позицій оновлюють зведення інкрементально, ця команда - початкове
+наповнення (після generate_data чи імпорту) і страховка від розбіжностей.
+Дні обробляються пачками по --days-per-chunk, кожна пачка - окрема
+транзакція, тож паралельні записи позицій чекають лише на одну пачку.
+
+    python -m app.core.commands.rebuild_sales_rollups --days-per-chunk 7 [--since 2024-01-01] [--until 2024-12-31]
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.models import Order, SalesRollup
+from app.core.models.sales import rebuild_sales_rollups
+from app.core.settings.db import db
+
+
+@dataclass
+class RebuildReport:
+    date_from: Optional[date] = None
+    # Включно
+    date_to: Optional[date] = None
+    chunks: int = 0
+    rows: int = 0
+
+
+async def rebuild_sales(
+        session_maker: async_sessionmaker[AsyncSession],
+        days_per_chunk: int = 7,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+) -> RebuildReport:
+    """
+    Перераховує дні [since, until] пачками; без меж - від першого до останнього
+    замовлення, і тоді зведення поза цим діапазоном (видалені замовлення) теж прибираються.
+    """
+    async with session_maker() as session:
+        first, last = (await session.execute(select(func.min(Order.order_date), func.max(Order.order_date)))).one()
+    report = RebuildReport(
+        date_from=since or (first.date() if first else None),
+        date_to=until or (last.date() if last else None),
+    )
+
+    if since is None and until is None:
+        stale = true() if first is None else (SalesRollup.day < report.date_from) | (SalesRollup.day > report.date_to)
+        async with session_maker() as session, session.begin():
+            await session.execute(delete(SalesRollup).where(stale))
+    if report.date_from is None or report.date_to is None:
+        return report
+
+    start = report.date_from
+    while start <= report.date_to:
+        end = min(start + timedelta(days=days_per_chunk), report.date_to + timedelta(days=1))
+        async with session_maker() as session, session.begin():
+            report.rows += await rebuild_sales_rollups(session, start, end)
+        report.chunks += 1
+        start = end
+    return report
+
+
+async def main(days_per_chunk: int, since: Optional[date], until: Optional[date]) -> None:
+    await db.connect()
+    try:
+        report = await rebuild_sales(db.session_maker, days_per_chunk=days_per_chunk, since=since, until=until)
+    finally:
+        await db.disconnect()
+
+    if report.date_from is None:
+        print("no orders, sales rollups cleared")
+        return
+    print(f"rebuilt {report.date_from}..{report.date_to} in {report.chunks} chunks, {report.rows} rollup rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild sales_rollups from order_items.")
+    parser.add_argument("--days-per-chunk", type=int, default=7)
+    parser.add_argument("--since", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="last day (inclusive), YYYY-MM-DD")
+    args = parser.parse_args()
+    asyncio.run(main(args.days_per_chunk, args.since, args.until))
@@ -0,0 +1,105 @@
+"""
+Звірка orders.total_amount з фактичною сумою позицій замовлення.
+
+total_amount підтримується інкрементально при кожному записі в order_items,
+ця команда - страховка: перераховує суми пачками по id, показує розбіжності
+та (без --dry-run) виправляє їх.
+
+    python -m app.core.commands.reconcile_order_totals --chunk-size 1000 [--dry-run]
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.models import Order, OrderItem
+from app.core.settings.db import db
+
+# Все, що менше копійки - похибка округлення, а не розбіжність
+TOLERANCE = 0.005
+
+
+@dataclass
+class Drift:
+    order_id: int
+    stored: float
+    actual: float
+
+
+@dataclass
+class ReconcileReport:
+    checked: int = 0
+    drifts: list[Drift] = field(default_factory=list)
+    fixed: bool = False
+
+    @property
+    def total_drift(self) -> float:
+        return round(sum(d.stored - d.actual for d in self.drifts), 2)
+
+
+async def reconcile_order_totals(
+        session_maker: async_sessionmaker[AsyncSession],
+        chunk_size: int = 1000,
+        dry_run: bool = False,
+) -> ReconcileReport:
+    """Перераховує суми замовлень пачками по `chunk_size`; кожна пачка - окрема транзакція."""
+    items_total = (
+        select(func.coalesce(func.sum(OrderItem.quantity * OrderItem.unit_price), 0))
+        .where(OrderItem.order_id == Order.id)
+        .scalar_subquery()
+    )
+    report = ReconcileReport(fixed=not dry_run)
+    last_id = 0
+
+    while True:
+        async with session_maker() as session, session.begin():
+            query = (
+                select(Order.id, Order.total_amount, items_total)
+                .where(Order.id > last_id)
+                .order_by(Order.id)
+                .limit(chunk_size)
+            )
+            rows = (await session.execute(query)).all()
+            if not rows:
+                break
+
+            chunk_drifts = [
+                Drift(order_id=order_id, stored=float(stored), actual=round(float(actual), 2))
+                for order_id, stored, actual in rows
+                if abs(float(stored) - float(actual)) >= TOLERANCE
+            ]
+            if chunk_drifts and not dry_run:
+                await session.execute(
+                    update(Order),
+                    [{"id": d.order_id, "total_amount": d.actual} for d in chunk_drifts],
+                )
+
+            report.checked += len(rows)
+            report.drifts.extend(chunk_drifts)
+            last_id = rows[-1][0]
+
+    return report
+
+
+async def main(chunk_size: int, dry_run: bool) -> None:
+    await db.connect()
+    try:
+        report = await reconcile_order_totals(db.session_maker, chunk_size=chunk_size, dry_run=dry_run)
+    finally:
+        await db.disconnect()
+
+    for drift in report.drifts:
+        print(f"order {drift.order_id}: stored={drift.stored:.2f} actual={drift.actual:.2f}")
+    action = "fixed" if report.fixed else "found (dry run)"
+    print(f"checked {report.checked} orders, {len(report.drifts)} drifted {action}, "
+          f"total drift {report.total_drift:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile orders.total_amount with order_items.")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only report drift, do not fix it")
+    args = parser.parse_args()
+    asyncio.run(main(args.chunk_size, args.dry_run))
@@ -4,4 +4,6 @@ from .brand import Brand
 from .product import Product
 from .user import User
 from .order import Order
-from .order_item import OrderItem
\ No newline at end of file
+from .order_item import OrderItem
+from .sales import SalesRollup
+from .search import products_fts
\ No newline at end of file
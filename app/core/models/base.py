@@ -1,5 +1,17 @@
+from sqlalchemy import event
 from sqlalchemy.orm import DeclarativeBase
 
 
 class BaseModel(DeclarativeBase):
-   pass
\ No newline at end of file
+   pass
+
+
+@event.listens_for(BaseModel.metadata, "after_create")
+def create_missing_indexes(target, connection, **kw):
+   """
+   create_all створює індекси лише разом з новою таблицею: на наявних базах
+   індекси, додані в моделі пізніше, дописуємо тут (checkfirst - за назвою).
+   """
+   for table in target.sorted_tables:
+       for index in table.indexes:
+           index.create(connection, checkfirst=True)
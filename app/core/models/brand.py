@@ -4,9 +4,10 @@ from sqlalchemy.orm import Mapped, relationship, mapped_column
 from sqlalchemy import String, Integer
 
 from .base import BaseModel
+from .mixins import VersionMixin
 
 
-class Brand(BaseModel):
+class Brand(VersionMixin, BaseModel):
     """Модель Бренду (Виробника) кросівок."""
     __tablename__ = "brands"
 
@@ -2,11 +2,12 @@ from sqlalchemy.orm import Mapped, relationship, mapped_column
 from sqlalchemy import String, Integer
 
 from .base import BaseModel
+from .mixins import VersionMixin
 
 
 
 
-class Category(BaseModel):
+class Category(VersionMixin, BaseModel):
     """Модель Категорії."""
     __tablename__ = "categories"
 
@@ -0,0 +1,38 @@
+import time
+
+from sqlalchemy import BigInteger, event, inspect
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+_last_version = 0
+
+
+def next_version() -> int:
+    """
+    Наступна версія рядка: час в наносекундах, строго монотонний в межах процесу.
+    Версії не повторюються навіть після видалення і повторного створення рядка
+    з тим самим id, тому на них можна будувати сильні ETag.
+    """
+    global _last_version
+    _last_version = max(time.time_ns(), _last_version + 1)
+    return _last_version
+
+
+class VersionMixin:
+    """Колонка version, що оновлюється при кожному UPDATE (і ORM, і Core)."""
+    version: Mapped[int] = mapped_column(BigInteger, default=next_version, onupdate=next_version, nullable=False)
+
+
+@event.listens_for(BaseModel.metadata, "after_create")
+def add_missing_version_columns(target, connection, **kw):
+    """
+    create_all не змінює наявні таблиці: базам, створеним до VersionMixin, додаємо
+    колонку тут. Ідемпотентно; старі рядки отримують версію 0, нову - з першим UPDATE.
+    """
+    existing = inspect(connection)
+    for table in target.sorted_tables:
+        if "version" not in table.c or not existing.has_table(table.name):
+            continue
+        if "version" not in {column["name"] for column in existing.get_columns(table.name)}:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN version BIGINT NOT NULL DEFAULT 0")
@@ -2,9 +2,10 @@ from typing import Annotated
 from datetime import datetime
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Numeric, ForeignKey, Text, DateTime, func, Integer
+from sqlalchemy import String, Numeric, ForeignKey, Text, DateTime, func, Integer, Index
 
 from .base import BaseModel
+from .mixins import VersionMixin
 
 
 
@@ -12,9 +13,15 @@ order_date_type = Annotated[datetime, mapped_column(DateTime, server_default=fun
 money = Annotated[float, mapped_column(Numeric(10, 2), nullable=False)]
 
 
-class Order(BaseModel):
+class Order(VersionMixin, BaseModel):
     """Модель Замовлення."""
     __tablename__ = "orders"
+    __table_args__ = (
+        # Перерахунок зведених продажів іде діапазонами днів
+        Index("ix_orders_order_date", "order_date"),
+        # Історія замовлень користувача: seek по (order_date, id) в межах user_id, id - rowid в кінці індексу
+        Index("ix_orders_user_order_date", "user_id", "order_date"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
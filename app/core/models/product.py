@@ -1,12 +1,20 @@
 from typing import Optional
-from sqlalchemy import Integer, String, Float, Boolean, ForeignKey
+from sqlalchemy import Integer, String, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import BaseModel
+from .mixins import VersionMixin
 
 
 
-class Product(BaseModel):
+class Product(VersionMixin, BaseModel):
     __tablename__ = "products"
+    __table_args__ = (
+        # Під фільтри каталогу: рівність по category_id/in_stock, діапазон і сортування по price.
+        # SQLite додає rowid (= id) в кінець кожного індексу, тож seek по (price, id) теж з індексу.
+        Index("ix_products_category_stock_price", "category_id", "in_stock", "price"),
+        Index("ix_products_brand_price", "brand_id", "price"),
+        Index("ix_products_price", "price"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
@@ -0,0 +1,114 @@
+"""
+Попередньо агреговані продажі: штуки і виручка на (вимір, ключ, день).
+
+Один рядок на товар, бренд і категорію за день - звіт читає сотні рядків
+замість сканування order_items. Записи позицій додають дельти тут же, в своїй
+транзакції (apply_sales_delta), а rebuild_sales_rollups перераховує діапазон
+днів з order_items - ним користується команда rebuild_sales_rollups.
+Бренд і категорія беруться з товару на момент запису; перерахунок - з поточного.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import Date, Integer, Numeric, String, delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+from .order import Order
+from .order_item import OrderItem
+from .product import Product
+
+SALES_DIMENSIONS = ("product", "brand", "category")
+
+# Діалекти з INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class SalesRollup(BaseModel):
+    __tablename__ = "sales_rollups"
+
+    # Порядок ключа - під звіт: вимір, діапазон днів, далі всі ключі дня
+    dimension: Mapped[str] = mapped_column(String(10), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    key_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    units: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    revenue: Mapped[float] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+
+
+@dataclass(frozen=True)
+class SaleLine:
+    """Зміна однієї позиції: units і revenue зі знаком (видалення - від'ємні)."""
+    day: date
+    product_id: int
+    brand_id: int
+    category_id: int
+    units: int
+    revenue: float
+
+
+async def apply_sales_delta(session: AsyncSession, lines: Iterable[SaleLine]) -> None:
+    """Додає дельти позицій до всіх вимірів одним executemany-upsert."""
+    totals: dict[tuple[str, int, date], list] = defaultdict(lambda: [0, 0.0])
+    for line in lines:
+        for dimension, key_id in zip(SALES_DIMENSIONS, (line.product_id, line.brand_id, line.category_id)):
+            total = totals[dimension, key_id, line.day]
+            total[0] += line.units
+            total[1] += line.revenue
+    rows = [
+        {"dimension": dimension, "key_id": key_id, "day": day, "units": units, "revenue": round(revenue, 2)}
+        for (dimension, key_id, day), (units, revenue) in totals.items()
+        if units or revenue
+    ]
+    if not rows:
+        return
+
+    statement = _UPSERT_INSERT[session.bind.dialect.name](SalesRollup)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[SalesRollup.dimension, SalesRollup.day, SalesRollup.key_id],
+            set_={
+                "units": SalesRollup.units + statement.excluded.units,
+                "revenue": func.round(SalesRollup.revenue + statement.excluded.revenue, 2),
+            },
+        ),
+        rows,
+    )
+
+
+async def rebuild_sales_rollups(session: AsyncSession, date_from: date, date_to: date) -> int:
+    """
+    Перераховує дні [date_from, date_to) з позицій: товари - з order_items,
+    бренди і категорії - з щойно записаних рядків товарів. Викликати в одній
+    транзакції: записи позицій у цей час чекають на неї і додають свої дельти після.
+    Повертає кількість записаних рядків.
+    """
+    in_range = (SalesRollup.day >= date_from) & (SalesRollup.day < date_to)
+    await session.execute(delete(SalesRollup).where(in_range))
+
+    # order_date - рядок 'YYYY-MM-DD HH:MM:SS[.ffffff]': межі днів рядками, щоб працював індекс
+    day = func.date(Order.order_date)
+    by_product = (
+        select(literal("product"), OrderItem.product_id, day, func.sum(OrderItem.quantity),
+               func.round(func.sum(OrderItem.quantity * OrderItem.unit_price), 2))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.order_date >= literal(date_from.isoformat()), Order.order_date < literal(date_to.isoformat()))
+        .group_by(OrderItem.product_id, day)
+    )
+    columns = ["dimension", "key_id", "day", "units", "revenue"]
+    written = (await session.execute(insert(SalesRollup).from_select(columns, by_product))).rowcount
+
+    for dimension, key in (("brand", Product.brand_id), ("category", Product.category_id)):
+        rollup = (
+            select(literal(dimension), key, SalesRollup.day, func.sum(SalesRollup.units),
+                   func.round(func.sum(SalesRollup.revenue), 2))
+            .join(Product, Product.id == SalesRollup.key_id)
+            .where(SalesRollup.dimension == "product", in_range)
+            .group_by(key, SalesRollup.day)
+        )
+        written += (await session.execute(insert(SalesRollup).from_select(columns, rollup))).rowcount
+    return written
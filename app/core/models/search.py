@@ -0,0 +1,101 @@
+"""
+Повнотекстовий індекс товарів на SQLite FTS5.
+
+products_fts - окрема віртуальна таблиця (rowid = products.id) з назвою,
+описом, назвою бренду і категорії. Синхронізується тригерами в самій БД,
+тому її оновлюють і ORM, і Core-інструкції (батчі), і зміни брендів/категорій.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import column, event, literal_column, table, text
+
+from .base import BaseModel
+
+PRODUCTS_FTS = "products_fts"
+
+# Легка декларація для запитів - не входить в metadata, create_all її не чіпає
+products_fts = table(PRODUCTS_FTS, column("rowid"))
+
+# bm25 з вагами колонок (name, description, brand, category); менше - релевантніше
+products_fts_rank = literal_column(f"bm25({PRODUCTS_FTS}, 10.0, 1.0, 4.0, 2.0)")
+
+_BRAND_NAME = "(SELECT name FROM brands WHERE id = new.brand_id)"
+_CATEGORY_NAME = "(SELECT name FROM categories WHERE id = new.category_id)"
+
+PRODUCTS_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCTS_FTS} USING fts5(
+        name, description, brand, category,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO {PRODUCTS_FTS} (rowid, name, description, brand, category)
+        VALUES (new.id, new.name, new.description, {_BRAND_NAME}, {_CATEGORY_NAME});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF name, description, brand_id, category_id ON products BEGIN
+        UPDATE {PRODUCTS_FTS}
+        SET name = new.name, description = new.description,
+            brand = {_BRAND_NAME}, category = {_CATEGORY_NAME}
+        WHERE rowid = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM {PRODUCTS_FTS} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_brand_rename AFTER UPDATE OF name ON brands BEGIN
+        UPDATE {PRODUCTS_FTS} SET brand = new.name
+        WHERE rowid IN (SELECT id FROM products WHERE brand_id = new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_category_rename AFTER UPDATE OF name ON categories BEGIN
+        UPDATE {PRODUCTS_FTS} SET category = new.name
+        WHERE rowid IN (SELECT id FROM products WHERE category_id = new.id);
+    END
+    """,
+]
+
+# Первинне наповнення, якщо індекс створюється над вже заповненою таблицею
+PRODUCTS_FTS_REBUILD = f"""
+    INSERT INTO {PRODUCTS_FTS} (rowid, name, description, brand, category)
+    SELECT p.id, p.name, p.description, b.name, c.name
+    FROM products p
+    LEFT JOIN brands b ON b.id = p.brand_id
+    LEFT JOIN categories c ON c.id = p.category_id
+"""
+
+
+@event.listens_for(BaseModel.metadata, "after_create")
+def create_products_fts(target, connection, **kw):
+    """Викликається після кожного metadata.create_all; всі інструкції ідемпотентні."""
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": PRODUCTS_FTS}
+    ).first()
+    for statement in PRODUCTS_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(PRODUCTS_FTS_REBUILD)
+
+
+def fts_match_query(q: str) -> Optional[str]:
+    """
+    Перетворює довільний текст користувача на безпечний FTS5-запит:
+    кожне слово - префіксний пошук ("nik"* знайде Nike), слова через AND.
+    Синтаксис FTS5 з вводу (лапки, NEAR, OR, *) не пропускаємо.
+    """
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
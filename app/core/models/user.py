@@ -2,9 +2,10 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import String, Integer
 
 from .base import BaseModel
+from .mixins import VersionMixin
 
 
-class User(BaseModel):
+class User(VersionMixin, BaseModel):
     """Модель Користувача/Клієнта."""
     __tablename__ = "users"
 
@@ -1,45 +1,113 @@
 from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import Select, func, select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.models.brand import Brand
+from app.core.models.product import Product
 from app.core.schemas.brands import (
     BrandResponseSchema,
     BrandCreateSchema,
     BrandPartialUpdateSchema
 )
 from app.core.settings.db import db
+from app.core.utils.cache import cache_key, cache_response, response_cache
+from app.core.utils.etag import is_fresh, make_etag, not_modified, page_etag
+from app.core.utils.fieldsets import FieldSelector, View
+from app.core.utils.pagination import PageDepend, paginate
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
 
-SessionDepend = Annotated[AsyncSession, Depends(db.get_session)]
-router = APIRouter(prefix="/brands", tags=["Brands"])
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+WriteSessionDepend = Annotated[AsyncSession, Depends(db.get_write_session)]
+router = APIRouter(prefix="/brands", tags=["Brands"], default_response_class=FastJSONResponse)
+
+brand_view = FieldSelector(Brand, BrandResponseSchema, always=("version",))
+BrandViewDepend = Annotated[View, Depends(brand_view)]
+
+
+def brand_cache_tags(brand: Brand, view: View) -> set[str]:
+    """Теги кешу: сам бренд + кожен вбудований товар."""
+    if "products" not in view.embeds:
+        return {f"brand:{brand.id}"}
+    return {f"brand:{brand.id}", *(f"product:{product.id}" for product in brand.products)}
+
+
+def brand_versions(brand: Brand, view: View) -> tuple:
+    """Версія бренду + склад і версії вбудованих товарів (для ETag)."""
+    if "products" not in view.embeds:
+        return brand.id, brand.version
+    products = brand.products
+    return brand.id, brand.version, len(products), max((product.version for product in products), default=None)
+
+
+def brand_versions_query(view: View) -> Select:
+    """Ті самі версії одним агрегуючим запитом - без завантаження товарів."""
+    if "products" not in view.embeds:
+        return select(Brand.id, Brand.version)
+    return (
+        select(Brand.id, Brand.version, func.count(Product.id), func.max(Product.version))
+        .outerjoin(Product, Product.brand_id == Brand.id)
+        .group_by(Brand.id)
+    )
 
 
 @router.get("/", response_model=List[BrandResponseSchema])
-async def get_brands(session: SessionDepend):
-    query = select(Brand).options(selectinload(Brand.products))
-    result = await session.execute(query)
-    return result.scalars().all()
+@query_budget(3)
+async def get_brands(request: Request, session: ReadSessionDepend, page: PageDepend, view: BrandViewDepend):
+    key = cache_key(request)
+    if cached := response_cache.get(key):
+        return cached.to_response("HIT", request)
+    generation = response_cache.generation()
+
+    if "if-none-match" in request.headers:
+        versions = await paginate(session, brand_versions_query(view), page, Brand.id, rows=True)
+        etag = page_etag(request, versions)
+        if is_fresh(request, etag):
+            return not_modified(etag)
+
+    query = select(Brand).options(*view.options())
+    result = await paginate(session, query, page, Brand.id)
+
+    tags = {"brands"}.union(*(brand_cache_tags(brand, view) for brand in result.items))
+    etag = page_etag(request, result, lambda brand: brand_versions(brand, view))
+    return cache_response(key, view.serialize(result.items), tags, {**result.headers(), "ETag": etag}, since=generation)
 
 
 @router.get("/{brand_id}", response_model=BrandResponseSchema)
-async def get_brand(brand_id: int, session: SessionDepend):
-    query = select(Brand).filter(Brand.id == brand_id).options(selectinload(Brand.products))
+@query_budget(3)
+async def get_brand(brand_id: int, request: Request, session: ReadSessionDepend, view: BrandViewDepend):
+    key = cache_key(request)
+    if cached := response_cache.get(key):
+        return cached.to_response("HIT", request)
+    generation = response_cache.generation()
+
+    if "if-none-match" in request.headers:
+        versions = (await session.execute(brand_versions_query(view).where(Brand.id == brand_id))).first()
+        if versions is not None:
+            etag = make_etag(request.url.query, tuple(versions))
+            if is_fresh(request, etag):
+                return not_modified(etag)
+
+    query = select(Brand).filter(Brand.id == brand_id).options(*view.options())
     result = await session.execute(query)
     brand = result.scalars().first()
     if not brand:
         raise HTTPException(status_code=404, detail="Brand not found")
-    return brand
+    etag = make_etag(request.url.query, brand_versions(brand, view))
+    return cache_response(key, view.serialize(brand), brand_cache_tags(brand, view), {"ETag": etag}, since=generation)
 
 
 @router.post("/", response_model=BrandResponseSchema, status_code=201)
-async def create_brand(brand: BrandCreateSchema, session: SessionDepend):
+@query_budget(3)
+async def create_brand(brand: BrandCreateSchema, session: WriteSessionDepend):
     new_brand = Brand(**brand.model_dump())
     session.add(new_brand)
     try:
         await session.commit()
+        response_cache.invalidate("brands")
 
         # Надійно завантажуємо
         query = select(Brand).filter(Brand.id == new_brand.id).options(selectinload(Brand.products))
@@ -53,7 +121,8 @@ async def create_brand(brand: BrandCreateSchema, session: SessionDepend):
 
 
 @router.patch("/{brand_id}", response_model=BrandResponseSchema)
-async def partial_update_brand(brand_id: int, brand: BrandPartialUpdateSchema, session: SessionDepend):
+@query_budget(3)
+async def partial_update_brand(brand_id: int, brand: BrandPartialUpdateSchema, session: WriteSessionDepend):
     query = select(Brand).filter(Brand.id == brand_id).options(selectinload(Brand.products))
     result = await session.execute(query)
     existing_brand = result.scalars().first()
@@ -64,14 +133,17 @@ async def partial_update_brand(brand_id: int, brand: BrandPartialUpdateSchema, s
         setattr(existing_brand, key, value)
 
     await session.commit()
+    response_cache.invalidate(f"brand:{brand_id}")
     return existing_brand
 
 
 @router.delete("/{brand_id}", status_code=204)
-async def delete_brand(brand_id: int, session: SessionDepend):
+@query_budget(3)
+async def delete_brand(brand_id: int, session: WriteSessionDepend):
     existing_brand = await session.get(Brand, brand_id)
     if not existing_brand:
         raise HTTPException(status_code=404, detail="Brand not found")
     await session.delete(existing_brand)
     await session.commit()
+    response_cache.invalidate("brands", f"brand:{brand_id}")
     return None
\ No newline at end of file
@@ -1,45 +1,114 @@
 from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import Select, func, select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.models.category import Category
+from app.core.models.product import Product
 from app.core.schemas.categories import (
     CategoryResponseSchema,
     CategoryCreateSchema,
     CategoryPartialUpdateSchema
 )
 from app.core.settings.db import db
+from app.core.utils.cache import cache_key, cache_response, response_cache
+from app.core.utils.etag import is_fresh, make_etag, not_modified, page_etag
+from app.core.utils.fieldsets import FieldSelector, View
+from app.core.utils.pagination import PageDepend, paginate
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
 
-SessionDepend = Annotated[AsyncSession, Depends(db.get_session)]
-router = APIRouter(prefix="/categories", tags=["Categories"])
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+WriteSessionDepend = Annotated[AsyncSession, Depends(db.get_write_session)]
+router = APIRouter(prefix="/categories", tags=["Categories"], default_response_class=FastJSONResponse)
+
+category_view = FieldSelector(Category, CategoryResponseSchema, always=("version",))
+CategoryViewDepend = Annotated[View, Depends(category_view)]
+
+
+def category_cache_tags(category: Category, view: View) -> set[str]:
+    """Теги кешу: сама категорія + кожен вбудований товар."""
+    if "products" not in view.embeds:
+        return {f"category:{category.id}"}
+    return {f"category:{category.id}", *(f"product:{product.id}" for product in category.products)}
+
+
+def category_versions(category: Category, view: View) -> tuple:
+    """Версія категорії + склад і версії вбудованих товарів (для ETag)."""
+    if "products" not in view.embeds:
+        return category.id, category.version
+    products = category.products
+    return category.id, category.version, len(products), max((product.version for product in products), default=None)
+
+
+def category_versions_query(view: View) -> Select:
+    """Ті самі версії одним агрегуючим запитом - без завантаження товарів."""
+    if "products" not in view.embeds:
+        return select(Category.id, Category.version)
+    return (
+        select(Category.id, Category.version, func.count(Product.id), func.max(Product.version))
+        .outerjoin(Product, Product.category_id == Category.id)
+        .group_by(Category.id)
+    )
 
 
 @router.get("/", response_model=List[CategoryResponseSchema])
-async def get_categories(session: SessionDepend):
-    query = select(Category).options(selectinload(Category.products))
-    result = await session.execute(query)
-    return result.scalars().all()
+@query_budget(3)
+async def get_categories(request: Request, session: ReadSessionDepend, page: PageDepend, view: CategoryViewDepend):
+    key = cache_key(request)
+    if cached := response_cache.get(key):
+        return cached.to_response("HIT", request)
+    generation = response_cache.generation()
+
+    if "if-none-match" in request.headers:
+        versions = await paginate(session, category_versions_query(view), page, Category.id, rows=True)
+        etag = page_etag(request, versions)
+        if is_fresh(request, etag):
+            return not_modified(etag)
+
+    query = select(Category).options(*view.options())
+    result = await paginate(session, query, page, Category.id)
+
+    tags = {"categories"}.union(*(category_cache_tags(category, view) for category in result.items))
+    etag = page_etag(request, result, lambda category: category_versions(category, view))
+    return cache_response(key, view.serialize(result.items), tags, {**result.headers(), "ETag": etag}, since=generation)
 
 
 @router.get("/{category_id}", response_model=CategoryResponseSchema)
-async def get_category(category_id: int, session: SessionDepend):
-    query = select(Category).filter(Category.id == category_id).options(selectinload(Category.products))
+@query_budget(3)
+async def get_category(category_id: int, request: Request, session: ReadSessionDepend, view: CategoryViewDepend):
+    key = cache_key(request)
+    if cached := response_cache.get(key):
+        return cached.to_response("HIT", request)
+    generation = response_cache.generation()
+
+    if "if-none-match" in request.headers:
+        versions = (await session.execute(category_versions_query(view).where(Category.id == category_id))).first()
+        if versions is not None:
+            etag = make_etag(request.url.query, tuple(versions))
+            if is_fresh(request, etag):
+                return not_modified(etag)
+
+    query = select(Category).filter(Category.id == category_id).options(*view.options())
     result = await session.execute(query)
     category = result.scalars().first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return category
+    etag = make_etag(request.url.query, category_versions(category, view))
+    tags = category_cache_tags(category, view)
+    return cache_response(key, view.serialize(category), tags, {"ETag": etag}, since=generation)
 
 
 @router.post("/", response_model=CategoryResponseSchema, status_code=201)
-async def create_category(category: CategoryCreateSchema, session: SessionDepend):
+@query_budget(3)
+async def create_category(category: CategoryCreateSchema, session: WriteSessionDepend):
     new_category = Category(**category.model_dump())
     session.add(new_category)
     try:
         await session.commit()
+        response_cache.invalidate("categories")
 
         # Надійно завантажуємо створену категорію
         query = select(Category).filter(Category.id == new_category.id).options(selectinload(Category.products))
@@ -53,7 +122,8 @@ async def create_category(category: CategoryCreateSchema, session: SessionDepend
 
 
 @router.patch("/{category_id}", response_model=CategoryResponseSchema)
-async def partial_update_category(category_id: int, category: CategoryPartialUpdateSchema, session: SessionDepend):
+@query_budget(3)
+async def partial_update_category(category_id: int, category: CategoryPartialUpdateSchema, session: WriteSessionDepend):
     query = select(Category).filter(Category.id == category_id).options(selectinload(Category.products))
     result = await session.execute(query)
     existing_category = result.scalars().first()
@@ -64,14 +134,17 @@ async def partial_update_category(category_id: int, category: CategoryPartialUpd
         setattr(existing_category, key, value)
 
     await session.commit()
+    response_cache.invalidate(f"category:{category_id}")
     return existing_category
 
 
 @router.delete("/{category_id}", status_code=204)
-async def delete_category(category_id: int, session: SessionDepend):
+@query_budget(3)
+async def delete_category(category_id: int, session: WriteSessionDepend):
     existing_category = await session.get(Category, category_id)
     if not existing_category:
         raise HTTPException(status_code=404, detail="Category not found")
     await session.delete(existing_category)
     await session.commit()
+    response_cache.invalidate("categories", f"category:{category_id}")
     return None
\ No newline at end of file
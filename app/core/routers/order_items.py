@@ -1,22 +1,69 @@
-from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from datetime import datetime
+from typing import List, Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.models.order import Order
 from app.core.models.order_item import OrderItem
 from app.core.models.product import Product
+from app.core.models.sales import SaleLine, apply_sales_delta
 from app.core.schemas.order_items import (
     OrderItemResponseSchema,
     OrderItemCreateSchema,
     OrderItemPartialUpdateSchema
 )
 from app.core.settings.db import db
+from app.core.utils.fieldsets import FieldSelector, View
+from app.core.utils.pagination import PageDepend, paginate
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
+from app.core.utils.streaming import stream_ndjson, wants_ndjson
+
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+WriteSessionDepend = Annotated[AsyncSession, Depends(db.get_write_session)]
+
+router = APIRouter(prefix="/order_items", tags=["Order Items"], default_response_class=FastJSONResponse)
+
+order_item_view = FieldSelector(OrderItem, OrderItemResponseSchema)
+OrderItemViewDepend = Annotated[View, Depends(order_item_view)]
+
+
+async def _apply_order_total_delta(session: AsyncSession, order_id: int, delta: float) -> Optional[datetime]:
+    """
+    Інкрементально змінює orders.total_amount на `delta` в тій самій транзакції:
+    UPDATE orders SET total_amount = round(total_amount + :delta, 2) WHERE id = :id.
+    Повертає дату замовлення (день для зведених продажів) або None, якщо замовлення не існує.
+    """
+    result = await session.execute(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(total_amount=func.round(Order.total_amount + delta, 2))
+        .returning(Order.order_date)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
 
-SessionDepend = Annotated[AsyncSession, Depends(db.get_session)]
 
-router = APIRouter(prefix="/order_items", tags=["Order Items"])
+def _sale_line(order_date: datetime, product: Product, quantity: int, unit_price: float) -> SaleLine:
+    return SaleLine(
+        day=order_date.date(),
+        product_id=product.id,
+        brand_id=product.brand_id,
+        category_id=product.category_id,
+        units=quantity,
+        revenue=quantity * unit_price,
+    )
+
+
+def _item_query(item_id: int):
+    # populate_existing - щоб вкладене замовлення мало свіжий total_amount
+    return select(OrderItem).filter(OrderItem.id == item_id).options(
+        selectinload(OrderItem.order),
+        selectinload(OrderItem.product)
+    ).execution_options(populate_existing=True)
 
 
 # --- GET (Список) ---
@@ -25,14 +72,21 @@ router = APIRouter(prefix="/order_items", tags=["Order Items"])
     response_model=List[OrderItemResponseSchema],
     status_code=status.HTTP_200_OK,
 )
-async def get_order_items(session: SessionDepend):
-    """Отримати список всіх позицій."""
-    query = select(OrderItem).options(
-        selectinload(OrderItem.order),
-        selectinload(OrderItem.product)
-    )
-    result = await session.execute(query)
-    return result.scalars().all()
+@query_budget(3)
+async def get_order_items(
+        request: Request,
+        session: ReadSessionDepend,
+        page: PageDepend,
+        view: OrderItemViewDepend,
+):
+    """Отримати сторінку позицій."""
+    query = select(OrderItem).options(*view.options())
+    # Потоковий режим для вивантажень: вся таблиця без пагінації
+    if wants_ndjson(request):
+        return stream_ndjson(session, query.order_by(OrderItem.id), view.schema)
+
+    result = await paginate(session, query, page, OrderItem.id)
+    return view.render(result.items, result.headers())
 
 
 # --- GET (Один об'єкт) ---
@@ -41,12 +95,10 @@ async def get_order_items(session: SessionDepend):
     response_model=OrderItemResponseSchema,
     status_code=status.HTTP_200_OK,
 )
-async def get_order_item(item_id: int, session: SessionDepend):
+@query_budget(3)
+async def get_order_item(item_id: int, session: ReadSessionDepend, view: OrderItemViewDepend):
     """Отримати одну позицію за ID."""
-    query = select(OrderItem).filter(OrderItem.id == item_id).options(
-        selectinload(OrderItem.order),
-        selectinload(OrderItem.product)
-    )
+    query = select(OrderItem).filter(OrderItem.id == item_id).options(*view.options())
     result = await session.execute(query)
     existing_item = result.scalars().first()
 
@@ -55,7 +107,7 @@ async def get_order_item(item_id: int, session: SessionDepend):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Order item with id={item_id} not found."
         )
-    return existing_item
+    return view.render(existing_item)
 
 
 # --- CREATE (POST) ---
@@ -64,38 +116,43 @@ async def get_order_item(item_id: int, session: SessionDepend):
     response_model=OrderItemResponseSchema,
     status_code=status.HTTP_201_CREATED,
 )
-async def create_order_item(item: OrderItemCreateSchema, session: SessionDepend):
+@query_budget(7)
+async def create_order_item(item: OrderItemCreateSchema, session: WriteSessionDepend):
     """Створити нову позицію (з авто-ціною від товару)."""
 
-    # 1. Знаходимо товар, щоб взяти ціну
-    product = await session.get(Product, item.product_id)
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Product with id={item.product_id} not found."
+    async def apply(unit_session: AsyncSession) -> OrderItem:
+        # 1. Знаходимо товар, щоб взяти ціну
+        product = await unit_session.get(Product, item.product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with id={item.product_id} not found."
+            )
+
+        # 2. Додаємо вартість позиції до суми замовлення і до зведених продажів
+        order_date = await _apply_order_total_delta(unit_session, item.order_id, item.quantity * product.price)
+        if order_date is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Order with id={item.order_id} not found."
+            )
+        await apply_sales_delta(unit_session, [_sale_line(order_date, product, item.quantity, product.price)])
+
+        # 3. Створюємо запис з ціною товару
+        new_item = OrderItem(
+            **item.model_dump(),
+            unit_price=product.price
         )
+        unit_session.add(new_item)
+        await unit_session.flush()
 
-    # 2. Створюємо запис з ціною товару
-    new_item = OrderItem(
-        **item.model_dump(),
-        unit_price=product.price
-    )
+        # Завантажуємо створений об'єкт з усіма зв'язками
+        result = await unit_session.execute(_item_query(new_item.id))
+        return result.scalars().first()
 
-    session.add(new_item)
     try:
-        await session.commit()
-
-        # ВИПРАВЛЕННЯ: Завантажуємо створений об'єкт з усіма зв'язками
-        query = select(OrderItem).filter(OrderItem.id == new_item.id).options(
-            selectinload(OrderItem.order),
-            selectinload(OrderItem.product)
-        )
-        result = await session.execute(query)
-        created_item = result.scalars().first()
-
-        return created_item
+        return await db.write(session, apply)
     except SQLAlchemyError as e:
-        await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error creating order item: {e}"
@@ -107,10 +164,11 @@ async def create_order_item(item: OrderItemCreateSchema, session: SessionDepend)
     response_model=OrderItemResponseSchema,
     status_code=status.HTTP_200_OK,
 )
+@query_budget(9)
 async def update_order_item(
         item_id: int,
         item: OrderItemPartialUpdateSchema,
-        session: SessionDepend
+        session: WriteSessionDepend
 ):
     """Частково оновити позицію."""
     # Завантажуємо з зв'язками
@@ -125,19 +183,23 @@ async def update_order_item(
         raise HTTPException(status_code=404, detail="Item not found")
 
     # Оновлюємо поля
+    old_quantity = existing_item.quantity
     update_data = item.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(existing_item, field, value)
 
     try:
+        if existing_item.quantity != old_quantity:
+            unit_price = float(existing_item.unit_price)
+            order_date = await _apply_order_total_delta(
+                session, existing_item.order_id, (existing_item.quantity - old_quantity) * unit_price
+            )
+            line = _sale_line(order_date, existing_item.product, existing_item.quantity - old_quantity, unit_price)
+            await apply_sales_delta(session, [line])
         await session.commit()
 
         # Перезавантажуємо з зв'язками після оновлення
-        query = select(OrderItem).filter(OrderItem.id == item_id).options(
-            selectinload(OrderItem.order),
-            selectinload(OrderItem.product)
-        )
-        result = await session.execute(query)
+        result = await session.execute(_item_query(item_id))
         updated_item = result.scalars().first()
 
         return updated_item
@@ -151,8 +213,11 @@ async def update_order_item(
     path="/{item_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-async def delete_order_item(item_id: int, session: SessionDepend):
-    existing_item = await session.get(OrderItem, item_id)
+@query_budget(4)
+async def delete_order_item(item_id: int, session: WriteSessionDepend):
+    # Товар - тим самим запитом: бренд і категорія потрібні для зведених продажів
+    query = select(OrderItem).filter(OrderItem.id == item_id).options(joinedload(OrderItem.product))
+    existing_item = (await session.execute(query)).scalars().first()
     if not existing_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -160,6 +225,12 @@ async def delete_order_item(item_id: int, session: SessionDepend):
         )
 
     try:
+        unit_price = float(existing_item.unit_price)
+        order_date = await _apply_order_total_delta(
+            session, existing_item.order_id, -existing_item.quantity * unit_price
+        )
+        line = _sale_line(order_date, existing_item.product, -existing_item.quantity, unit_price)
+        await apply_sales_delta(session, [line])
         await session.delete(existing_item)
         await session.commit()
     except SQLAlchemyError as e:
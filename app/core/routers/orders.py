@@ -1,60 +1,174 @@
 from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import Select, insert, select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.models.order import Order
+from app.core.models.order_item import OrderItem
+from app.core.models.product import Product
+from app.core.models.sales import SaleLine, apply_sales_delta
+from app.core.models.user import User
 from app.core.schemas.orders import (
     OrderResponseSchema,
     OrderCreateSchema,
-    OrderPartialUpdateSchema
+    OrderPartialUpdateSchema,
+    OrderCheckoutSchema,
 )
 from app.core.settings.db import db
+from app.core.utils.etag import is_fresh, make_etag, not_modified, page_etag
+from app.core.utils.fieldsets import FieldSelector, View
+from app.core.utils.pagination import PageDepend, paginate
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
+from app.core.utils.streaming import stream_ndjson, wants_ndjson
 
-SessionDepend = Annotated[AsyncSession, Depends(db.get_session)]
-router = APIRouter(prefix="/orders", tags=["Orders"])
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+WriteSessionDepend = Annotated[AsyncSession, Depends(db.get_write_session)]
+router = APIRouter(prefix="/orders", tags=["Orders"], default_response_class=FastJSONResponse)
+
+order_view = FieldSelector(Order, OrderResponseSchema, always=("version",))
+OrderViewDepend = Annotated[View, Depends(order_view)]
+
+
+def order_versions(order: Order, view: View) -> tuple:
+    """Версії замовлення і вбудованого користувача (позиції змінюють версію замовлення)."""
+    if "user" not in view.embeds:
+        return order.id, order.version
+    return order.id, order.version, order.user.version
+
+
+def order_versions_query(view: View) -> Select:
+    """Ті самі версії одним легким запитом - без зв'язків і серіалізації."""
+    if "user" not in view.embeds:
+        return select(Order.id, Order.version)
+    return (
+        select(Order.id, Order.version, User.version.label("user_version"))
+        .join(User, Order.user_id == User.id)
+    )
 
 
 @router.get("/", response_model=List[OrderResponseSchema])
-async def get_orders(session: SessionDepend):
-    query = select(Order).options(selectinload(Order.user), selectinload(Order.items))
-    result = await session.execute(query)
-    return result.scalars().all()
+@query_budget(4)
+async def get_orders(
+        request: Request,
+        session: ReadSessionDepend,
+        page: PageDepend,
+        view: OrderViewDepend,
+):
+    query = select(Order).options(*view.options())
+    # Потоковий режим для вивантажень: вся таблиця без пагінації
+    if wants_ndjson(request):
+        return stream_ndjson(session, query.order_by(Order.id), view.schema)
+
+    if "if-none-match" in request.headers:
+        versions = await paginate(session, order_versions_query(view), page, Order.id, rows=True)
+        etag = page_etag(request, versions)
+        if is_fresh(request, etag):
+            return not_modified(etag)
+
+    result = await paginate(session, query, page, Order.id)
+    etag = page_etag(request, result, lambda order: order_versions(order, view))
+    return view.render(result.items, {**result.headers(), "ETag": etag})
 
 
 @router.get("/{order_id}", response_model=OrderResponseSchema)
-async def get_order(order_id: int, session: SessionDepend):
-    query = select(Order).filter(Order.id == order_id).options(selectinload(Order.user), selectinload(Order.items))
+@query_budget(4)
+async def get_order(order_id: int, request: Request, session: ReadSessionDepend, view: OrderViewDepend):
+    if "if-none-match" in request.headers:
+        versions = (await session.execute(order_versions_query(view).where(Order.id == order_id))).first()
+        if versions is not None:
+            etag = make_etag(request.url.query, tuple(versions))
+            if is_fresh(request, etag):
+                return not_modified(etag)
+
+    query = select(Order).filter(Order.id == order_id).options(*view.options())
     result = await session.execute(query)
     order = result.scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return view.render(order, {"ETag": make_etag(request.url.query, order_versions(order, view))})
+
+
+def _created_order_query(order_id: int) -> Select:
+    # Надійно завантажуємо User та Items
+    return select(Order).filter(Order.id == order_id).options(selectinload(Order.user), selectinload(Order.items))
 
 
 @router.post("/", response_model=OrderResponseSchema, status_code=201)
-async def create_order(order: OrderCreateSchema, session: SessionDepend):
-    new_order = Order(**order.model_dump(), total_amount=0.0)
-    session.add(new_order)
+@query_budget(4)
+async def create_order(order: OrderCreateSchema, session: WriteSessionDepend):
+    async def apply(unit_session: AsyncSession) -> Order:
+        new_order = Order(**order.model_dump(), total_amount=0.0)
+        unit_session.add(new_order)
+        await unit_session.flush()
+        return (await unit_session.execute(_created_order_query(new_order.id))).scalars().first()
+
     try:
-        await session.commit()
+        return await db.write(session, apply)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-        # Надійно завантажуємо User та Items
-        query = select(Order).filter(Order.id == new_order.id).options(selectinload(Order.user),
-                                                                       selectinload(Order.items))
-        result = await session.execute(query)
-        created_order = result.scalars().first()
+@router.post("/checkout", response_model=OrderResponseSchema, status_code=201)
+@query_budget(8)
+async def checkout(order: OrderCheckoutSchema, session: WriteSessionDepend):
+    """
+    Оформлення замовлення одним запитом: ціни всіх товарів - одним IN-запитом,
+    замовлення і всі позиції - в одній транзакції, сума рахується одразу.
+    Кількість звернень до БД не залежить від кількості позицій.
+    """
+    async def apply(unit_session: AsyncSession) -> Order:
+        if not await unit_session.get(User, order.user_id):
+            raise HTTPException(status_code=404, detail=f"User with id={order.user_id} not found.")
+
+        product_ids = {line.product_id for line in order.items}
+        query = select(Product.id, Product.price, Product.brand_id, Product.category_id).where(
+            Product.id.in_(product_ids)
+        )
+        products = {row.id: row for row in (await unit_session.execute(query)).all()}
+        missing = sorted(product_ids - products.keys())
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Products not found: {missing}")
+        prices = {product_id: product.price for product_id, product in products.items()}
+
+        items = [
+            {"product_id": line.product_id, "quantity": line.quantity, "unit_price": prices[line.product_id]}
+            for line in order.items
+        ]
+        new_order = Order(
+            **order.model_dump(exclude={"items"}),
+            total_amount=round(sum(item["quantity"] * item["unit_price"] for item in items), 2),
+        )
+        unit_session.add(new_order)
+        await unit_session.flush()
+        # Позиції - одним executemany: через relationship ORM вставляє їх по одній з RETURNING id
+        await unit_session.execute(insert(OrderItem), [{**item, "order_id": new_order.id} for item in items])
+        created = (await unit_session.execute(_created_order_query(new_order.id))).scalars().first()
+        # order_date - серверний default, відомий лише після перезавантаження замовлення
+        await apply_sales_delta(unit_session, [
+            SaleLine(
+                day=created.order_date.date(),
+                product_id=item["product_id"],
+                brand_id=products[item["product_id"]].brand_id,
+                category_id=products[item["product_id"]].category_id,
+                units=item["quantity"],
+                revenue=item["quantity"] * item["unit_price"],
+            )
+            for item in items
+        ])
+        return created
 
-        return created_order
+    try:
+        return await db.write(session, apply)
     except SQLAlchemyError as e:
-        await session.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.patch("/{order_id}", response_model=OrderResponseSchema)
-async def partial_update_order(order_id: int, order: OrderPartialUpdateSchema, session: SessionDepend):
+@query_budget(4)
+async def partial_update_order(order_id: int, order: OrderPartialUpdateSchema, session: WriteSessionDepend):
     query = select(Order).filter(Order.id == order_id).options(selectinload(Order.user), selectinload(Order.items))
     result = await session.execute(query)
     existing_order = result.scalars().first()
@@ -69,7 +183,8 @@ async def partial_update_order(order_id: int, order: OrderPartialUpdateSchema, s
 
 
 @router.delete("/{order_id}", status_code=204)
-async def delete_order(order_id: int, session: SessionDepend):
+@query_budget(3)
+async def delete_order(order_id: int, session: WriteSessionDepend):
     existing_order = await session.get(Order, order_id)
     if not existing_order:
         raise HTTPException(status_code=404, detail="Order not found")
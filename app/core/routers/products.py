@@ -1,21 +1,118 @@
+from collections import Counter
 from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import Row, Select, delete, insert, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from app.core.models.brand import Brand
+from app.core.models.category import Category
+from app.core.models.order_item import OrderItem
 from app.core.models.product import Product
+from app.core.models.search import PRODUCTS_FTS, fts_match_query, products_fts, products_fts_rank
 from app.core.schemas.products import (
     ProductResponseSchema,
     ProductCreateSchema,
-    ProductPartialUpdateSchema
+    ProductPartialUpdateSchema,
+    ProductBatchSchema,
+    ProductBatchResultSchema,
+    ProductBatchItemResultSchema,
+    ProductFilterSchema,
 )
 from app.core.settings.db import db
+from app.core.utils.cache import cache_key, cache_response, response_cache
+from app.core.utils.etag import is_fresh, make_etag, not_modified, page_etag
+from app.core.utils.fieldsets import FieldSelector, View
+from app.core.utils.pagination import PageDepend, paginate
+from app.core.utils.projection import projection
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
 
-SessionDepend = Annotated[AsyncSession, Depends(db.get_session)]
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+WriteSessionDepend = Annotated[AsyncSession, Depends(db.get_write_session)]
 
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], default_response_class=FastJSONResponse)
+
+# ?fields= / ?embed=; FK і version потрібні для тегів кешу і ETag при будь-якому наборі полів
+product_view = FieldSelector(Product, ProductResponseSchema, always=("version", "brand_id", "category_id"))
+ProductViewDepend = Annotated[View, Depends(product_view)]
+
+# Колонки, яким батч не може явно передати null - інакше NOT NULL падає вже в UPDATE всього батчу
+REQUIRED_PRODUCT_COLUMNS = {column.name for column in Product.__table__.columns if not column.nullable}
+
+
+def product_cache_tags(product_id: int, brand_id: int, category_id: int) -> set[str]:
+    """Теги кешу для товару: сам товар + вбудовані бренд і категорія."""
+    return {f"product:{product_id}", f"brand:{brand_id}", f"category:{category_id}"}
+
+
+def product_versions(row: Row, view: View) -> tuple:
+    """
+    Версії всього, з чого складається представлення товару (для ETag).
+    Приймає рядок і легкого запиту версій, і швидкого запиту сторінки.
+    """
+    versions = [row.id, row.version]
+    if "brand" in view.embeds:
+        versions.append(row.brand_version)
+    if "category" in view.embeds:
+        versions.append(row.category_version)
+    return tuple(versions)
+
+
+def product_versions_query(view: View) -> Select:
+    """Ті самі версії одним легким запитом - без зв'язків і серіалізації."""
+    query = select(Product.id, Product.version)
+    if "brand" in view.embeds:
+        query = query.join(Brand, Product.brand_id == Brand.id).add_columns(Brand.version.label("brand_version"))
+    if "category" in view.embeds:
+        query = query.join(Category, Product.category_id == Category.id).add_columns(
+            Category.version.label("category_version")
+        )
+    return query
+
+
+def product_rows_query(view: View, *sort_keys) -> Select:
+    """
+    Швидкий шлях читання: колонки представлення, версії і FK (для тегів кешу)
+    одним Core-запитом з JOIN на бренд і категорію - без ORM-об'єктів.
+    """
+    query = projection(Product, view.schema).select(
+        Product.id, Product.version, Product.brand_id, Product.category_id, *sort_keys
+    )
+    if "brand" in view.embeds:
+        query = query.add_columns(Brand.version.label("brand_version"))
+    if "category" in view.embeds:
+        query = query.add_columns(Category.version.label("category_version"))
+    return query
+
+
+# Ключі keyset-пагінації для кожного сортування; id останній - він унікальний
+PRODUCT_SORT_KEYS = {
+    "id": (Product.id,),
+    "price": (Product.price, Product.id),
+    "name": (Product.name, Product.id),
+}
+
+
+def filter_products(query: Select, filters: ProductFilterSchema) -> Select:
+    """Фільтри каталогу як WHERE - їх покривають складені індекси на products."""
+    if filters.category_id is not None:
+        query = query.where(Product.category_id == filters.category_id)
+    if filters.brand_id is not None:
+        query = query.where(Product.brand_id == filters.brand_id)
+    if filters.in_stock is not None:
+        query = query.where(Product.in_stock == filters.in_stock)
+    if filters.min_price is not None:
+        query = query.where(Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.where(Product.price <= filters.max_price)
+    return query
+
+
+def product_sort(filters: ProductFilterSchema) -> tuple[tuple, bool]:
+    """Ключі сортування і напрямок для `paginate`."""
+    return PRODUCT_SORT_KEYS[filters.sort.lstrip("-")], filters.sort.startswith("-")
 
 
 # --- GET (Список товарів) ---
@@ -24,14 +121,76 @@ router = APIRouter(prefix="/products", tags=["Products"])
     response_model=List[ProductResponseSchema],
     status_code=status.HTTP_200_OK,
 )
-async def get_products(session: SessionDepend):
-    """Отримати список всіх товарів (з категоріями та брендами)."""
-    query = select(Product).options(
-        selectinload(Product.category),
-        selectinload(Product.brand)
+@query_budget(2)
+async def get_products(
+        request: Request,
+        session: ReadSessionDepend,
+        page: PageDepend,
+        filters: Annotated[ProductFilterSchema, Query()],
+        view: ProductViewDepend,
+):
+    """Отримати сторінку товарів (з категоріями та брендами), з фільтрами і сортуванням."""
+    key = cache_key(request)
+    if cached := response_cache.get(key):
+        return cached.to_response("HIT", request)
+    generation = response_cache.generation()
+
+    sort_keys, descending = product_sort(filters)
+    if "if-none-match" in request.headers:
+        # Ключі сортування потрібні для курсора, але в ETag не входять (вони і так в версії товару)
+        extra = [key for key in sort_keys if key is not Product.id]
+        versions_query = filter_products(product_versions_query(view).add_columns(*extra), filters)
+        versions = await paginate(session, versions_query, page, *sort_keys, rows=True, descending=descending)
+        etag = page_etag(request, versions, lambda row: product_versions(row, view))
+        if is_fresh(request, etag):
+            return not_modified(etag)
+
+    query = filter_products(product_rows_query(view, *sort_keys), filters)
+    result = await paginate(session, query, page, *sort_keys, rows=True, descending=descending)
+
+    # "products" - тег складу списку (створення/видалення товарів).
+    # З фільтрами чи сортуванням не по id будь-яке оновлення може ввести товар
+    # на сторінку або вивести з неї, тому такі списки залежать від "products:filtered".
+    tags = {"products"}
+    if filters.model_dump(exclude_defaults=True):
+        tags.add("products:filtered")
+    for row in result.items:
+        tags |= product_cache_tags(row.id, row.brand_id, row.category_id)
+    etag = page_etag(request, result, lambda row: product_versions(row, view))
+    body = projection(Product, view.schema).dump(result.items)
+    return cache_response(key, body, tags, {**result.headers(), "ETag": etag}, since=generation)
+
+
+# --- SEARCH (Повнотекстовий пошук) ---
+# Оголошено до /{product_id}, інакше "search" піде в path-параметр
+@router.get(
+    path="/search",
+    response_model=List[ProductResponseSchema],
+    status_code=status.HTTP_200_OK,
+)
+@query_budget(3)
+async def search_products(
+        session: ReadSessionDepend,
+        page: PageDepend,
+        view: ProductViewDepend,
+        q: str = Query(min_length=1, max_length=200),
+):
+    """Пошук товарів по назві, опису, бренду і категорії (FTS5, ранжування bm25)."""
+    match = fts_match_query(q)
+    if match is None:
+        return []
+
+    hits = (
+        select(products_fts.c.rowid.label("product_id"), products_fts_rank.label("rank"))
+        .where(text(f"{PRODUCTS_FTS} MATCH :match").bindparams(match=match))
+        .subquery()
     )
-    result = await session.execute(query)
-    return result.scalars().all()
+    query = select(Product, hits.c.rank, hits.c.product_id).join(hits, hits.c.product_id == Product.id).options(
+        *view.options()
+    )
+    # Seek по (rank, id) - глибокі сторінки пошуку так само дешеві, як перша
+    result = await paginate(session, query, page, hits.c.rank, hits.c.product_id, rows=True)
+    return view.render([row.Product for row in result.items], result.headers())
 
 
 # --- GET (Один товар) ---
@@ -40,21 +199,32 @@ async def get_products(session: SessionDepend):
     response_model=ProductResponseSchema,
     status_code=status.HTTP_200_OK,
 )
-async def get_product(product_id: int, session: SessionDepend):
+@query_budget(2)
+async def get_product(product_id: int, request: Request, session: ReadSessionDepend, view: ProductViewDepend):
     """Отримати один товар за ID."""
-    query = select(Product).filter(Product.id == product_id).options(
-        selectinload(Product.category),
-        selectinload(Product.brand)
-    )
-    result = await session.execute(query)
-    existing_product = result.scalars().first()
+    key = cache_key(request)
+    if cached := response_cache.get(key):
+        return cached.to_response("HIT", request)
+    generation = response_cache.generation()
 
-    if not existing_product:
+    if "if-none-match" in request.headers:
+        versions = (await session.execute(product_versions_query(view).where(Product.id == product_id))).first()
+        if versions is not None:
+            etag = make_etag(request.url.query, product_versions(versions, view))
+            if is_fresh(request, etag):
+                return not_modified(etag)
+
+    row = (await session.execute(product_rows_query(view).where(Product.id == product_id))).first()
+
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Product with id={product_id} not found."
         )
-    return existing_product
+    tags = product_cache_tags(row.id, row.brand_id, row.category_id)
+    etag = make_etag(request.url.query, product_versions(row, view))
+    body = projection(Product, view.schema).dump_one(row)
+    return cache_response(key, body, tags, {"ETag": etag}, since=generation)
 
 
 # --- CREATE (Створення товару) - ВИПРАВЛЕНО ---
@@ -63,9 +233,10 @@ async def get_product(product_id: int, session: SessionDepend):
     response_model=ProductResponseSchema,
     status_code=status.HTTP_201_CREATED,
 )
+@query_budget(4)
 async def create_product(
         product: ProductCreateSchema,
-        session: SessionDepend
+        session: WriteSessionDepend
 ):
     """Створити новий товар."""
     product_data = product.model_dump()
@@ -75,6 +246,9 @@ async def create_product(
 
     try:
         await session.commit()
+        response_cache.invalidate(
+            "products", *product_cache_tags(new_product.id, new_product.brand_id, new_product.category_id)
+        )
 
         # ВИПРАВЛЕННЯ: Замість refresh робимо select з підвантаженням зв'язків
         query = select(Product).filter(Product.id == new_product.id).options(
@@ -93,16 +267,162 @@ async def create_product(
         )
 
 
+# --- BATCH (Масове створення / оновлення / видалення) ---
+@router.post(
+    path="/batch",
+    response_model=ProductBatchResultSchema,
+    status_code=status.HTTP_200_OK,
+)
+@query_budget(9)
+async def batch_products(batch: ProductBatchSchema, session: WriteSessionDepend):
+    """
+    Масові операції над товарами в одній транзакції.
+
+    Конфлікти (зайнята назва, неіснуючий товар/бренд/категорія) перевіряються
+    кількома IN-запитами наперед і повертаються по кожному елементу, не
+    скасовуючи решту батчу. Помилки самого елемента (null в обов'язковому полі,
+    id, що повторюється в update) - статус invalid. Самі зміни - по одній багаторядковій
+    DELETE / UPDATE / INSERT інструкції на тип операції і один commit.
+    """
+    results = ProductBatchResultSchema()
+    update_ids = {item.id for item in batch.update}
+    update_counts = Counter(item.id for item in batch.update)
+    names = {item.name for item in batch.create} | {item.name for item in batch.update if item.name}
+    brand_ids = {item.brand_id for item in [*batch.create, *batch.update] if item.brand_id}
+    category_ids = {item.category_id for item in [*batch.create, *batch.update] if item.category_id}
+
+    # 1. Весь потрібний стан з БД - по одному запиту на сутність
+    existing = {
+        product_id: (brand_id, category_id)
+        for product_id, brand_id, category_id in (await session.execute(
+            select(Product.id, Product.brand_id, Product.category_id)
+            .where(Product.id.in_(update_ids | set(batch.delete)))
+        )).all()
+    }
+    name_owners = dict((await session.execute(
+        select(Product.name, Product.id).where(Product.name.in_(names))
+    )).all())
+    known_brands = set((await session.execute(select(Brand.id).where(Brand.id.in_(brand_ids)))).scalars())
+    known_categories = set((await session.execute(
+        select(Category.id).where(Category.id.in_(category_ids))
+    )).scalars())
+    referenced_ids = set((await session.execute(
+        select(OrderItem.product_id).where(OrderItem.product_id.in_(batch.delete)).distinct()
+    )).scalars())
+
+    def check_refs(item) -> str | None:
+        if item.brand_id and item.brand_id not in known_brands:
+            return f"Brand with id={item.brand_id} not found."
+        if item.category_id and item.category_id not in known_categories:
+            return f"Category with id={item.category_id} not found."
+        return None
+
+    # 2. Видалення - першими, щоб звільнені назви можна було зайняти в цьому ж батчі
+    deleted = set()
+    for index, product_id in enumerate(batch.delete):
+        if product_id not in existing or product_id in deleted:
+            status_, detail = "not_found", f"Product with id={product_id} not found."
+        elif product_id in referenced_ids:
+            status_, detail = "conflict", f"Product with id={product_id} is used in orders."
+        else:
+            status_, detail = "deleted", None
+            deleted.add(product_id)
+        results.delete.append(ProductBatchItemResultSchema(index=index, id=product_id, status=status_, detail=detail))
+
+    name_owners = {name: owner for name, owner in name_owners.items() if owner not in deleted}
+
+    # 3. Оновлення
+    update_rows = []
+    for index, item in enumerate(batch.update):
+        data = item.model_dump(exclude_unset=True)
+        nulls = sorted(name for name, value in data.items() if value is None and name in REQUIRED_PRODUCT_COLUMNS)
+        if nulls:
+            status_, detail = "invalid", f"Fields {', '.join(nulls)} cannot be null."
+        elif update_counts[item.id] > 1:
+            status_, detail = "invalid", f"Product with id={item.id} is updated more than once in this batch."
+        elif item.id not in existing or item.id in deleted:
+            status_, detail = "not_found", f"Product with id={item.id} not found."
+        elif item.name and name_owners.get(item.name, item.id) != item.id:
+            status_, detail = "conflict", f"Product with name='{item.name}' already exists."
+        elif detail := check_refs(item):
+            status_ = "not_found"
+        else:
+            status_, detail = "updated", None
+            if item.name:
+                name_owners[item.name] = item.id
+            if len(data) > 1:
+                update_rows.append(data)
+        results.update.append(ProductBatchItemResultSchema(index=index, id=item.id, status=status_, detail=detail))
+
+    # 4. Створення
+    create_rows, create_results = [], []
+    for index, item in enumerate(batch.create):
+        if item.name in name_owners:
+            status_, detail = "conflict", f"Product with name='{item.name}' already exists."
+        elif detail := check_refs(item):
+            status_ = "not_found"
+        else:
+            name_owners[item.name] = None
+            create_rows.append(item.model_dump())
+            create_results.append(index)
+            status_ = "created"
+        results.create.append(ProductBatchItemResultSchema(index=index, status=status_, detail=detail))
+
+    try:
+        if deleted:
+            await session.execute(delete(Product).where(Product.id.in_(deleted)))
+        if update_rows:
+            # ORM bulk UPDATE by primary key -> executemany
+            await session.execute(update(Product), update_rows)
+        if create_rows:
+            # RETURNING з порядком параметрів SQLite виконує по рядку на інструкцію (немає sentinel-колонки),
+            # тому вставка - одним executemany, а id - одним запитом за унікальними назвами
+            await session.execute(insert(Product), create_rows)
+            new_ids = dict((await session.execute(
+                select(Product.name, Product.id).where(Product.name.in_([row["name"] for row in create_rows]))
+            )).all())
+            for index, row in zip(create_results, create_rows):
+                results.create[index].id = new_ids[row["name"]]
+        await session.commit()
+    except IntegrityError:
+        # Назву зайняв паралельний запит між перевіркою і записом
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Batch conflicts with a concurrent change, retry it."
+        )
+    except SQLAlchemyError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error applying product batch: {e}"
+        )
+
+    # Інвалідуємо кеш для всього, що батч зачепив (і старі, і нові бренди/категорії)
+    tags = {"products", "products:filtered"}
+    for product_id in deleted | {row["id"] for row in update_rows}:
+        tags |= product_cache_tags(product_id, *existing[product_id])
+    for row in [*update_rows, *create_rows]:
+        if row.get("brand_id"):
+            tags.add(f"brand:{row['brand_id']}")
+        if row.get("category_id"):
+            tags.add(f"category:{row['category_id']}")
+    response_cache.invalidate(*tags)
+
+    return results
+
+
 # --- UPDATE (Повне оновлення - PUT) ---
 @router.put(
     path="/{product_id}",
     response_model=ProductResponseSchema,
     status_code=status.HTTP_200_OK,
 )
+@query_budget(4)
 async def update_product(
         product_id: int,
         product: ProductCreateSchema,
-        session: SessionDepend
+        session: WriteSessionDepend
 ):
     """Повністю оновити товар за ID."""
     # Спочатку завантажуємо товар
@@ -120,12 +440,17 @@ async def update_product(
         )
 
     # Оновлюємо поля
+    # Старі бренд/категорія теж мають вийти з кешу, якщо товар переїхав
+    old_tags = product_cache_tags(existing_product.id, existing_product.brand_id, existing_product.category_id)
     update_data = product.model_dump()
     for field, value in update_data.items():
         setattr(existing_product, field, value)
 
     try:
         await session.commit()
+        response_cache.invalidate("products:filtered", *old_tags, *product_cache_tags(
+            existing_product.id, existing_product.brand_id, existing_product.category_id
+        ))
         # Об'єкт вже завантажений з зв'язками, тому тут refresh безпечний,
         # або можна повернути existing_product так
         return existing_product
@@ -143,10 +468,11 @@ async def update_product(
     response_model=ProductResponseSchema,
     status_code=status.HTTP_200_OK,
 )
+@query_budget(4)
 async def partial_update_product(
         product_id: int,
         product: ProductPartialUpdateSchema,
-        session: SessionDepend
+        session: WriteSessionDepend
 ):
     """Частково оновити товар (тільки передані поля)."""
     query = select(Product).filter(Product.id == product_id).options(
@@ -162,6 +488,8 @@ async def partial_update_product(
             detail=f"Product with id={product_id} not found."
         )
 
+    # Старі бренд/категорія теж мають вийти з кешу, якщо товар переїхав
+    old_tags = product_cache_tags(existing_product.id, existing_product.brand_id, existing_product.category_id)
     update_data = product.model_dump(exclude_unset=True)
 
     for field, value in update_data.items():
@@ -169,6 +497,9 @@ async def partial_update_product(
 
     try:
         await session.commit()
+        response_cache.invalidate("products:filtered", *old_tags, *product_cache_tags(
+            existing_product.id, existing_product.brand_id, existing_product.category_id
+        ))
         return existing_product
     except SQLAlchemyError as e:
         await session.rollback()
@@ -183,7 +514,8 @@ async def partial_update_product(
     path="/{product_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-async def delete_product(product_id: int, session: SessionDepend):
+@query_budget(3)
+async def delete_product(product_id: int, session: WriteSessionDepend):
     """Видалити товар за ID."""
     existing_product = await session.get(Product, product_id)
 
@@ -195,5 +527,8 @@ async def delete_product(product_id: int, session: SessionDepend):
 
     await session.delete(existing_product)
     await session.commit()
+    response_cache.invalidate(
+        "products", *product_cache_tags(existing_product.id, existing_product.brand_id, existing_product.category_id)
+    )
 
     return None
\ No newline at end of file
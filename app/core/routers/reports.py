@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+from typing import List, Annotated
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.models.brand import Brand
+from app.core.models.category import Category
+from app.core.models.product import Product
+from app.core.models.sales import SalesRollup
+from app.core.schemas.reports import SalesReportFilterSchema, SalesReportRowSchema
+from app.core.settings.db import db
+from app.core.utils.cache import serialize
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
+
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+
+router = APIRouter(prefix="/reports", tags=["Reports"], default_response_class=FastJSONResponse)
+
+DEFAULT_REPORT_DAYS = 30
+
+# Вимір -> модель з назвою ключа
+DIMENSION_MODELS = {"product": Product, "brand": Brand, "category": Category}
+
+
+@router.get("/sales", response_model=List[SalesReportRowSchema])
+@query_budget(1)
+async def get_sales(session: ReadSessionDepend, filters: Annotated[SalesReportFilterSchema, Query()]):
+    """
+    Штуки і виручка по товарах, брендах або категоріях за днями - з таблиці
+    sales_rollups, без сканування позицій замовлень.
+    """
+    date_to = filters.date_to or date.today()
+    date_from = filters.date_from or date_to - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    model = DIMENSION_MODELS[filters.by]
+
+    day = SalesRollup.day if filters.granularity == "day" else literal(None).label("day")
+    units, revenue = func.sum(SalesRollup.units), func.round(func.sum(SalesRollup.revenue), 2)
+    query = (
+        select(day, SalesRollup.key_id.label("id"), model.name, units.label("units"), revenue.label("revenue"))
+        .outerjoin(model, model.id == SalesRollup.key_id)
+        .where(SalesRollup.dimension == filters.by, SalesRollup.day.between(date_from, date_to))
+        .group_by(SalesRollup.key_id, model.name)
+        .limit(filters.limit)
+    )
+    if filters.id is not None:
+        query = query.where(SalesRollup.key_id == filters.id)
+    if filters.granularity == "day":
+        query = query.group_by(SalesRollup.day).order_by(SalesRollup.day, SalesRollup.key_id)
+    else:
+        query = query.order_by(revenue.desc(), SalesRollup.key_id)
+
+    rows = (await session.execute(query)).all()
+    return Response(content=serialize(SalesReportRowSchema, rows), media_type="application/json")
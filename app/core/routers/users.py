@@ -1,50 +1,121 @@
 from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import String, select, type_coerce, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.core.models.order import Order
 from app.core.models.user import User
 from app.core.schemas.users import (
+    OrderUserNestedSchema,
     UserResponseSchema,
     UserCreateSchema,
-    UserPartialUpdateSchema
+    UserPartialUpdateSchema,
+    UserPasswordCheckSchema,
 )
 from app.core.settings.db import db
+from app.core.utils.cache import serialize
+from app.core.utils.fieldsets import FieldSelector, View
+from app.core.utils.pagination import PageDepend, paginate
+from app.core.utils.passwords import PasswordHashingBusy, password_hasher
+from app.core.utils.query_budget import query_budget
+from app.core.utils.responses import FastJSONResponse
 
-SessionDepend = Annotated[AsyncSession, Depends(db.get_session)]
+ReadSessionDepend = Annotated[AsyncSession, Depends(db.get_read_session)]
+WriteSessionDepend = Annotated[AsyncSession, Depends(db.get_write_session)]
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], default_response_class=FastJSONResponse)
+
+user_view = FieldSelector(User, UserResponseSchema)
+UserViewDepend = Annotated[View, Depends(user_view)]
+
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password operations in progress, retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def hash_password(password: str) -> str:
+    """Хеш у пулі потоків - поза транзакцією, щоб не тримати з'єднання-писача."""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+
+
+async def verify_password(password: str, stored: str | None) -> bool:
+    try:
+        return await password_hasher.verify(password, stored)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+
+
+async def _commit_user_update(session: AsyncSession) -> None:
+    """Commit змін користувача; якщо його видалили, поки рахувався хеш, UPDATE не знайде рядка - 404."""
+    try:
+        await session.commit()
+    except StaleDataError:
+        await session.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
 
 
 @router.get("/", response_model=List[UserResponseSchema])
-async def get_users(session: SessionDepend):
-    query = select(User).options(selectinload(User.orders))
-    result = await session.execute(query)
-    return result.scalars().all()
+@query_budget(1)
+async def get_users(session: ReadSessionDepend, page: PageDepend, view: UserViewDepend):
+    query = select(User).options(*view.options())
+    result = await paginate(session, query, page, User.id)
+    return view.render(result.items, result.headers())
 
 
 @router.get("/{user_id}", response_model=UserResponseSchema)
-async def get_user(user_id: int, session: SessionDepend):
-    query = select(User).filter(User.id == user_id).options(selectinload(User.orders))
+@query_budget(1)
+async def get_user(user_id: int, session: ReadSessionDepend, view: UserViewDepend):
+    query = select(User).filter(User.id == user_id).options(*view.options())
     result = await session.execute(query)
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return view.render(user)
+
+
+# order_date у SQLite - рядок, і формати різні: server_default пише без мікросекунд, батчі - з ними.
+# Курсор і порівняння - по збереженому рядку, інакше рядки з однаковим часом губляться між сторінками
+order_date_key = type_coerce(Order.order_date, String).label("order_date")
+
+
+@router.get("/{user_id}/orders", response_model=List[OrderUserNestedSchema])
+@query_budget(2)
+async def get_user_orders(user_id: int, session: ReadSessionDepend, page: PageDepend):
+    """
+    Історія замовлень користувача, новіші першими. Keyset по (order_date, id)
+    з індексу (user_id, order_date): сторінка не залежить від довжини історії.
+    """
+    query = select(Order.id, order_date_key, Order.status, Order.total_amount).where(Order.user_id == user_id)
+    result = await paginate(session, query, page, order_date_key, Order.id, rows=True, descending=True)
+    # Порожня перша сторінка - або немає замовлень, або немає користувача
+    if not result.items and page.after is None and not await session.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    return Response(
+        content=serialize(OrderUserNestedSchema, result.items), media_type="application/json",
+        headers=result.headers(),
+    )
 
 
 @router.post("/", response_model=UserResponseSchema, status_code=201)
-async def create_user(user: UserCreateSchema, session: SessionDepend):
+@query_budget(2)
+async def create_user(user: UserCreateSchema, session: WriteSessionDepend):
     # 1. Створюємо
-    new_user = User(**user.model_dump())
+    new_user = User(**user.model_dump(exclude={"password"}), password=await hash_password(user.password))
     session.add(new_user)
     try:
         await session.commit()
 
-        # 2. НАДІЙНИЙ СПОСІБ: Завантажуємо створений об'єкт разом зі зв'язками
-        query = select(User).filter(User.id == new_user.id).options(selectinload(User.orders))
+        # 2. НАДІЙНИЙ СПОСІБ: Завантажуємо створений об'єкт
+        query = select(User).filter(User.id == new_user.id)
         result = await session.execute(query)
         created_user = result.scalars().first()
 
@@ -55,38 +126,70 @@ async def create_user(user: UserCreateSchema, session: SessionDepend):
 
 
 @router.put("/{user_id}", response_model=UserResponseSchema)
-async def update_user(user_id: int, user: UserCreateSchema, session: SessionDepend):
-    query = select(User).filter(User.id == user_id).options(selectinload(User.orders))
+@query_budget(2)
+async def update_user(user_id: int, user: UserCreateSchema, session: WriteSessionDepend):
+    query = select(User).filter(User.id == user_id)
     result = await session.execute(query)
     existing_user = result.scalars().first()
     if not existing_user:
         raise HTTPException(status_code=404, detail="User not found")
+    # Хеш - лише для наявного користувача і поза транзакцією, щоб не тримати з'єднання-писача
+    await session.commit()
+    password = await hash_password(user.password)
 
     for key, value in user.model_dump().items():
         setattr(existing_user, key, value)
+    existing_user.password = password
 
-    await session.commit()
+    await _commit_user_update(session)
     # Тут об'єкт вже завантажений, refresh спрацює, але для надійності можна повернути existing_user
     return existing_user
 
 
 @router.patch("/{user_id}", response_model=UserResponseSchema)
-async def partial_update_user(user_id: int, user: UserPartialUpdateSchema, session: SessionDepend):
-    query = select(User).filter(User.id == user_id).options(selectinload(User.orders))
+@query_budget(2)
+async def partial_update_user(user_id: int, user: UserPartialUpdateSchema, session: WriteSessionDepend):
+    update_data = user.model_dump(exclude_unset=True)
+    query = select(User).filter(User.id == user_id)
     result = await session.execute(query)
     existing_user = result.scalars().first()
     if not existing_user:
         raise HTTPException(status_code=404, detail="User not found")
+    if update_data.get("password") is not None:
+        await session.commit()
+        update_data["password"] = await hash_password(update_data["password"])
 
-    for key, value in user.model_dump(exclude_unset=True).items():
+    for key, value in update_data.items():
         setattr(existing_user, key, value)
 
-    await session.commit()
+    await _commit_user_update(session)
     return existing_user
 
 
+@router.post("/verify-password", status_code=204)
+@query_budget(2)
+async def verify_user_password(credentials: UserPasswordCheckSchema, session: WriteSessionDepend):
+    """
+    204, якщо пароль правильний, інакше 401 - однаково для невідомого email.
+    Паролі, збережені до хешування або з меншою вартістю, тут же перехешовуються.
+    """
+    query = select(User.id, User.password).filter(User.email == credentials.email)
+    user = (await session.execute(query)).first()
+    # Завершуємо транзакцію до хешування - з'єднання-писач повертається в пул
+    await session.commit()
+    if not await verify_password(credentials.password, user.password if user else None):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+
+    if password_hasher.needs_rehash(user.password):
+        password = await hash_password(credentials.password)
+        await session.execute(update(User).where(User.id == user.id).values(password=password))
+        await session.commit()
+    return None
+
+
 @router.delete("/{user_id}", status_code=204)
-async def delete_user(user_id: int, session: SessionDepend):
+@query_budget(3)
+async def delete_user(user_id: int, session: WriteSessionDepend):
     existing_user = await session.get(User, user_id)
     if not existing_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -55,4 +55,16 @@ class OrderPartialUpdateSchema(BaseModel):
     shipping_address: Optional[str] = Field(default=None)
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 4. Checkout (замовлення разом з позиціями одним запитом)
+class CheckoutItemSchema(BaseModel):
+    product_id: int = Field(gt=0)
+    quantity: int = Field(default=1, gt=0)
+
+
+class OrderCheckoutSchema(BaseModel):
+    user_id: int = Field(gt=0)
+    status: str = Field(default="new", max_length=20)
+    shipping_address: Optional[str] = None
+    items: List[CheckoutItemSchema] = Field(min_length=1)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel, Field, field_validator
 
 # --- Вкладені схеми для відображення повних даних ---
@@ -108,4 +108,43 @@ class ProductPartialUpdateSchema(BaseModel):
         return v
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 4. Batch (масові операції для синхронізації каталогу)
+MAX_BATCH_SIZE = 1000
+
+
+class ProductBatchUpdateSchema(ProductPartialUpdateSchema):
+    """Часткове оновлення в батчі - ті самі поля, що й PATCH, плюс id товару."""
+    id: int = Field(gt=0)
+
+
+class ProductBatchSchema(BaseModel):
+    create: list[ProductCreateSchema] = Field(default=[], max_length=MAX_BATCH_SIZE)
+    update: list[ProductBatchUpdateSchema] = Field(default=[], max_length=MAX_BATCH_SIZE)
+    delete: list[int] = Field(default=[], max_length=MAX_BATCH_SIZE)
+
+
+class ProductBatchItemResultSchema(BaseModel):
+    """Результат однієї операції: index - позиція в масиві запиту."""
+    index: int
+    id: Optional[int] = None
+    status: str  # created / updated / deleted / conflict / not_found / invalid
+    detail: Optional[str] = None
+
+
+class ProductBatchResultSchema(BaseModel):
+    create: list[ProductBatchItemResultSchema] = []
+    update: list[ProductBatchItemResultSchema] = []
+    delete: list[ProductBatchItemResultSchema] = []
+
+
+# 5. Фільтри і сортування списку (query-параметри GET /products/)
+class ProductFilterSchema(BaseModel):
+    category_id: Optional[int] = Field(default=None, gt=0)
+    brand_id: Optional[int] = Field(default=None, gt=0)
+    min_price: Optional[float] = Field(default=None, ge=0)
+    max_price: Optional[float] = Field(default=None, ge=0)
+    in_stock: Optional[bool] = None
+    # "-" на початку - за спаданням
+    sort: Literal["id", "price", "-price", "name", "-name"] = "id"
@@ -0,0 +1,31 @@
+from datetime import date
+from typing import Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+# --- Параметри звіту ---
+class SalesReportFilterSchema(BaseModel):
+    by: Literal["product", "brand", "category"] = "brand"
+    # Обидві межі включно; за замовчуванням - останні 30 днів
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    id: Optional[int] = Field(default=None, gt=0)
+    # day - рядок на ключ і день, total - сума за період (топ за виручкою)
+    granularity: Literal["day", "total"] = "day"
+    limit: int = Field(default=1000, ge=1, le=10000)
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise ValueError("date_from must not be after date_to")
+        return self
+
+# --- Рядок звіту ---
+class SalesReportRowSchema(BaseModel):
+    day: Optional[date] = None
+    id: int
+    name: Optional[str] = None
+    units: int
+    revenue: float
+
+    class Config:
+        from_attributes = True
@@ -1,9 +1,9 @@
-from typing import Optional, List
+from typing import Optional
 from pydantic import BaseModel, Field, EmailStr
 from datetime import datetime
 
 
-# Вкладена схема
+# Рядок історії замовлень (GET /users/{id}/orders)
 class OrderUserNestedSchema(BaseModel):
     id: int
     order_date: datetime
@@ -34,8 +34,8 @@ class UserResponseSchema(BaseModel):
     last_name: Optional[str]
     phone_number: Optional[str]
 
-    # Пароль виключаємо (exclude=True у коді роутера або просто не додаємо сюди)
-    orders: List[OrderUserNestedSchema] = []
+    # Пароль виключаємо (exclude=True у коді роутера або просто не додаємо сюди).
+    # Замовлення не вбудовуються - історія сторінками через GET /users/{id}/orders
 
     class Config:
         from_attributes = True
@@ -50,4 +50,10 @@ class UserPartialUpdateSchema(BaseModel):
     phone_number: Optional[str] = Field(default=None, max_length=20)
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# 4. Перевірка пароля
+class UserPasswordCheckSchema(BaseModel):
+    email: EmailStr = Field(max_length=100)
+    password: str = Field(min_length=1, max_length=255)
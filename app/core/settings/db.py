@@ -1,37 +1,317 @@
-from typing import AsyncGenerator
+import asyncio
+import contextvars
+import os
+from dataclasses import asdict, dataclass, fields, replace
+from typing import AsyncGenerator, Awaitable, Callable, TypeVar
 
 
-from sqlalchemy import text
+from sqlalchemy import event, make_url, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.core.settings.pool import PoolSettings, TimedQueuePool, pool_settings_from_env
+from app.core.utils.metrics import instrument_engine, instrument_orm
 
 
 
+
+@dataclass(frozen=True)
+class SqliteProfile:
+   """
+   PRAGMA, які застосовуються до кожного нового з'єднання пулу (подія connect).
+   Частина з них (synchronous, cache_size, busy_timeout, foreign_keys) діє
+   лише в межах з'єднання, тому задавати їх один раз на файл недостатньо.
+   """
+   # Скільки мс чекати на блокування замість миттєвого "database is locked".
+   # Першим: перемикання journal_mode теж може чекати на блокування файлу
+   busy_timeout: int = 5000
+   # WAL: читачі не блокуються записом, один писач не чекає на читачів
+   journal_mode: str = "WAL"
+   # NORMAL у WAL: fsync на checkpoint, а не на кожен commit; транзакції не псуються при збої процесу
+   synchronous: str = "NORMAL"
+   # Від'ємне значення - в КіБ: 64 МБ кешу сторінок на з'єднання
+   cache_size: int = -65536
+   mmap_size: int = 256 * 1024 * 1024
+   temp_store: str = "MEMORY"
+   foreign_keys: bool = True
+
+   def pragmas(self) -> dict[str, str | int]:
+       return {name: int(value) if isinstance(value, bool) else value for name, value in asdict(self).items()}
+
+   def apply(self, dbapi_connection, _connection_record=None) -> None:
+       """Обробник події connect: виконує PRAGMA на сирому DBAPI-з'єднанні."""
+       cursor = dbapi_connection.cursor()
+       try:
+           for name, value in self.pragmas().items():
+               cursor.execute(f"PRAGMA {name} = {value}")
+       finally:
+           cursor.close()
+
+
+# PRAGMA повертають числові коди замість назв, які ми задаємо
+_PRAGMA_NAMES = {
+   "synchronous": {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"},
+   "temp_store": {0: "DEFAULT", 1: "FILE", 2: "MEMORY"},
+}
+
+SQLITE_PROFILES = {
+   # Поведінка SQLite без налаштувань - для порівняння в бенчмарку
+   "legacy": SqliteProfile(journal_mode="DELETE", synchronous="FULL", cache_size=-2000, mmap_size=0,
+                           temp_store="DEFAULT", busy_timeout=0, foreign_keys=False),
+   "production": SqliteProfile(),
+   # Як production, але fsync на кожен commit: не втрачає останні транзакції при збої ОС
+   "durable": SqliteProfile(synchronous="FULL"),
+}
+
+
+def _query_only(dbapi_connection, _connection_record=None) -> None:
+   """Обробник connect для читацького пулу: будь-який запис падає з "attempt to write a readonly database"."""
+   cursor = dbapi_connection.cursor()
+   try:
+       cursor.execute("PRAGMA query_only = 1")
+   finally:
+       cursor.close()
+
+
+def sqlite_profile_from_env() -> SqliteProfile:
+   """
+   SQLITE_PROFILE - назва профілю (за замовчуванням production);
+   окремі PRAGMA перевизначаються змінними SQLITE_<NAME>, напр. SQLITE_BUSY_TIMEOUT=10000.
+   """
+   name = os.environ.get("SQLITE_PROFILE", "production")
+   if name not in SQLITE_PROFILES:
+       raise ValueError(f"Unknown SQLITE_PROFILE={name!r}, expected one of {', '.join(SQLITE_PROFILES)}.")
+   overrides = {}
+   for item in fields(SqliteProfile):
+       value = os.environ.get(f"SQLITE_{item.name.upper()}")
+       if value is None:
+           continue
+       if item.type is bool:
+           overrides[item.name] = value.lower() in ("1", "true", "on", "yes")
+       elif item.type is int:
+           overrides[item.name] = int(value)
+       else:
+           overrides[item.name] = value
+   return replace(SQLITE_PROFILES[name], **overrides)
+
+
+T = TypeVar("T")
+
+# Одиниця запису: робить зміни в переданій сесії (без commit) і повертає результат для відповіді
+WriteUnit = Callable[[AsyncSession], Awaitable[T]]
+
+
+@dataclass(frozen=True)
+class GroupCommitSettings:
+   # Скільки чекати на інші записи після першого в пачці
+   max_delay: float = 0.002
+   max_batch: int = 64
+
+
+def group_commit_from_env() -> GroupCommitSettings | None:
+   """DB_GROUP_COMMIT_MS вмикає груповий commit (напр. 2), DB_GROUP_COMMIT_BATCH - розмір пачки."""
+   delay_ms = os.environ.get("DB_GROUP_COMMIT_MS")
+   if not delay_ms:
+       return None
+   return GroupCommitSettings(max_delay=float(delay_ms) / 1000,
+                              max_batch=int(os.environ.get("DB_GROUP_COMMIT_BATCH", GroupCommitSettings.max_batch)))
+
+
+class GroupCommitter:
+   """
+   Груповий commit: одиниці запису з паралельних запитів збираються до
+   max_delay або max_batch і виконуються в одній транзакції - один fsync на
+   пачку замість одного на запит. Кожен запит отримує свій результат або помилку:
+   якщо хоч одна одиниця падає, пачка відкочується і одиниці повторюються
+   поодинці, щоб чужа помилка не відкотила решту.
+   """
+   def __init__(self, session_maker: async_sessionmaker[AsyncSession], settings: GroupCommitSettings):
+       self.session_maker = session_maker
+       self.settings = settings
+       self.queue: asyncio.Queue[tuple[WriteUnit, asyncio.Future]] = asyncio.Queue()
+       self.worker: asyncio.Task | None = None
+       self.batches = 0
+       self.units = 0
+
+
+   async def submit(self, unit: WriteUnit[T]) -> T:
+       if self.worker is None or self.worker.done():
+           # Власний порожній контекст: інакше воркер успадкував би ContextVar першого запиту
+           # і всі наступні пачки рахувались би йому в метриках і бюджеті інструкцій
+           self.worker = asyncio.create_task(self._run(), context=contextvars.Context())
+       future = asyncio.get_running_loop().create_future()
+       self.queue.put_nowait((unit, future))
+       return await future
+
+
+   async def close(self) -> None:
+       if self.worker:
+           self.worker.cancel()
+           try:
+               await self.worker
+           except asyncio.CancelledError:
+               pass
+           self.worker = None
+       while not self.queue.empty():
+           _, future = self.queue.get_nowait()
+           if not future.done():
+               future.set_exception(RuntimeError("Database disconnected before the write was applied."))
+
+
+   async def _run(self) -> None:
+       loop = asyncio.get_running_loop()
+       while True:
+           batch = [await self.queue.get()]
+           deadline = loop.time() + self.settings.max_delay
+           while len(batch) < self.settings.max_batch:
+               timeout = deadline - loop.time()
+               if timeout <= 0:
+                   break
+               try:
+                   batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+               except asyncio.TimeoutError:
+                   break
+           try:
+               await self._apply([(unit, future) for unit, future in batch if not future.done()])
+           except asyncio.CancelledError:
+               for _, future in batch:
+                   future.cancel()
+               raise
+
+
+   async def _apply(self, batch: list[tuple[WriteUnit, asyncio.Future]]) -> None:
+       if not batch:
+           return
+       self.batches += 1
+       self.units += len(batch)
+       try:
+           async with self.session_maker() as session, session.begin():
+               results = [await unit(session) for unit, _ in batch]
+       except Exception as e:
+           if len(batch) == 1:
+               _resolve(batch[0][1], error=e)
+               return
+           for unit, future in batch:
+               await self._apply_one(unit, future)
+           return
+       for (_, future), result in zip(batch, results):
+           _resolve(future, result)
+
+
+   async def _apply_one(self, unit: WriteUnit, future: asyncio.Future) -> None:
+       try:
+           async with self.session_maker() as session, session.begin():
+               result = await unit(session)
+       except Exception as e:
+           _resolve(future, error=e)
+       else:
+           _resolve(future, result)
+
+
+def _resolve(future: asyncio.Future, result=None, error: Exception | None = None) -> None:
+   # Запит міг бути скасований (клієнт відключився), поки пачка виконувалась
+   if future.done():
+       return
+   if error is not None:
+       future.set_exception(error)
+   else:
+       future.set_result(result)
+
+
 class Database:
-   def __init__(self, url: str):
+   """
+   Для файлової SQLite - два engine: писач з одним з'єднанням (SQLite і так
+   допускає одного писача, тож записи чекають в черзі пулу, а не на блокуванні файлу)
+   і читацький пул на pool.read_size з'єднань з query_only, які у WAL не чекають
+   на писача. Для :memory: і інших СУБД обидва engine - один і той самий.
+   """
+   def __init__(self, url: str, sqlite_profile: SqliteProfile | None = None, pool: PoolSettings | None = None,
+                group_commit: GroupCommitSettings | None = None):
        self.url = url
+       self.sqlite_profile = sqlite_profile or SqliteProfile()
+       self.pool = pool or PoolSettings()
+       self.group_commit = group_commit
 
 
        self.engine = None
+       self.read_engine = None
        self.session_maker = None
+       self.read_session_maker = None
+       self.committer = None
+
+
+   def _is_sqlite_file(self) -> bool:
+       url = make_url(self.url)
+       return (url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+               and url.query.get("mode") != "memory")
+
+
+   def _create_engine(self, size: int | None = None, max_overflow: int | None = None, queue: bool = True):
+       options = {"echo": False, "pool_pre_ping": self.pool.pre_ping, "pool_recycle": self.pool.recycle}
+       # :memory: SQLite працює на StaticPool - розмір і таймаут черги до нього не застосовні
+       if queue:
+           options.update(poolclass=TimedQueuePool, pool_timeout=self.pool.timeout)
+           if size is not None:
+               options["pool_size"] = size
+           if max_overflow is not None:
+               options["max_overflow"] = max_overflow
+       return create_async_engine(self.url, **options)
+
+
+   @property
+   def read_pool_size(self) -> int:
+       # Читання у SQLite відпускає GIL і частково чекає на I/O, тому не менше 4 навіть на малих машинах
+       return self.pool.read_size or max(4, os.cpu_count() or 1)
 
 
    async def connect(self):
-       self.engine = create_async_engine(self.url, echo=False, pool_pre_ping=True)
+       url = make_url(self.url)
+       if self._is_sqlite_file():
+           self.engine = self._create_engine(size=1, max_overflow=0)
+           self.read_engine = self._create_engine(size=self.read_pool_size, max_overflow=0)
+       else:
+           in_memory = url.get_backend_name() == "sqlite"
+           self.engine = self.read_engine = self._create_engine(
+               self.pool.size, self.pool.max_overflow, queue=not in_memory
+           )
+       instrument_engine(self.engine.sync_engine)
+       if self.read_engine is not self.engine:
+           instrument_engine(self.read_engine.sync_engine)
+       instrument_orm()
+       if self.engine.dialect.name == "sqlite":
+           event.listen(self.engine.sync_engine, "connect", self.sqlite_profile.apply)
+           if self.read_engine is not self.engine:
+               # Профіль (зокрема journal_mode) - до query_only, поки з'єднання ще може писати
+               event.listen(self.read_engine.sync_engine, "connect", self.sqlite_profile.apply)
+               event.listen(self.read_engine.sync_engine, "connect", _query_only)
        self.session_maker = async_sessionmaker(
            bind=self.engine,
            autoflush=False,
            expire_on_commit=False,
            class_=AsyncSession,
        )
+       self.read_session_maker = async_sessionmaker(
+           bind=self.read_engine,
+           autoflush=False,
+           expire_on_commit=False,
+           class_=AsyncSession,
+       )
+       if self.group_commit:
+           self.committer = GroupCommitter(self.session_maker, self.group_commit)
 
 
    async def disconnect(self):
+       if self.committer:
+           await self.committer.close()
+           self.committer = None
        if self.engine:
+           if self.read_engine is not self.engine:
+               await self.read_engine.dispose()
            await self.engine.dispose()
            self.engine = None
+           self.read_engine = None
            self.session_maker = None
+           self.read_session_maker = None
 
 
    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
@@ -41,6 +321,39 @@ class Database:
            yield session
 
 
+   async def get_read_session(self) -> AsyncGenerator[AsyncSession, None]:
+       """Сесія читацького пулу - для GET-ендпоінтів."""
+       if not self.read_session_maker:
+           raise RuntimeError("Database not connected. Call connect() first.")
+       async with self.read_session_maker() as session:
+           yield session
+
+
+   async def get_write_session(self) -> AsyncGenerator[AsyncSession, None]:
+       """Сесія єдиного з'єднання-писача - для POST/PUT/PATCH/DELETE."""
+       if not self.session_maker:
+           raise RuntimeError("Database not connected. Call connect() first.")
+       async with self.session_maker() as session:
+           yield session
+
+
+   async def write(self, session: AsyncSession, unit: WriteUnit[T]) -> T:
+       """
+       Виконує одиницю запису і комітить її. З груповим commit одиниця йде в
+       спільну транзакцію писача, а сесія запиту не використовується - тож до
+       виклику її не чіпаємо, інакше вона займе єдине з'єднання писача.
+       """
+       if self.committer:
+           return await self.committer.submit(unit)
+       try:
+           result = await unit(session)
+           await session.commit()
+       except BaseException:
+           await session.rollback()
+           raise
+       return result
+
+
    async def ping(self) -> bool:
        if not self.engine:
            raise RuntimeError("Database not connected. Call connect() first.")
@@ -51,6 +364,38 @@ class Database:
        except SQLAlchemyError:
            return False
 
+
+   def pool_metrics(self) -> dict[str, dict]:
+       """Стан пулів (зайняті, вільні, overflow) і статистика очікування з'єднання."""
+       if not self.engine:
+           raise RuntimeError("Database not connected. Call connect() first.")
+       engines = {"writer": self.engine}
+       if self.read_engine is not self.engine:
+           engines["reader"] = self.read_engine
+       return {name: engine.pool.metrics() for name, engine in engines.items()
+               if isinstance(engine.pool, TimedQueuePool)}
+
+
+   async def storage_report(self) -> dict[str, str | int]:
+       """Фактичні значення PRAGMA з'єднання пулу (SQLite може не прийняти запитане, напр. WAL для :memory:)."""
+       if not self.engine:
+           raise RuntimeError("Database not connected. Call connect() first.")
+       if self.engine.dialect.name != "sqlite":
+           return {}
+       report = {}
+       async with self.engine.connect() as conn:
+           for name in self.sqlite_profile.pragmas():
+               value = (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+               if isinstance(value, str):
+                   value = value.upper()
+               report[name] = _PRAGMA_NAMES.get(name, {}).get(value, value)
+       return report
+
 DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
-db = Database(url=DATABASE_URL)
\ No newline at end of file
+db = Database(
+   url=DATABASE_URL,
+   sqlite_profile=sqlite_profile_from_env(),
+   pool=pool_settings_from_env(DATABASE_URL),
+   group_commit=group_commit_from_env(),
+)
@@ -0,0 +1,112 @@
+import bisect
+import os
+import time
+from dataclasses import dataclass, fields, replace
+
+from sqlalchemy import exc, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Межі кошиків гістограми очікування з'єднання, мс (останній кошик - все, що більше)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    # None - значення SQLAlchemy за замовчуванням; для файлової SQLite писач завжди 1 + 0
+    size: int | None = None
+    max_overflow: int | None = None
+    # Скільки секунд чекати на вільне з'єднання до TimeoutError
+    timeout: float = 30.0
+    # Перевідкривати з'єднання, старші за N секунд (-1 - ніколи)
+    recycle: int = -1
+    # SELECT 1 на кожен checkout: потрібен лише там, де сервер рве простійні з'єднання і recycle не допомагає
+    pre_ping: bool = False
+    # Читацький пул файлової SQLite; None - max(4, кількість ядер)
+    read_size: int | None = None
+
+
+# Серверні СУБД закривають простійні з'єднання самі - recycle дешевший за pre_ping на кожен checkout
+POOL_DEFAULTS = {
+    "sqlite": PoolSettings(),
+    "postgresql": PoolSettings(size=10, max_overflow=20, recycle=1800),
+    "mysql": PoolSettings(size=10, max_overflow=20, recycle=1800),
+}
+
+
+def pool_settings_from_env(url: str) -> PoolSettings:
+    """
+    Значення за замовчуванням для СУБД з url, перевизначені змінними
+    DB_POOL_<NAME>: DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_POOL_READ_SIZE.
+    """
+    overrides = {}
+    for item in fields(PoolSettings):
+        value = os.environ.get(f"DB_POOL_{item.name.upper()}")
+        if value is None:
+            continue
+        if item.type is bool:
+            overrides[item.name] = value.lower() in ("1", "true", "on", "yes")
+        elif item.type is float:
+            overrides[item.name] = float(value)
+        else:
+            overrides[item.name] = int(value)
+    return replace(POOL_DEFAULTS.get(make_url(url).get_backend_name(), PoolSettings()), **overrides)
+
+
+class PoolStats:
+    """Лічильники очікування з'єднання: гістограма за WAIT_BUCKETS_MS, сума і таймаути."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.timeouts = 0
+
+    def observe(self, wait_ms: float) -> None:
+        self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+        self.checkouts += 1
+        self.wait_ms_total += wait_ms
+
+    def histogram(self) -> dict[str, int]:
+        labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["inf"]
+        return dict(zip(labels, self.buckets))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool, що міряє час отримання з'єднання (черга пулу +
+    відкриття нового з'єднання) і рахує таймаути checkout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.observe((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        # dispose() перестворює пул - лічильники процесу не обнуляємо
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            # overflow() стартує з -size: від'ємне - ще не відкриті з'єднання основного пулу
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.stats.checkouts,
+            "wait_ms_total": round(self.stats.wait_ms_total, 3),
+            "wait_ms": self.stats.histogram(),
+            "timeouts": self.stats.timeouts,
+        }
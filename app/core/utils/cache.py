@@ -0,0 +1,188 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Protocol
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.utils.etag import is_fresh, not_modified
+from app.core.utils.metrics import timed
+
+CACHE_MAX_ENTRIES = 2048
+CACHE_TTL_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Вже серіалізована відповідь: тіло + заголовки (напр. X-Next-Cursor)."""
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def to_response(self, cache_status: str, request: Optional[Request] = None) -> Response:
+        # Клієнт вже має цю версію - 304 без тіла, навіть без звернення до БД
+        etag = self.headers.get("ETag")
+        if request is not None and etag and is_fresh(request, etag):
+            return not_modified(etag)
+        return Response(
+            content=self.body,
+            media_type="application/json",
+            headers={**self.headers, "X-Cache": cache_status},
+        )
+
+
+class CacheBackend(Protocol):
+    """Інтерфейс кешу - in-process LRU за замовчуванням, можна підмінити (напр. Redis)."""
+
+    def get(self, key: str) -> Optional[CachedResponse]: ...
+
+    def generation(self) -> int: ...
+
+    def set(self, key: str, value: CachedResponse, tags: Iterable[str], since: Optional[int] = None) -> None: ...
+
+    def invalidate(self, *tags: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict[str, int]: ...
+
+
+class LRUCache:
+    """
+    LRU-кеш з TTL і обмеженням кількості записів.
+
+    Кожен запис має теги залежностей (`product:12`, `brand:3`, ...):
+    `invalidate("brand:3")` видаляє всі відповіді, в які вбудований бренд 3.
+    Працює в одному event loop без await всередині, тому блокування не потрібні.
+
+    Покоління захищають від запису застарілої відповіді: GET, чий знімок БД
+    зроблено до запису, може дійти до set() вже після invalidate() цього
+    запису. Тому обробник бере generation() до запиту, а set(..., since=...)
+    пропускає запис, якщо хоч один його тег відтоді інвалідовано.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, CachedResponse, frozenset[str]]] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_skips = 0
+        # Лічильник інвалідацій і покоління останньої інвалідації кожного тегу
+        self._generation = 0
+        self._invalidated_at: dict[str, int] = {}
+        self._cleared_at = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: str, value: CachedResponse, tags: Iterable[str], since: Optional[int] = None) -> None:
+        tags = frozenset(tags)
+        if since is not None and self._changed_since(since, tags):
+            self.stale_skips += 1
+            return
+        self._discard(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, *tags: str) -> None:
+        self._generation += 1
+        for tag in tags:
+            self._invalidated_at[tag] = self._generation
+            for key in self._keys_by_tag.pop(tag, ()):
+                self._discard(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_tag.clear()
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._invalidated_at.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_skips": self.stale_skips,
+            "entries": len(self._entries),
+        }
+
+    def _changed_since(self, generation: int, tags: frozenset[str]) -> bool:
+        if self._cleared_at > generation:
+            return True
+        return any(self._invalidated_at.get(tag, 0) > generation for tag in tags)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+response_cache = LRUCache()
+
+
+def cache_key(request: Request) -> str:
+    return f"{request.url.path}?{request.url.query}"
+
+
+@lru_cache
+def _list_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+
+def serialize(schema: type[BaseModel], data: Any) -> bytes:
+    """Валідує ORM-об'єкт (або список) схемою відповіді і одразу пише JSON."""
+    if isinstance(data, list):
+        adapter = _list_adapter(schema)
+        with timed("validate"):
+            items = adapter.validate_python(data, from_attributes=True)
+        with timed("encode"):
+            return adapter.dump_json(items)
+    with timed("validate"):
+        model = schema.model_validate(data)
+    with timed("encode"):
+        return model.model_dump_json().encode()
+
+
+def cache_response(
+        key: str,
+        body: bytes,
+        tags: Iterable[str],
+        headers: Optional[dict[str, str]] = None,
+        since: Optional[int] = None,
+) -> Response:
+    """
+    Кладе відповідь в кеш і повертає її клієнту. since - response_cache.generation(),
+    взяте до запиту в БД: якщо теги відповіді відтоді інвалідовано, вона не кешується.
+    """
+    cached = CachedResponse(body=body, headers=headers or {})
+    response_cache.set(key, cached, tags, since)
+    return cached.to_response("MISS")
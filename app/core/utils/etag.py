@@ -0,0 +1,37 @@
+import hashlib
+from typing import Any, Callable
+
+from fastapi import Request, Response, status
+
+from app.core.utils.pagination import Page
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Сильний ETag з версій рядків (і всього, що впливає на представлення,
+    напр. query string). Тіло відповіді для цього не потрібне.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """Чи збігається If-None-Match клієнта з поточним ETag (слабке порівняння, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def page_etag(request: Request, page: Page, versions: Callable[[Any], tuple] = tuple) -> str:
+    """
+    ETag сторінки списку: версії кожного рядка сторінки + наявність наступної.
+    `versions` дістає кортеж версій з ORM-об'єкта; для рядків запиту по колонках - tuple.
+    """
+    return make_etag(request.url.query, [versions(item) for item in page.items], page.next_cursor)
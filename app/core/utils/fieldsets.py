@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query, Response, status
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, raiseload, selectinload
+
+from app.core.utils.cache import serialize
+
+
+@lru_cache(maxsize=256)
+def partial_schema(schema: type[BaseModel], names: frozenset[str]) -> type[BaseModel]:
+    """Схема відповіді лише з вибраними полями (порядок полів - як в оригіналі)."""
+    fields = {
+        name: (field.annotation, field)
+        for name, field in schema.model_fields.items()
+        if name in names
+    }
+    return create_model(f"{schema.__name__}Partial", __config__=ConfigDict(from_attributes=True), **fields)
+
+
+@dataclass(frozen=True)
+class View:
+    """Представлення ресурсу для одного запиту: які колонки і зв'язки віддавати."""
+    model: type
+    schema: type[BaseModel]
+    relationships: tuple[str, ...]
+    embeds: frozenset[str]
+    # None - вантажимо всі колонки (поле ?fields= не передане)
+    load_columns: Optional[frozenset[str]] = None
+
+    def options(self, *extra_columns) -> list:
+        """
+        Опції завантаження: selectinload лише для запитаних зв'язків, raiseload
+        для решти (випадковий lazy load в async - помилка, а не N+1), load_only
+        для колонок. `extra_columns` - що ще потрібно хендлеру (ключі сортування).
+        """
+        options = [
+            selectinload(getattr(self.model, name)) if name in self.embeds
+            else raiseload(getattr(self.model, name))
+            for name in self.relationships
+        ]
+        if self.load_columns is not None:
+            columns = [getattr(self.model, name) for name in self.load_columns]
+            options.append(load_only(*columns, *extra_columns, raiseload=True))
+        return options
+
+    def serialize(self, data: Any) -> bytes:
+        return serialize(self.schema, data)
+
+    def render(self, data: Any, headers: Optional[dict[str, str]] = None) -> Response:
+        return Response(content=self.serialize(data), media_type="application/json", headers=headers)
+
+
+def _parse_names(value: Optional[str], allowed: list[str], param: str) -> Optional[set[str]]:
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}."
+        )
+    return names
+
+
+class FieldSelector:
+    """
+    Залежність FastAPI для ?fields= і ?embed= над схемою відповіді.
+
+    fields - скалярні поля через кому (id повертається завжди);
+    embed - зв'язки через кому, порожнє значення - без зв'язків.
+    Без параметрів - повне представлення, як і раніше.
+    `always` - колонки, які хендлеру потрібні незалежно від запиту (version, FK для тегів кешу).
+    """
+
+    def __init__(self, model: type, schema: type[BaseModel], always: tuple[str, ...] = ()):
+        mapper = inspect(model)
+        self.model = model
+        self.schema = schema
+        self.relationships = tuple(name for name in schema.model_fields if name in mapper.relationships)
+        self.columns = [
+            name for name, field in schema.model_fields.items()
+            if name not in self.relationships and not field.exclude
+        ]
+        self.always = {"id", *always}
+        # Колонки, без яких не завантажити зв'язок (FK для many-to-one, PK для one-to-many)
+        self.relationship_columns = {
+            name: {mapper.get_property_by_column(column).key for column in mapper.relationships[name].local_columns}
+            for name in self.relationships
+        }
+
+    def __call__(
+            self,
+            fields: Optional[str] = Query(default=None, description="Поля через кому, напр. id,name"),
+            embed: Optional[str] = Query(default=None, description="Зв'язки через кому; порожньо - без зв'язків"),
+    ) -> View:
+        columns = _parse_names(fields, self.columns, "fields")
+        embeds = _parse_names(embed, list(self.relationships), "embed")
+        if columns is None and embeds is None:
+            return View(self.model, self.schema, self.relationships, frozenset(self.relationships))
+
+        embeds = set(self.relationships) if embeds is None else embeds
+        output = (set(self.columns) if columns is None else columns | {"id"}) | embeds
+        load_columns = None
+        if columns is not None:
+            load_columns = frozenset(columns | self.always).union(
+                *(self.relationship_columns[name] for name in embeds)
+            )
+        return View(
+            model=self.model,
+            schema=partial_schema(self.schema, frozenset(output)),
+            relationships=self.relationships,
+            embeds=frozenset(embeds),
+            load_columns=load_columns,
+        )
@@ -0,0 +1,145 @@
+"""
+Перевірка здоров'я без звернення до БД на кожен запит балансувальника.
+
+HealthMonitor стартує в lifespan і раз на interval робить SELECT 1 через
+читацький пул (він не конкурує з єдиним з'єднанням-писачем). /health
+віддає останній результат миттєво разом із затримкою проби, станом пулів
+і затримкою event loop - насичений пул видно як зайняті з'єднання, а не як
+впалу перевірку. Глибока перевірка (deep_check) на вимогу пробує обидва пули.
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings.db import Database, db
+
+
+@dataclass(frozen=True)
+class HealthSettings:
+    # Як часто пробувати БД, секунд
+    interval: float = 2.0
+    # Скільки чекати на пробу (разом з чергою пулу), секунд
+    timeout: float = 1.0
+
+
+def health_settings_from_env() -> HealthSettings:
+    """HEALTH_INTERVAL і HEALTH_TIMEOUT у секундах."""
+    defaults = HealthSettings()
+    return HealthSettings(
+        interval=float(os.environ.get("HEALTH_INTERVAL", defaults.interval)),
+        timeout=float(os.environ.get("HEALTH_TIMEOUT", defaults.timeout)),
+    )
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    ok: bool
+    latency_ms: float
+    # time.time() завершення проби
+    checked_at: float
+    error: Optional[str] = None
+
+
+async def probe(engine: AsyncEngine, timeout: float) -> ProbeResult:
+    """SELECT 1 на з'єднанні пулу; таймаут покриває і очікування вільного з'єднання."""
+    async def select_one() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    started = time.perf_counter()
+    error = None
+    try:
+        await asyncio.wait_for(select_one(), timeout)
+    except asyncio.TimeoutError:
+        error = f"timed out after {timeout}s"
+    except SQLAlchemyError as e:
+        error = str(e)
+    return ProbeResult(error is None, round((time.perf_counter() - started) * 1000, 3), time.time(), error)
+
+
+class HealthMonitor:
+    def __init__(self, database: Database, settings: HealthSettings):
+        self.database = database
+        self.settings = settings
+        self.last: Optional[ProbeResult] = None
+        # Наскільки пізніше за заплановане прокинувся цикл проби - ознака заблокованого event loop
+        self.loop_lag_ms = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # Перша проба - до старту сервера, щоб /health одразу мав результат
+        await self.probe_once()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def probe_once(self) -> ProbeResult:
+        self.last = await probe(self.database.read_engine, self.settings.timeout)
+        return self.last
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.settings.interval
+            await asyncio.sleep(self.settings.interval)
+            self.loop_lag_ms = round(max(loop.time() - scheduled, 0.0) * 1000, 3)
+            await self.probe_once()
+
+    def is_stale(self) -> bool:
+        # Фонова задача впала або зависла: результат старший за кілька інтервалів
+        limit = 3 * self.settings.interval + self.settings.timeout
+        return self.last is None or time.time() - self.last.checked_at > limit
+
+    def snapshot(self) -> dict:
+        """Останній результат без звернення до БД."""
+        last = self.last
+        if last is None or self.is_stale():
+            status = "unknown"
+        else:
+            status = "ok" if last.ok else "error"
+        pools = self.database.pool_metrics() if self.database.engine else {}
+        return {
+            "status": status,
+            "checked_at": last.checked_at if last else None,
+            "age_s": round(time.time() - last.checked_at, 3) if last else None,
+            "probe_ms": last.latency_ms if last else None,
+            "error": last.error if last else None,
+            "loop_lag_ms": self.loop_lag_ms,
+            "pools": {
+                name: {key: pool[key] for key in ("size", "checked_out", "idle", "overflow", "timeouts")}
+                for name, pool in pools.items()
+            },
+        }
+
+    async def deep_check(self) -> dict:
+        """Свіжа проба писача і читацького пулу паралельно плюс фактичні PRAGMA сховища."""
+        engines = {"writer": self.database.engine}
+        if self.database.read_engine is not self.database.engine:
+            engines["reader"] = self.database.read_engine
+        results = await asyncio.gather(*(probe(engine, self.settings.timeout) for engine in engines.values()))
+        checks = {
+            name: {"ok": result.ok, "probe_ms": result.latency_ms, "error": result.error}
+            for name, result in zip(engines, results)
+        }
+        ok = all(result.ok for result in results)
+        return {
+            "status": "ok" if ok else "error",
+            "checks": checks,
+            "storage": await self.database.storage_report() if ok else {},
+        }
+
+
+health_monitor = HealthMonitor(db, health_settings_from_env())
@@ -0,0 +1,357 @@
+"""
+Метрики у текстовому форматі Prometheus без зовнішніх залежностей.
+
+MetricsMiddleware міряє кожен HTTP-запит і підписує його шаблоном маршруту
+(`/products/{product_id}`, а не конкретним id - інакше кардинальність
+необмежена). SQL-інструкції рахуються подіями before/after_cursor_execute
+engine (instrument_engine) і приписуються запиту через ContextVar.
+
+Все оновлюється в одному event loop без await, тому блокування не потрібні;
+вартість - кілька словникових операцій і bisect на запит та інструкцію.
+
+Ті самі дані запиту йдуть у заголовок Server-Timing: db (виконання SQL),
+orm (сесія поза SQL: побудова об'єктів, selectinload, unit of work),
+validate і encode (схема відповіді і JSON, див. timed) та total.
+"""
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.utils.query_budget import check_query_budget
+from app.core.utils.streaming import NDJSON_MEDIA_TYPE
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# Запити поза маршрутами (404 на невідомий шлях) - під одну мітку
+UNMATCHED_ROUTE = "unmatched"
+# Інструкції поза HTTP-запитом (lifespan, команди)
+BACKGROUND_ROUTE = "background"
+
+SERVER_TIMING_PHASES = ("db", "orm", "validate", "encode")
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return self.header() + self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = HTTP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # мітки -> [лічильники по кошиках (не накопичені) + кошик +Inf, сума]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra: Iterable[Metric] = ()) -> str:
+        lines = []
+        for metric in [*self.metrics, *extra]:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status.",
+    ("method", "route", "status"),
+))
+HTTP_IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests being processed."))
+DB_STATEMENTS = registry.register(Counter(
+    "db_statements_total", "SQL statements executed, by the route that issued them.", ("route",),
+))
+DB_STATEMENT_DURATION = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time, by route.", ("route",), DB_BUCKETS,
+))
+
+
+class ServerTimingSettings:
+    def __init__(self):
+        # Заголовок Server-Timing у кожній відповіді (SERVER_TIMING=0 - вимкнути)
+        self.header = os.environ.get("SERVER_TIMING", "1").lower() not in ("0", "false", "off", "no")
+        # Та сама розбивка в лог, рядок на запит
+        self.log = os.environ.get("SERVER_TIMING_LOG", "").lower() in ("1", "true", "on", "yes")
+
+
+server_timing_settings = ServerTimingSettings()
+
+
+@dataclass
+class RequestStats:
+    """Інструкції одного HTTP-запиту; маршрут відомий лише після роутингу, тому пишемо в кінці."""
+    durations: list[float] = field(default_factory=list)
+    # Сума durations - щоб віднімати SQL від часу ORM без проходу по списку
+    db_time: float = 0.0
+    # Фаза -> секунди (orm, validate, encode)
+    phases: dict[str, float] = field(default_factory=dict)
+    # Вкладеність ORM-викликів: selectinload і refresh виконуються всередині зовнішнього execute/flush
+    orm_depth: int = 0
+    orm_started: tuple[float, float] = (0.0, 0.0)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        timings = {"db": self.db_time, **self.phases, "total": total}
+        parts = [f"{name};dur={timings.get(name, 0.0) * 1000:.3f}" for name in (*SERVER_TIMING_PHASES, "total")]
+        parts[0] += f';desc="{len(self.durations)} statements"'
+        return ", ".join(parts)
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Додає час блоку до фази поточного запиту; поза запитом нічого не міряє."""
+    stats = _current_request.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(phase, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Одне значення, а не стек: інструкції на з'єднанні не вкладаються, а після помилки
+    # (коли after_cursor_execute не викликається) наступна інструкція його перезапише
+    conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("metrics_started")
+    stats = _current_request.get()
+    if stats is not None:
+        stats.durations.append(elapsed)
+        stats.db_time += elapsed
+    else:
+        DB_STATEMENTS.inc((BACKGROUND_ROUTE,))
+        DB_STATEMENT_DURATION.observe((BACKGROUND_ROUTE,), elapsed)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Підписує sync-engine (для AsyncEngine - engine.sync_engine) на лічильники SQL-інструкцій."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def uninstrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _orm_enter(stats: RequestStats) -> None:
+    if stats.orm_depth == 0:
+        stats.orm_started = (time.perf_counter(), stats.db_time)
+    stats.orm_depth += 1
+
+
+def _orm_exit(stats: RequestStats) -> None:
+    stats.orm_depth -= 1
+    if stats.orm_depth == 0:
+        started, db_time = stats.orm_started
+        stats.add("orm", time.perf_counter() - started - (stats.db_time - db_time))
+
+
+def _do_orm_execute(orm_execute_state):
+    stats = _current_request.get()
+    # Потокові результати (session.stream, yield_per) будують об'єкти вже після виклику - їх не міряємо
+    options = orm_execute_state.execution_options
+    if stats is None or options.get("yield_per") or options.get("stream_results"):
+        return None
+    _orm_enter(stats)
+    try:
+        # AsyncSession виконує з prebuffer_rows: рядки і ORM-об'єкти будуються тут же, всередині виклику
+        return orm_execute_state.invoke_statement()
+    finally:
+        _orm_exit(stats)
+
+
+def _before_flush(session, flush_context, instances):
+    stats = _current_request.get()
+    if stats is not None:
+        _orm_enter(stats)
+
+
+def _after_flush_postexec(session, flush_context):
+    stats = _current_request.get()
+    # Після невдалого flush цей хук не викликається - решта ORM-часу запиту тоді не рахується
+    if stats is not None and stats.orm_depth:
+        _orm_exit(stats)
+
+
+def instrument_orm() -> None:
+    """Хуки на всі сесії (зокрема ті, що віддають db.get_*_session) для фази orm у Server-Timing."""
+    if not event.contains(Session, "do_orm_execute", _do_orm_execute):
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_flush_postexec", _after_flush_postexec)
+
+
+class MetricsMiddleware:
+    """Чистий ASGI-middleware: без BaseHTTPMiddleware і додаткової задачі на запит."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code, streamed = 500, False
+        stats = RequestStats()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code, streamed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = message.get("headers", [])
+                streamed = any(name == b"content-type" and value.startswith(NDJSON_MEDIA_TYPE.encode())
+                               for name, value in headers)
+                # Тіло вже відрендерене (крім потокових відповідей) - всі фази до цього моменту відомі
+                timing = stats.server_timing(time.perf_counter() - started)
+                if server_timing_settings.header:
+                    message = {**message, "headers": [*headers, (b"server-timing", timing.encode())]}
+                if server_timing_settings.log:
+                    logger.info("Server-Timing %s %s %s: %s", scope["method"], scope["path"], status_code, timing)
+            await send(message)
+
+        token = _current_request.set(stats)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _current_request.reset(token)
+            # Роутер FastAPI кладе знайдений маршрут у той самий scope
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_DURATION.observe((scope["method"], template, status_code), elapsed)
+            if stats.durations:
+                DB_STATEMENTS.inc((template,), len(stats.durations))
+                for duration in stats.durations:
+                    DB_STATEMENT_DURATION.observe((template,), duration)
+        # Лише для запитів, що завершились без винятку - інакше перевірка сховала б справжню помилку.
+        # NDJSON-вивантаження читає курсор пачками, тож інструкцій там закономірно O(рядків / пачку)
+        if not streamed:
+            check_query_budget(route, scope["method"], len(stats.durations))
+
+
+def pool_metrics(pools: dict[str, dict]) -> list[Metric]:
+    """Стан пулів з Database.pool_metrics() як gauge/counter на момент збору."""
+    checked_out = Gauge("db_pool_checked_out", "Connections currently checked out.", ("pool",))
+    idle = Gauge("db_pool_idle", "Idle connections in the pool.", ("pool",))
+    overflow = Gauge("db_pool_overflow", "Overflow connections currently open.", ("pool",))
+    timeouts = Counter("db_pool_checkout_timeouts_total", "Checkouts that hit the pool timeout.", ("pool",))
+    for name, pool in pools.items():
+        checked_out.inc((name,), pool["checked_out"])
+        idle.inc((name,), pool["idle"])
+        overflow.inc((name,), pool["overflow"])
+        timeouts.inc((name,), pool["timeouts"])
+    return [checked_out, idle, overflow, timeouts]
@@ -0,0 +1,103 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import dataclass
+from typing import Annotated, Any, Optional, Sequence
+
+from fastapi import Depends, HTTPException, Query, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Курсор наступної сторінки віддаємо в заголовку, щоб тіло відповіді
+# лишалось звичайним списком (сумісність з існуючими клієнтами).
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Пакує значення ключів сортування останнього рядка в непрозорий курсор."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """Розпаковує курсор. Некоректний курсор - це помилка клієнта (400)."""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+
+    # Лише скаляри: вкладений список чи об'єкт SQLite не прив'яже як параметр (500 замість 400)
+    if (not isinstance(values, list) or len(values) != size
+            or not all(value is None or isinstance(value, (str, int, float, bool)) for value in values)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor."
+        )
+    return values
+
+
+@dataclass
+class PageParams:
+    limit: int
+    after: Optional[str] = None
+
+
+def get_page_params(
+        limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = Query(default=None, description="Курсор з заголовка X-Next-Cursor"),
+) -> PageParams:
+    return PageParams(limit=limit, after=after)
+
+
+PageDepend = Annotated[PageParams, Depends(get_page_params)]
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str] = None
+
+    def headers(self) -> dict[str, str]:
+        return {NEXT_CURSOR_HEADER: self.next_cursor} if self.next_cursor else {}
+
+    def apply_headers(self, response: Response) -> None:
+        response.headers.update(self.headers())
+
+
+async def paginate(
+        session: AsyncSession,
+        query: Select,
+        page: PageParams,
+        *keys,
+        rows: bool = False,
+        descending: bool = False,
+) -> Page:
+    """
+    Keyset-пагінація: замість OFFSET робимо seek по ключах сортування
+    (WHERE (k1, k2) > (:v1, :v2) ORDER BY k1, k2 LIMIT n), тому час
+    відповіді не залежить від глибини сторінки.
+
+    `keys` - змаплені атрибути моделі; останній має бути унікальним (зазвичай id).
+    За замовчуванням повертає ORM-об'єкти; `rows=True` - рядки (для запитів по колонках).
+    `descending=True` - сортування за спаданням по всіх ключах.
+    """
+    if page.after is not None:
+        values = decode_cursor(page.after, len(keys))
+        left = keys[0] if len(keys) == 1 else tuple_(*keys)
+        right = values[0] if len(keys) == 1 else tuple_(*values)
+        query = query.where(left < right if descending else left > right)
+
+    # Беремо на один рядок більше, щоб знати, чи є наступна сторінка
+    order_by = [key.desc() for key in keys] if descending else keys
+    query = query.order_by(*order_by).limit(page.limit + 1)
+    result = await session.execute(query)
+    items = list(result.all() if rows else result.scalars().all())
+
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        next_cursor = encode_cursor([getattr(items[-1], key.key) for key in keys])
+
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,181 @@
+"""
+Хешування паролів поза event loop.
+
+PBKDF2-SHA256 зі stdlib: hashlib.pbkdf2_hmac відпускає GIL на час обчислення,
+тому обмежений пул потоків рахує хеші паралельно з обробкою інших запитів -
+сотні мілісекунд CPU на хеш не зупиняють читання каталогу. Пул обмежений:
+не більше workers хешів одночасно і max_queue в черзі; решта одразу отримує
+PasswordHashingBusy (503 з Retry-After), щоб сплеск реєстрацій не накопичував
+нескінченну чергу.
+
+Формат: pbkdf2_sha256$<ітерації>$<сіль base64>$<хеш base64>. Рядки без
+префікса - паролі, збережені до хешування; verify їх приймає, needs_rehash
+каже їх перезаписати. Пошкоджений хеш з префіксом не проходить verify.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, TypeVar
+
+from app.core.utils.metrics import Counter, Gauge, Histogram, registry
+
+T = TypeVar("T")
+
+SCHEME = "pbkdf2_sha256"
+
+PASSWORD_HASH_IN_FLIGHT = registry.register(Gauge(
+    "password_hash_in_flight", "Password hash/verify jobs running on the hashing pool.",
+))
+PASSWORD_HASH_QUEUED = registry.register(Gauge(
+    "password_hash_queue_depth", "Password hash/verify jobs waiting for a free hashing worker.",
+))
+PASSWORD_HASH_REJECTED = registry.register(Counter(
+    "password_hash_rejected_total", "Password hash/verify jobs rejected because the hashing queue was full.",
+))
+PASSWORD_HASH_DURATION = registry.register(Histogram(
+    "password_hash_duration_seconds", "Password hash/verify time including the queue wait, by operation.",
+    ("operation",),
+))
+
+
+class PasswordHashingBusy(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class PasswordHashSettings:
+    # Вартість: ітерації PBKDF2 (рекомендація OWASP для SHA-256 - 600 000)
+    iterations: int = 600_000
+    # Потоки пулу; 0 - хешувати прямо в event loop (лише для порівняння в бенчмарку)
+    workers: int = max(1, (os.cpu_count() or 2) // 2)
+    # Скільки задач може чекати на вільний потік понад workers
+    max_queue: int = 32
+
+
+def password_hash_settings_from_env() -> PasswordHashSettings:
+    """PASSWORD_HASH_ITERATIONS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE."""
+    defaults = PasswordHashSettings()
+    return PasswordHashSettings(
+        iterations=int(os.environ.get("PASSWORD_HASH_ITERATIONS", defaults.iterations)),
+        workers=int(os.environ.get("PASSWORD_HASH_WORKERS", defaults.workers)),
+        max_queue=int(os.environ.get("PASSWORD_HASH_QUEUE", defaults.max_queue)),
+    )
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(value: str) -> bytes:
+    return base64.b64decode(value + "=" * (-len(value) % 4))
+
+
+def hash_password_sync(password: str, iterations: int) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{SCHEME}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password_sync(password: str, stored: str) -> bool:
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != SCHEME:
+        # Пароль, записаний до хешування
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, iterations, salt, expected = parts
+    try:
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), _unb64(salt), int(iterations))
+        return hmac.compare_digest(digest, _unb64(expected))
+    except ValueError:
+        # Нечислові ітерації або зіпсований base64 (binascii.Error - теж ValueError)
+        return False
+
+
+class PasswordHasher:
+    def __init__(self, settings: PasswordHashSettings):
+        self.settings = settings
+        self.executor: Optional[ThreadPoolExecutor] = None
+        # Прийняті задачі (виконуються + в черзі); змінюється лише в event loop
+        self.pending = 0
+        self._update_gauges()
+
+    def needs_rehash(self, stored: str) -> bool:
+        parts = stored.split("$")
+        if len(parts) != 4 or parts[0] != SCHEME:
+            return True
+        try:
+            return int(parts[1]) < self.settings.iterations
+        except ValueError:
+            return True
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", hash_password_sync, password, self.settings.iterations)
+
+    async def verify(self, password: str, stored: Optional[str]) -> bool:
+        """Перевіряє пароль; без збереженого хешу (немає користувача) все одно витрачає той самий час."""
+        if stored is None:
+            await self._submit("verify", hash_password_sync, password, self.settings.iterations)
+            return False
+        return await self._submit("verify", verify_password_sync, password, stored)
+
+    async def _submit(self, operation: str, fn: Callable[..., T], *args) -> T:
+        started = time.perf_counter()
+        if self.settings.workers <= 0:
+            result = fn(*args)
+            PASSWORD_HASH_DURATION.observe((operation,), time.perf_counter() - started)
+            return result
+
+        if self.pending >= self.settings.workers + self.settings.max_queue:
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHashingBusy("Password hashing queue is full.")
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.settings.workers, thread_name_prefix="password-hash")
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self._update_gauges()
+        job = self.executor.submit(fn, *args)
+        # Задача звільняє місце, коли завершилась у пулі, а не коли перестали чекати: скасований
+        # запит (клієнт відключився) лишає хеш рахуватись, і він має далі займати ліміт
+        job.add_done_callback(lambda _: self._call_in_loop(loop, self._job_done))
+        try:
+            return await asyncio.wrap_future(job)
+        finally:
+            PASSWORD_HASH_DURATION.observe((operation,), time.perf_counter() - started)
+
+    @staticmethod
+    def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+        # Done-callback викликається в потоці пулу; pending змінюємо лише в event loop
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # Loop вже закрито (зупинка процесу) - рахувати більше нікому
+            pass
+
+    def _job_done(self) -> None:
+        self.pending -= 1
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        running = min(self.pending, self.settings.workers)
+        PASSWORD_HASH_IN_FLIGHT.set((), running)
+        PASSWORD_HASH_QUEUED.set((), self.pending - running)
+
+    def configure(self, settings: PasswordHashSettings) -> None:
+        """Нові налаштування; пул перестворюється при наступному хешуванні."""
+        self.close()
+        self.settings = settings
+
+    def close(self) -> None:
+        if self.executor:
+            # Задачі, що вже рахуються, дораховуються у своїх потоках; чергу скасовуємо
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+password_hasher = PasswordHasher(password_hash_settings_from_env())
@@ -0,0 +1,56 @@
+"""
+Бюджет SQL-інструкцій на ендпоінт - запобіжник від N+1.
+
+Обробник позначається декоратором під @router.<method>:
+
+    @router.get("/", ...)
+    @query_budget(3)
+    async def get_orders(...): ...
+
+MetricsMiddleware після кожного запиту порівнює кількість інструкцій
+(подій before_cursor_execute) з бюджетом маршруту. Перевищення в роботі
+пишеться в лог, а в суворому режимі (тести, QUERY_BUDGET_STRICT=1)
+стає помилкою запиту. Бюджет - стала, тож ріст з кількістю рядків
+(забутий selectinload) його рано чи пізно перевищить.
+"""
+import logging
+import os
+from typing import Callable, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryBudgetSettings:
+    def __init__(self):
+        self.strict = os.environ.get("QUERY_BUDGET_STRICT", "").lower() in ("1", "true", "on", "yes")
+
+
+query_budget_settings = QueryBudgetSettings()
+
+
+def query_budget(limit: int) -> Callable[[F], F]:
+    """Максимальна кількість SQL-інструкцій на один виклик ендпоінта."""
+    def decorator(endpoint: F) -> F:
+        endpoint.query_budget = limit
+        return endpoint
+    return decorator
+
+
+def budget_of(route) -> Optional[int]:
+    return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+
+def check_query_budget(route, method: str, statements: int) -> None:
+    limit = budget_of(route)
+    if limit is None or statements <= limit:
+        return
+    message = f"{method} {route.path} ran {statements} SQL statements, budget is {limit}"
+    if query_budget_settings.strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning("Query budget exceeded: %s", message)
@@ -0,0 +1,48 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.utils.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # orjson - необов'язкова залежність, без неї працює stdlib json
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Типи, яких немає в JSON: гроші (Numeric -> Decimal) і дати (для stdlib json)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON в bytes: orjson, якщо встановлений, інакше stdlib json з тим самим компактним форматом."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse через orjson. Вмикається на рівні роутера:
+    APIRouter(..., default_response_class=FastJSONResponse).
+
+    Через нього йдуть лише відповіді, які FastAPI серіалізує сам (записи, звіти) -
+    після jsonable_encoder, тож тут виграє тільки швидший dumps. GET-списки і
+    деталі пишуть байти самі: рядки проєкції - тим самим dumps (Projection.dump),
+    ORM-об'єкти через схему - dump_json pydantic-core (View.render), який на
+    валідованих моделях швидший за dump_python + orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with timed("encode"):
+            return dumps(content)
@@ -0,0 +1,41 @@
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Скільки рядків тягнемо з курсора за раз (і скільки рядків в одному чанку відповіді)
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Клієнт просить потоковий режим через `Accept: application/x-ndjson`."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def stream_ndjson(
+        session: AsyncSession,
+        query: Select,
+        schema: type[BaseModel],
+        chunk_size: int = STREAM_CHUNK_SIZE,
+) -> StreamingResponse:
+    """
+    Віддає результат запиту як NDJSON (один JSON-об'єкт на рядок).
+
+    Рядки читаються через серверний курсор (`session.stream` + `yield_per`)
+    пачками по `chunk_size`, кожен серіалізується існуючою схемою відповіді
+    і одразу йде клієнту - в пам'яті ніколи не лежить вся таблиця.
+    """
+    async def lines() -> AsyncIterator[bytes]:
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.scalars().partitions():
+            yield b"".join(
+                schema.model_validate(obj).model_dump_json().encode() + b"\n"
+                for obj in partition
+            )
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,229 @@
+"""
+Масштабування ендпоінтів: латентність, кількість запитів до БД і пам'ять
+на синтетичних даних різного розміру.
+
+Для кожного розміру (кількість товарів) окремий процес засіває тимчасову
+SQLite-базу, піднімає застосунок (lifespan) і ганяє роутери in-process через
+httpx.ASGITransport. Для кожного ендпоінта пишеться p50/p95/p99, середня
+кількість SQL-інструкцій на запит і пік RSS процесу (наростаючий по ходу
+прогону, тому ендпоінти йдуть від легких до важких).
+
+Результат - JSON (з комітом і параметрами), який можна порівняти з
+попереднім прогоном через --compare.
+
+    python -m benchmarks.bench_endpoints --sizes 1000 100000 --output bench.json
+    python -m benchmarks.bench_endpoints --sizes 1000 --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from app.core.models import BaseModel
+
+# Ендпоінти від легких до важких; {mid} - id товару з середини таблиці
+ENDPOINTS = {
+    "GET /products/{id}": "/products/{mid}",
+    "GET /products/ limit=50": "/products/?limit=50",
+    "GET /products/ deep page": "/products/?limit=50&after={mid_cursor}",
+    "GET /products/ filtered": "/products/?category_id=1&in_stock=true&sort=price&limit=50",
+    "GET /products/ limit=500": "/products/?limit=500",
+    "GET /products/search": "/products/search?q=prod&limit=50",
+    "GET /orders/ limit=50": "/orders/?limit=50",
+    "GET /order_items/ limit=50": "/order_items/?limit=50",
+    "GET /users/ limit=50": "/users/?limit=50",
+    "GET /categories/ limit=50": "/categories/?limit=50",
+    "GET /brands/ limit=50": "/brands/?limit=50",
+}
+
+
+def seed(path: Path, products: int) -> dict[str, int]:
+    """Схема через metadata.create_all, дані - executemany через sqlite3."""
+    engine = create_engine(f"sqlite:///{path}")
+    BaseModel.metadata.create_all(engine)
+    engine.dispose()
+
+    counts = {
+        "products": products,
+        "brands": max(10, products // 1000),
+        "categories": max(5, products // 5000),
+        "users": max(10, products // 10),
+        "orders": max(10, products // 5),
+    }
+    rnd = random.Random(42)
+    started = datetime(2024, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO categories (id, name, version) VALUES (?, ?, 1)",
+                     [(i, f"Category {i}") for i in range(1, counts["categories"] + 1)])
+    conn.executemany("INSERT INTO brands (id, name, description, version) VALUES (?, ?, NULL, 1)",
+                     [(i, f"Brand {i}") for i in range(1, counts["brands"] + 1)])
+    conn.executemany(
+        "INSERT INTO products (id, name, description, price, in_stock, category_id, brand_id, version) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+        (
+            (i, f"Product {i}", f"Description of product {i}", round(rnd.uniform(10, 1000), 2),
+             rnd.random() < 0.8, rnd.randint(1, counts["categories"]), rnd.randint(1, counts["brands"]))
+            for i in range(1, products + 1)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO users (id, email, password, first_name, last_name, phone_number, version) "
+        "VALUES (?, ?, 'x', 'First', 'Last', NULL, 1)",
+        ((i, f"user{i}@example.com") for i in range(1, counts["users"] + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, order_date, status, total_amount, shipping_address, version) "
+        "VALUES (?, ?, ?, 'new', 0, NULL, 1)",
+        (
+            (i, rnd.randint(1, counts["users"]), (started + timedelta(minutes=i)).isoformat(" "))
+            for i in range(1, counts["orders"] + 1)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (?, ?, ?, 10.0)",
+        (
+            (order_id, rnd.randint(1, products), rnd.randint(1, 3))
+            for order_id in range(1, counts["orders"] + 1) for _ in range(3)
+        ),
+    )
+    conn.execute("UPDATE orders SET total_amount = "
+                 "(SELECT SUM(quantity * unit_price) FROM order_items WHERE order_id = orders.id)")
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss на Linux - в кілобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def drive(path: Path, counts: dict[str, int], requests: int, warmup: int, cached: bool) -> dict:
+    from asgi_lifespan import LifespanManager
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.settings.db import db
+    from app.core.utils.cache import response_cache
+    from app.core.utils.metrics import BACKGROUND_ROUTE, DB_STATEMENTS
+    from app.core.utils.pagination import encode_cursor
+    from main import app
+
+    db.url = f"sqlite+aiosqlite:///{path}"
+    mid = counts["products"] // 2
+
+    def request_statements() -> float:
+        # Ті самі лічильники, що й /metrics: інструкції і писача, і читацького пулу,
+        # але без фонових (проби здоров'я), які могли б потрапити між запитами
+        return sum(value for (route,), value in DB_STATEMENTS.values.items() if route != BACKGROUND_ROUTE)
+
+    results = {}
+    async with LifespanManager(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            for name, url in ENDPOINTS.items():
+                url = url.format(mid=mid, mid_cursor=encode_cursor([mid]))
+                timings, queries = [], []
+                for i in range(warmup + requests):
+                    if not cached:
+                        response_cache.clear()
+                    statements = request_statements()
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    response.raise_for_status()
+                    if i >= warmup:
+                        timings.append(elapsed)
+                        queries.append(request_statements() - statements)
+                results[name] = {
+                    "url": url,
+                    "p50_ms": round(percentile(timings, 50), 3),
+                    "p95_ms": round(percentile(timings, 95), 3),
+                    "p99_ms": round(percentile(timings, 99), 3),
+                    "queries_per_request": round(statistics.mean(queries), 2),
+                    "response_bytes": len(response.content),
+                    "peak_rss_mb": round(peak_rss_mb(), 1),
+                }
+    return results
+
+
+def run_size(size: int, requests: int, warmup: int, cached: bool) -> dict:
+    """Один розмір даних - в окремому процесі, щоб пік RSS не змішувався між розмірами."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        started = time.perf_counter()
+        counts = seed(path, size)
+        seed_s = time.perf_counter() - started
+        endpoints = asyncio.run(drive(path, counts, requests, warmup, cached))
+    return {"size": size, "rows": counts, "seed_s": round(seed_s, 2), "endpoints": endpoints}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: dict | None) -> None:
+    previous = {}
+    if baseline:
+        previous = {(run["size"], name): stats
+                    for run in baseline["runs"] for name, stats in run["endpoints"].items()}
+    for run in report["runs"]:
+        print(f"\nsize={run['size']} {run['rows']} (seeded in {run['seed_s']}s)")
+        print(f"  {'endpoint':<28}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'rss MB':>9}")
+        for name, stats in run["endpoints"].items():
+            line = (f"  {name:<28}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+                    f"{stats['queries_per_request']:>9}{stats['peak_rss_mb']:>9}")
+            if old := previous.get((run["size"], name)):
+                line += f"   p50 x{stats['p50_ms'] / old['p50_ms']:.2f} vs {baseline['commit']}"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="кількість товарів; решта таблиць масштабується пропорційно")
+    parser.add_argument("--requests", type=int, default=50, help="запитів на ендпоінт")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--cached", action="store_true", help="не скидати кеш відповідей між запитами")
+    parser.add_argument("--output", type=Path, default=Path("bench-endpoints.json"))
+    parser.add_argument("--compare", type=Path, help="попередній JSON для порівняння p50")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for size in args.sizes:
+        with context.Pool(1) as pool:
+            runs.append(pool.apply(run_size, (size, args.requests, args.warmup, args.cached)))
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": {"requests": args.requests, "warmup": args.warmup, "cached": args.cached},
+        "runs": runs,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(report, baseline)
+    print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
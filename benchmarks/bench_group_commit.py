@@ -0,0 +1,98 @@
+"""
+POST /orders/ з різною кількістю паралельних клієнтів: commit на кожен запит
+проти групового commit (Database(group_commit=...)).
+
+Кожен прогін - окремий процес з тимчасовою базою (generate_data) і вказаним
+SQLite-профілем; за замовчуванням durable (synchronous = FULL), де кожен
+commit - це fsync. Застосунок ганяється in-process через httpx.ASGITransport.
+
+    python -m benchmarks.bench_group_commit --concurrency 1 8 32 128 --duration 3
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.commands.generate_data import GenerateConfig
+from app.core.settings.db import SQLITE_PROFILES, GroupCommitSettings
+
+USERS = 1000
+
+
+async def drive(path: Path, profile: str, group_commit: GroupCommitSettings | None, concurrency: int,
+                duration: float) -> dict:
+    from asgi_lifespan import LifespanManager
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.commands.generate_data import generate_data
+    from app.core.settings.db import db
+    from main import app
+
+    db.url = f"sqlite+aiosqlite:///{path}"
+    db.sqlite_profile = SQLITE_PROFILES[profile]
+    db.group_commit = group_commit
+    latencies, errors = [], 0
+
+    async def client_loop(client: AsyncClient, deadline: float) -> None:
+        nonlocal errors
+        rnd = random.Random()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/orders/", json={"user_id": rnd.randint(1, USERS), "status": "new"})
+            if response.status_code != 201:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async with LifespanManager(app):
+        await generate_data(db.engine, GenerateConfig(categories=5, brands=10, products=100, users=USERS, orders=0))
+        # generate_data лишає на з'єднанні писача synchronous = OFF - беремо свіжий пул з профілем
+        await db.disconnect()
+        await db.connect()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(*(client_loop(client, deadline) for _ in range(concurrency)))
+        committer = db.committer
+        units_per_commit = committer.units / committer.batches if committer and committer.batches else 1.0
+
+    return {
+        "writes_per_s": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0,
+        "units_per_commit": units_per_commit,
+        "errors": errors,
+    }
+
+
+def run(profile: str, group_commit: GroupCommitSettings | None, concurrency: int, duration: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        return asyncio.run(drive(Path(tmp) / "orders.db", profile, group_commit, concurrency, duration))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--profile", choices=list(SQLITE_PROFILES), default="durable")
+    parser.add_argument("--delay-ms", type=float, default=2.0, help="max_delay групового commit")
+    parser.add_argument("--batch", type=int, default=64, help="max_batch групового commit")
+    args = parser.parse_args()
+
+    modes = {"per-request": None, "group": GroupCommitSettings(args.delay_ms / 1000, args.batch)}
+    context = multiprocessing.get_context("spawn")
+    print(f"profile={args.profile}")
+    print(f"  {'mode':<13}{'clients':>8}{'writes/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'per commit':>12}{'errors':>8}")
+    for concurrency in args.concurrency:
+        for mode, settings in modes.items():
+            with context.Pool(1) as pool:
+                row = pool.apply(run, (args.profile, settings, concurrency, args.duration))
+            print(f"  {mode:<13}{concurrency:>8}{row['writes_per_s']:>10.0f}{row['p50_ms']:>9.2f}"
+                  f"{row['p95_ms']:>9.2f}{row['units_per_commit']:>12.1f}{row['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Серіалізація відповідей існуючими схемами: стандартний JSONResponse (stdlib json)
+проти FastJSONResponse (orjson) і прямого dump_json pydantic-core.
+
+Кожен рядок - сторінка з --rows об'єктів однієї схеми, як її серіалізує FastAPI:
+schema -> dump_python(mode="json") -> response.render(). Рядки "dicts" - готові
+dict без схеми, як їх збирає Projection для GET товарів: to_json проти dumps.
+
+    python -m benchmarks.bench_json --rows 5000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from app.core.schemas.brands import BrandResponseSchema
+from app.core.schemas.order_items import OrderItemResponseSchema
+from app.core.schemas.orders import OrderResponseSchema
+from app.core.schemas.products import ProductResponseSchema
+from app.core.schemas.users import UserResponseSchema
+from app.core.utils.responses import FastJSONResponse, dumps, orjson
+
+
+def sample(schema, rows: int) -> list:
+    """Синтетичні об'єкти схеми (без БД) з вкладеними зв'язками і датами."""
+    now = datetime(2025, 11, 1, 12, 30)
+    data = []
+    for i in range(1, rows + 1):
+        if schema is ProductResponseSchema:
+            row = {"id": i, "name": f"Кросівки {i}", "description": "Бігові кросівки", "price": 99.99 + i,
+                   "in_stock": i % 3 != 0, "category": {"id": 1, "name": "Взуття"},
+                   "brand": {"id": 2, "name": "Adidas", "description": None}}
+        elif schema is OrderResponseSchema:
+            row = {"id": i, "user_id": 7, "status": "new", "shipping_address": "Київ, вул. Хрещатик, 1",
+                   "order_date": now - timedelta(minutes=i), "total_amount": 199.5,
+                   "user": {"id": 7, "email": "user@example.com", "first_name": "Олена"},
+                   "items": [{"id": i * 2 + k, "product_id": k + 1, "quantity": 1, "unit_price": 99.75}
+                             for k in range(2)]}
+        elif schema is UserResponseSchema:
+            row = {"id": i, "email": f"user{i}@example.com", "first_name": "Олена", "last_name": "Коваль",
+                   "phone_number": None,
+                   "orders": [{"id": i, "order_date": now, "status": "paid", "total_amount": 10.0}]}
+        elif schema is BrandResponseSchema:
+            row = {"id": i, "name": f"Brand {i}", "description": None,
+                   "products": [{"id": k, "name": f"P{k}", "price": 10.0} for k in range(1, 4)]}
+        else:
+            row = {"id": i, "order_id": 1, "product_id": 2, "quantity": 2, "unit_price": 49.9,
+                   "order": {"id": 1, "status": "new", "total_amount": 99.8},
+                   "product": {"id": 2, "name": "Samba", "price": 49.9}}
+        data.append(schema.model_validate(row))
+    return data
+
+
+def median_ms(func, repeat: int) -> tuple[float, int]:
+    timings, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(func())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed - FastJSONResponse falls back to stdlib json\n")
+
+    schemas = [ProductResponseSchema, OrderResponseSchema, UserResponseSchema,
+               BrandResponseSchema, OrderItemResponseSchema]
+    for schema in schemas:
+        adapter = TypeAdapter(list[schema])
+        items = sample(schema, args.rows)
+        content = adapter.dump_python(items, mode="json")
+        rows = adapter.dump_python(items)
+        stdlib = JSONResponse(content=None)
+        fast = FastJSONResponse(content=None)
+        variants = {
+            "stdlib JSONResponse": lambda: stdlib.render(adapter.dump_python(items, mode="json")),
+            "FastJSONResponse": lambda: fast.render(adapter.dump_python(items, mode="json")),
+            "render only, stdlib": lambda: stdlib.render(content),
+            "render only, orjson": lambda: fast.render(content),
+            "pydantic dump_json": lambda: adapter.dump_json(items),
+            "dicts, to_json": lambda: to_json(rows),
+            "dicts, dumps": lambda: dumps(rows),
+        }
+        print(f"{schema.__name__} x {args.rows}")
+        for name, func in variants.items():
+            ms, size = median_ms(func, args.repeat)
+            print(f"  {name:<22} {ms:8.2f} ms  {size:>10} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Сплеск реєстрацій (POST /users/) поруч з читанням каталогу (GET /products/{id}):
+хешування паролів прямо в event loop (workers=0) проти обмеженого пулу потоків.
+
+Кожен прогін - окремий процес з тимчасовою базою (generate_data). Міряється
+затримка читань: з хешуванням в loop кожна реєстрація зупиняє всі запити на
+час хешу, з пулом читання чекають лише на CPU. 503 від переповненої черги
+рахуються окремо - це і є зворотний тиск.
+
+    python -m benchmarks.bench_password_hashing --signups 8 --readers 8 --duration 3
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from app.core.commands.generate_data import GenerateConfig
+from app.core.utils.passwords import PasswordHashSettings
+
+PRODUCTS = 1000
+
+
+async def drive(path: Path, settings: PasswordHashSettings, signups: int, readers: int, duration: float) -> dict:
+    from asgi_lifespan import LifespanManager
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core.commands.generate_data import generate_data
+    from app.core.settings.db import db
+    from app.core.utils.passwords import password_hasher
+    from main import app
+
+    db.url = f"sqlite+aiosqlite:///{path}"
+    password_hasher.configure(settings)
+    reads, created, rejected = [], 0, 0
+
+    async def reader(client: AsyncClient, deadline: float) -> None:
+        rnd = random.Random()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await client.get(f"/products/{rnd.randint(1, PRODUCTS)}")
+            reads.append((time.perf_counter() - started) * 1000)
+
+    async def signup(client: AsyncClient, deadline: float) -> None:
+        nonlocal created, rejected
+        while time.perf_counter() < deadline:
+            response = await client.post("/users/", json={
+                "email": f"{uuid.uuid4().hex}@example.com", "password": "correct horse battery staple"
+            })
+            if response.status_code == 201:
+                created += 1
+            elif response.status_code == 503:
+                rejected += 1
+
+    async with LifespanManager(app):
+        await generate_data(db.engine, GenerateConfig(categories=5, brands=10, products=PRODUCTS, users=10, orders=0))
+        # generate_data лишає на з'єднанні писача synchronous = OFF - беремо свіжий пул з профілем
+        await db.disconnect()
+        await db.connect()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(
+                *(reader(client, deadline) for _ in range(readers)),
+                *(signup(client, deadline) for _ in range(signups)),
+            )
+
+    return {
+        "reads_per_s": len(reads) / duration,
+        "read_p50_ms": statistics.median(reads) if reads else 0.0,
+        "read_p99_ms": statistics.quantiles(reads, n=100)[-1] if len(reads) > 1 else 0.0,
+        "signups_per_s": created / duration,
+        "rejected": rejected,
+    }
+
+
+def run(settings: PasswordHashSettings, signups: int, readers: int, duration: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        return asyncio.run(drive(Path(tmp) / "passwords.db", settings, signups, readers, duration))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signups", type=int, default=8, help="паралельних клієнтів реєстрації")
+    parser.add_argument("--readers", type=int, default=8, help="паралельних клієнтів каталогу")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--iterations", type=int, default=PasswordHashSettings.iterations)
+    parser.add_argument("--workers", type=int, default=PasswordHashSettings.workers)
+    parser.add_argument("--queue", type=int, default=PasswordHashSettings.max_queue)
+    args = parser.parse_args()
+
+    modes = {
+        "inline": PasswordHashSettings(args.iterations, workers=0),
+        "pool": PasswordHashSettings(args.iterations, args.workers, args.queue),
+    }
+    context = multiprocessing.get_context("spawn")
+    print(f"iterations={args.iterations} workers={args.workers} queue={args.queue}")
+    print(f"  {'mode':<8}{'reads/s':>9}{'read p50':>10}{'read p99':>10}{'signups/s':>11}{'503':>6}")
+    for mode, settings in modes.items():
+        with context.Pool(1) as pool:
+            row = pool.apply(run, (settings, args.signups, args.readers, args.duration))
+        print(f"  {mode:<8}{row['reads_per_s']:>9.0f}{row['read_p50_ms']:>10.2f}{row['read_p99_ms']:>10.2f}"
+              f"{row['signups_per_s']:>11.1f}{row['rejected']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Фільтри каталогу на великій таблиці: план запиту і час з індексами і без.
+
+Запити будуються тими самими filter_products / PRODUCT_SORT_KEYS, що й у
+GET /products/, тому бенчмарк показує реальні запити роутера.
+
+    python -m benchmarks.bench_product_filters --products 200000
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import sqlite
+
+from app.core.models import BaseModel, Product
+from app.core.routers.products import filter_products, product_sort
+from app.core.schemas.products import ProductFilterSchema
+
+PAGE_SIZE = 50
+INDEXES = ["ix_products_category_stock_price", "ix_products_brand_price", "ix_products_price"]
+
+SCENARIOS = {
+    "category + in_stock + price range, by price": ProductFilterSchema(
+        category_id=3, in_stock=True, min_price=50, max_price=150, sort="price"),
+    "brand, by price desc": ProductFilterSchema(brand_id=7, sort="-price"),
+    "brand + max price, by price": ProductFilterSchema(brand_id=7, max_price=150, sort="price"),
+    "price range, by price": ProductFilterSchema(min_price=100, max_price=110, sort="price"),
+    "whole catalog, by id": ProductFilterSchema(),
+}
+
+
+def seed(path: Path, products: int, brands: int, categories: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    BaseModel.metadata.create_all(engine)
+    engine.dispose()
+
+    rnd = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO categories (id, name, version) VALUES (?, ?, 1)",
+                     [(i, f"Category {i}") for i in range(1, categories + 1)])
+    conn.executemany("INSERT INTO brands (id, name, version) VALUES (?, ?, 1)",
+                     [(i, f"Brand {i}") for i in range(1, brands + 1)])
+    conn.executemany(
+        "INSERT INTO products (id, name, description, price, in_stock, category_id, brand_id, version) "
+        "VALUES (?, ?, NULL, ?, ?, ?, ?, 1)",
+        (
+            (i, f"Product {i}", round(rnd.uniform(10, 1000), 2), rnd.random() < 0.8,
+             rnd.randint(1, categories), rnd.randint(1, brands))
+            for i in range(1, products + 1)
+        ),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def compile_query(filters: ProductFilterSchema) -> str:
+    sort_keys, descending = product_sort(filters)
+    order_by = [key.desc() for key in sort_keys] if descending else sort_keys
+    query = filter_products(select(Product), filters).order_by(*order_by).limit(PAGE_SIZE + 1)
+    return str(query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def run(conn: sqlite3.Connection, sql: str, repeat: int) -> tuple[str, float]:
+    plan = "; ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return plan, statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--brands", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.db"
+        started = time.perf_counter()
+        seed(path, args.products, args.brands, args.categories)
+        print(f"seeded {args.products} products in {time.perf_counter() - started:.1f}s\n")
+
+        conn = sqlite3.connect(path)
+        results = {}
+        for label in ("with indexes", "without indexes"):
+            if label == "without indexes":
+                for index in INDEXES:
+                    conn.execute(f"DROP INDEX {index}")
+                conn.execute("ANALYZE")
+            for name, filters in SCENARIOS.items():
+                results.setdefault(name, {})[label] = run(conn, compile_query(filters), args.repeat)
+        conn.close()
+
+    for name, by_label in results.items():
+        print(name)
+        for label, (plan, median_ms) in by_label.items():
+            print(f"  {label:<16} {median_ms:8.2f} ms  {plan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Сторінка GET /products/: ORM-шлях (Product + selectinload + from_attributes)
+проти швидкого Core-шляху (product_rows_query + Projection).
+
+Обидва шляхи - ті самі запити і серіалізація, що в роутері (до і після
+переходу на Core-рядки); перед заміром перевіряється, що тіла збігаються байт в байт.
+
+    python -m benchmarks.bench_product_list --products 20000 --limit 50 --limit 500
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from app.core.models import Product
+from app.core.routers.products import product_rows_query, product_view
+from app.core.schemas.products import ProductResponseSchema
+from app.core.utils.cache import serialize
+from app.core.utils.pagination import PageParams, paginate
+from app.core.utils.projection import projection
+from benchmarks.bench_product_filters import seed
+
+
+async def orm_page(session_maker, limit: int) -> bytes:
+    async with session_maker() as session:
+        query = select(Product).options(selectinload(Product.category), selectinload(Product.brand))
+        page = await paginate(session, query, PageParams(limit=limit), Product.id)
+        return serialize(ProductResponseSchema, page.items)
+
+
+async def core_page(session_maker, limit: int) -> bytes:
+    view = product_view(fields=None, embed=None)
+    async with session_maker() as session:
+        page = await paginate(session, product_rows_query(view), PageParams(limit=limit), Product.id, rows=True)
+        return projection(Product, view.schema).dump(page.items)
+
+
+async def measure(page, session_maker, limit: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await page(session_maker, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def bench(path: Path, limits: list[int], repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    for limit in limits:
+        orm_body, core_body = await orm_page(session_maker, limit), await core_page(session_maker, limit)
+        assert orm_body == core_body, "Core path output differs from the ORM path"
+
+        orm_ms = await measure(orm_page, session_maker, limit, repeat)
+        core_ms = await measure(core_page, session_maker, limit, repeat)
+        print(f"limit={limit:<5} orm {orm_ms:8.2f} ms   core {core_ms:8.2f} ms   x{orm_ms / core_ms:.1f}")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--brands", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--limit", type=int, action="append", help="розмір сторінки (можна кілька)")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.db"
+        seed(path, args.products, args.brands, args.categories)
+        asyncio.run(bench(path, args.limit or [50, 500], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Змішане навантаження читання/запис під кожним SQLite-профілем з app.core.settings.db.
+
+Для кожного профілю окремий процес генерує тимчасову базу (generate_data),
+підключає Database з цим профілем і на --duration секунд запускає паралельно
+--readers читачів (сторінка товарів від випадкового id, читацький пул) і --writers писачів
+(замовлення з двома позиціями в одній транзакції, як POST /orders/ + /order_items/).
+Помилки "database is locked" рахуються окремо - саме їх прибирає WAL + busy_timeout.
+
+    python -m benchmarks.bench_sqlite_profiles --readers 6 --writers 2 --duration 5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.core.commands.generate_data import GenerateConfig, generate_data
+from app.core.models import Order, OrderItem, Product
+from app.core.settings.db import SQLITE_PROFILES, Database
+
+
+async def reader(database: Database, products: int, deadline: float, stats: dict) -> None:
+    rnd = random.Random()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with database.read_session_maker() as session:
+                query = select(Product).where(Product.id > rnd.randrange(products)).order_by(Product.id).limit(50)
+                (await session.scalars(query)).all()
+        except OperationalError:
+            stats["read_errors"] += 1
+            continue
+        stats["reads"].append((time.perf_counter() - started) * 1000)
+
+
+async def writer(database: Database, users: int, products: int, deadline: float, stats: dict) -> None:
+    rnd = random.Random()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with database.session_maker() as session:
+                order = Order(user_id=rnd.randint(1, users), status="new", total_amount=0)
+                session.add(order)
+                await session.flush()
+                total = 0.0
+                for product_id in rnd.sample(range(1, products + 1), 2):
+                    session.add(OrderItem(order_id=order.id, product_id=product_id, quantity=1, unit_price=10.0))
+                    total += 10.0
+                order.total_amount = total
+                await session.commit()
+        except OperationalError:
+            stats["write_errors"] += 1
+            continue
+        stats["writes"].append((time.perf_counter() - started) * 1000)
+
+
+async def bench(name: str, path: Path, config: GenerateConfig, readers: int, writers: int,
+                duration: float) -> dict:
+    database = Database(f"sqlite+aiosqlite:///{path}", SQLITE_PROFILES[name])
+    await database.connect()
+    try:
+        await generate_data(database.engine, config)
+        # generate_data вмикає synchronous = OFF на своїх з'єднаннях - беремо свіжий пул з чистим профілем
+        await database.disconnect()
+        await database.connect()
+        storage = await database.storage_report()
+        stats = {"reads": [], "writes": [], "read_errors": 0, "write_errors": 0}
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(reader(database, config.products, deadline, stats) for _ in range(readers)),
+            *(writer(database, config.users, config.products, deadline, stats) for _ in range(writers)),
+        )
+    finally:
+        await database.disconnect()
+
+    def p95(values: list[float]) -> float:
+        return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else (values or [0.0])[0]
+
+    return {
+        "profile": name,
+        "journal_mode": storage["journal_mode"],
+        "synchronous": storage["synchronous"],
+        "reads_per_s": len(stats["reads"]) / duration,
+        "writes_per_s": len(stats["writes"]) / duration,
+        "read_p95_ms": p95(stats["reads"]),
+        "write_p95_ms": p95(stats["writes"]),
+        "locked": stats["read_errors"] + stats["write_errors"],
+    }
+
+
+def run_profile(name: str, config: GenerateConfig, readers: int, writers: int, duration: float) -> dict:
+    """Кожен профіль - у своєму процесі і на своїй базі, щоб journal_mode файлу не переходив між прогонами."""
+    with tempfile.TemporaryDirectory() as tmp:
+        return asyncio.run(bench(name, Path(tmp) / "profile.db", config, readers, writers, duration))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=list(SQLITE_PROFILES), default=list(SQLITE_PROFILES))
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5.0, help="секунд навантаження на профіль")
+    args = parser.parse_args()
+
+    config = GenerateConfig(products=args.products, users=max(10, args.products), orders=args.orders)
+    context = multiprocessing.get_context("spawn")
+    print(f"{'profile':<12}{'journal':>9}{'sync':>8}{'reads/s':>10}{'writes/s':>10}"
+          f"{'read p95':>10}{'write p95':>11}{'locked':>8}")
+    for name in args.profiles:
+        with context.Pool(1) as pool:
+            row = pool.apply(run_profile, (name, config, args.readers, args.writers, args.duration))
+        print(f"{row['profile']:<12}{row['journal_mode']:>9}{row['synchronous']:>8}{row['reads_per_s']:>10.0f}"
+              f"{row['writes_per_s']:>10.0f}{row['read_p95_ms']:>10.2f}{row['write_p95_ms']:>11.2f}"
+              f"{row['locked']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
+import logging
 from typing import Union
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 
 from app.core.settings.db import DATABASE_URL, db
+from app.core.utils.cache import response_cache
+from app.core.utils.health import health_monitor
+from app.core.utils.metrics import PROMETHEUS_MEDIA_TYPE, MetricsMiddleware, pool_metrics, registry
+from app.core.utils.passwords import password_hasher
 from contextlib import asynccontextmanager
 from app.core.models.base import BaseModel
 
 
-from app.core.routers import products, users, brands, categories, orders, order_items
+from app.core.routers import products, users, brands, categories, orders, order_items, reports
+
+# Логер uvicorn, щоб звіт при старті потрапляв у той самий вивід, що й решта логів сервера
+logger = logging.getLogger("uvicorn.error")
 
 
 @asynccontextmanager
@@ -16,11 +25,18 @@ async def lifespan(_fastapi_app: FastAPI):
    await db.connect()
    async with db.engine.begin() as connection:
        await connection.run_sync(BaseModel.metadata.create_all)
+   storage = await db.storage_report()
+   if storage:
+       logger.info("SQLite storage: %s", ", ".join(f"{name}={value}" for name, value in storage.items()))
+   await health_monitor.start()
    yield
+   await health_monitor.stop()
+   password_hasher.close()
    await db.disconnect()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(products.router)
 app.include_router(users.router)
@@ -28,6 +44,7 @@ app.include_router(brands.router)
 app.include_router(categories.router)
 app.include_router(orders.router)
 app.include_router(order_items.router)
+app.include_router(reports.router)
 
 @app.get("/")
 def read_root():
@@ -40,8 +57,37 @@ def read_item(item_id: int, q: Union[str, None] = None):
 
 @app.get(path="/health", tags=["System"])
 async def health():
-   ok = await db.ping()
-   return {"status": "ok" if ok else "error"}
+   """Останній результат фонової проби - без звернення до БД. 503, якщо проба впала або застаріла."""
+   snapshot = health_monitor.snapshot()
+   return JSONResponse(snapshot, status_code=200 if snapshot["status"] == "ok" else 503)
+
+
+@app.get(path="/health/deep", tags=["System"])
+async def health_deep():
+   """Свіжа проба писача і читацького пулу - на вимогу, не для балансувальника."""
+   report = await health_monitor.deep_check()
+   return JSONResponse(report, status_code=200 if report["status"] == "ok" else 503)
+
+
+@app.get(path="/cache/stats", tags=["System"])
+async def cache_stats():
+   return response_cache.stats()
+
+
+@app.get(path="/metrics", tags=["System"], response_class=PlainTextResponse)
+async def metrics():
+   pools = db.pool_metrics() if db.engine else {}
+   return PlainTextResponse(registry.render(pool_metrics(pools)), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@app.get(path="/db/pool", tags=["System"])
+async def db_pool():
+   return db.pool_metrics()
+
+
+@app.get(path="/db/storage", tags=["System"])
+async def db_storage():
+   return await db.storage_report()
 
 if __name__ == '__main__':
     import uvicorn
@@ -10,9 +10,16 @@ from faker import Faker
 from app.core.models import BaseModel
 from main import app
 from app.core.settings.db import db
+from app.core.utils.cache import response_cache
+from app.core.utils.metrics import instrument_engine
+from app.core.utils.passwords import PasswordHashSettings, password_hasher
+from app.core.utils.query_budget import query_budget_settings
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
+# Тести перевіряють логіку хешування, а не його стійкість - мінімальна вартість
+password_hasher.configure(PasswordHashSettings(iterations=1_000))
+
 
 @pytest.fixture(scope="session")
 def faker():
@@ -23,6 +30,9 @@ def faker():
 @pytest_asyncio.fixture(loop_scope="session", scope="session")
 async def db_engine():
     engine = create_async_engine(TEST_DATABASE_URL, echo=False)
+    # Лічильник SQL-інструкцій на запит: перевищення @query_budget в тестах - помилка
+    instrument_engine(engine.sync_engine)
+    query_budget_settings.strict = True
     async with engine.begin() as conn:
         await conn.run_sync(BaseModel.metadata.create_all)
     yield engine
@@ -45,11 +55,18 @@ async def clear_db(db_session: AsyncSession):
 
 
 @pytest_asyncio.fixture(loop_scope="function")
-async def client(db_session) -> AsyncGenerator[AsyncClient, Any]:
+async def client(db_session, tmp_path, monkeypatch) -> AsyncGenerator[AsyncClient, Any]:
     async def override_get_session():
         yield db_session
 
-    app.dependency_overrides[db.get_session] = override_get_session
+    # Lifespan (create_all, профіль SQLite, проби здоров'я) - на тимчасовому файлі, а не на робочому ./test.db
+    monkeypatch.setattr(db, "url", f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+
+    # Читання і запис в тестах - одна сесія на in-memory engine
+    for dependency in (db.get_session, db.get_read_session, db.get_write_session):
+        app.dependency_overrides[dependency] = override_get_session
+    # clear_db чистить таблиці в обхід роутерів, тому кеш відповідей теж скидаємо
+    response_cache.clear()
 
     async with LifespanManager(app):
         async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
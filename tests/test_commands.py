@@ -0,0 +1,97 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.commands.generate_data import GenerateConfig, generate_data
+from app.core.commands.rebuild_sales_rollups import rebuild_sales
+from app.core.commands.reconcile_order_totals import reconcile_order_totals
+from app.core.models import Order, OrderItem, Product, SalesRollup
+
+
+@pytest.mark.asyncio
+async def test_reconcile_order_totals(client, db_engine, db_session, user_factory, product_factory):
+    user = await user_factory()
+    product = await product_factory(price=5.0)
+    order_ids = []
+    for quantity in (1, 2, 3):
+        order = (await client.post("/orders/", json={"user_id": user.id, "status": "new"})).json()
+        await client.post("/order_items/", json={
+            "order_id": order["id"], "product_id": product.id, "quantity": quantity
+        })
+        order_ids.append(order["id"])
+
+    # Псуємо суму одного замовлення в обхід API
+    await db_session.execute(update(Order).where(Order.id == order_ids[1]).values(total_amount=999))
+    await db_session.commit()
+
+    session_maker = async_sessionmaker(db_engine, expire_on_commit=False, class_=AsyncSession)
+
+    dry = await reconcile_order_totals(session_maker, chunk_size=2, dry_run=True)
+    assert dry.checked == 3
+    assert [(d.order_id, d.stored, d.actual) for d in dry.drifts] == [(order_ids[1], 999.0, 10.0)]
+
+    fixed = await reconcile_order_totals(session_maker, chunk_size=2)
+    assert len(fixed.drifts) == 1
+
+    again = await reconcile_order_totals(session_maker, chunk_size=2, dry_run=True)
+    assert again.drifts == []
+
+
+@pytest.mark.asyncio
+async def test_generate_data(client, db_engine, db_session):
+    config = GenerateConfig(categories=3, brands=5, products=50, users=20, orders=300, batch_size=64)
+    report = await generate_data(db_engine, config)
+    assert {name: report.rows[name] for name in ("categories", "brands", "products", "users", "orders")} == {
+        "categories": 3, "brands": 5, "products": 50, "users": 20, "orders": 300
+    }
+    assert report.rows["order_items"] >= 300
+
+    # Кожне замовлення має позиції, а суми збігаються з ними
+    empty = await db_session.scalar(select(func.count()).select_from(Order).where(~Order.items.any()))
+    assert empty == 0
+    session_maker = async_sessionmaker(db_engine, expire_on_commit=False, class_=AsyncSession)
+    assert (await reconcile_order_totals(session_maker, dry_run=True)).drifts == []
+
+    # Нові товари потрапили в повнотекстовий індекс
+    found = await client.get("/products/search", params={"q": "category", "limit": 100})
+    assert len(found.json()) == 50
+
+    # Повторний запуск дописує дані після наявних id і дає той самий розподіл
+    again = await generate_data(db_engine, config)
+    assert again.rows["order_items"] == report.rows["order_items"]
+    assert await db_session.scalar(select(func.max(Order.id))) == 600
+
+
+@pytest.mark.asyncio
+async def test_rebuild_sales_rollups(client, db_engine, db_session):
+    await generate_data(db_engine, GenerateConfig(categories=3, brands=4, products=30, users=10, orders=200))
+    session_maker = async_sessionmaker(db_engine, expire_on_commit=False, class_=AsyncSession)
+
+    report = await rebuild_sales(session_maker, days_per_chunk=3)
+    assert report.chunks == -(-((report.date_to - report.date_from).days + 1) // 3)
+    assert report.rows == await db_session.scalar(select(func.count()).select_from(SalesRollup))
+
+    # Зведення по категоріях збігається з агрегатом по всіх позиціях
+    expected = (await db_session.execute(
+        select(Product.category_id, func.sum(OrderItem.quantity),
+               func.round(func.sum(OrderItem.quantity * OrderItem.unit_price), 2))
+        .join(Product, Product.id == OrderItem.product_id)
+        .group_by(Product.category_id)
+    )).all()
+    params = {"by": "category", "granularity": "total", "date_from": str(report.date_from),
+              "date_to": str(report.date_to)}
+    rows = (await client.get("/reports/sales", params=params)).json()
+    assert sorted((row["id"], row["units"], row["revenue"]) for row in rows) == sorted(
+        (category_id, units, float(revenue)) for category_id, units, revenue in expected
+    )
+
+    # Повторний перерахунок ідемпотентний і прибирає зіпсовані та зайві рядки
+    await db_session.execute(update(SalesRollup).values(units=0))
+    db_session.add(SalesRollup(dimension="brand", key_id=1, day=date(2000, 1, 1), units=1, revenue=1))
+    await db_session.commit()
+    again = await rebuild_sales(session_maker, days_per_chunk=7)
+    assert again.rows == report.rows
+    assert (await client.get("/reports/sales", params=params)).json() == rows
+    assert await db_session.scalar(select(func.min(SalesRollup.day))) == report.date_from
@@ -1,5 +1,31 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
 import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from app.core.commands.generate_data import GenerateConfig, generate_data
+from app.core.models import BaseModel, Order, Product, User
+from app.core.routers import users as users_router
 from app.core.schemas.products import ProductResponseSchema
+from app.core.settings.db import Database, GroupCommitSettings, GroupCommitter, db, sqlite_profile_from_env
+from app.core.settings.pool import PoolSettings, pool_settings_from_env
+from app.core.utils import metrics, passwords
+from app.core.utils.cache import CachedResponse, LRUCache, response_cache, serialize
+from app.core.utils.health import HealthMonitor, HealthSettings, ProbeResult, health_monitor
+from app.core.utils.metrics import DB_STATEMENTS, registry
+from app.core.utils.pagination import encode_cursor
+from app.core.utils.passwords import PasswordHasher, PasswordHashingBusy, PasswordHashSettings, password_hasher
+from app.core.utils.query_budget import QueryBudgetExceeded, query_budget_settings
+from main import app
 
 
 @pytest.fixture()
@@ -195,6 +221,248 @@ async def test_get_product(client, product_factory):
     assert data["price"] == product.price
 
 
+@pytest.mark.asyncio
+async def test_get_products_keyset_pagination(client, product_factory):
+    products = [await product_factory() for _ in range(3)]
+
+    first = await client.get("/products/", params={"limit": 2})
+    assert first.status_code == 200
+    assert [p["id"] for p in first.json()] == [p.id for p in products[:2]]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = await client.get("/products/", params={"limit": 2, "after": cursor})
+    assert second.status_code == 200
+    assert [p["id"] for p in second.json()] == [products[2].id]
+    # Остання сторінка - курсора немає
+    assert "X-Next-Cursor" not in second.headers
+
+
+@pytest.mark.asyncio
+async def test_get_products_filter_and_sort(client, product_factory, category_factory, brand_factory):
+    shoes = await category_factory()
+    nike = await brand_factory()
+    cheap = await product_factory(price=50.0, category_id=shoes.id, brand_id=nike.id)
+    mid = await product_factory(price=120.0, category_id=shoes.id, brand_id=nike.id)
+    await product_factory(price=140.0, category_id=shoes.id, brand_id=nike.id, in_stock=False)
+    pricey = await product_factory(price=200.0, category_id=shoes.id, brand_id=nike.id)
+    await product_factory(price=99.0)  # інший бренд і категорія
+    cheap_id, mid_id, pricey_id = cheap.id, mid.id, pricey.id
+
+    params = {"brand_id": nike.id, "in_stock": True, "max_price": 150, "sort": "-price", "limit": 1}
+    first = await client.get("/products/", params=params)
+    assert first.status_code == 200
+    assert [p["id"] for p in first.json()] == [mid_id]
+
+    second = await client.get("/products/", params={**params, "after": first.headers["X-Next-Cursor"]})
+    assert [p["id"] for p in second.json()] == [cheap_id]
+    assert "X-Next-Cursor" not in second.headers
+
+    # Товар, якого не було на закешованій сторінці, після здешевлення має на неї потрапити
+    full_page = {**params, "limit": 10}
+    assert [p["id"] for p in (await client.get("/products/", params=full_page)).json()] == [mid_id, cheap_id]
+    await client.patch(f"/products/{pricey_id}", json={"price": 130.0})
+    refreshed = await client.get("/products/", params=full_page)
+    assert [p["id"] for p in refreshed.json()] == [pricey_id, mid_id, cheap_id]
+
+
+@pytest.mark.asyncio
+async def test_get_products_matches_orm_serialization(client, db_session, product_factory):
+    await product_factory(description=None)
+    await product_factory(price=19.99)
+    product_id = (await product_factory(name='Кросівки "Samba" \\ 43')).id
+
+    # Швидкий шлях (Core-рядки) віддає ті самі байти, що й схема над ORM-об'єктами
+    query = select(Product).options(selectinload(Product.category), selectinload(Product.brand))
+    products = list((await db_session.execute(query.order_by(Product.id))).scalars())
+    assert (await client.get("/products/")).content == serialize(ProductResponseSchema, products)
+
+    product = next(p for p in products if p.id == product_id)
+    assert (await client.get(f"/products/{product_id}")).content == serialize(ProductResponseSchema, product)
+
+
+@pytest.mark.asyncio
+async def test_get_products_sparse_fields(client, product_factory):
+    products = [await product_factory(price=price) for price in (30.0, 10.0, 20.0)]
+    ids_by_price = [p.id for p in sorted(products, key=lambda p: p.price)]
+
+    # Ключ сортування (price) не запитаний, але пагінація все одно працює
+    params = {"fields": "name", "embed": "", "sort": "price", "limit": 2}
+    first = await client.get("/products/", params=params)
+    assert first.status_code == 200
+    assert [set(p) for p in first.json()] == [{"id", "name"}] * 2
+    second = await client.get("/products/", params={**params, "after": first.headers["X-Next-Cursor"]})
+    assert [p["id"] for p in first.json() + second.json()] == ids_by_price
+
+    etag = first.headers["ETag"]
+    response_cache.clear()
+    assert (await client.get("/products/", params=params, headers={"If-None-Match": etag})).status_code == 304
+
+    # Тільки бренд, без категорії
+    product = (await client.get(f"/products/{ids_by_price[0]}", params={"embed": "brand"})).json()
+    assert "brand" in product and "category" not in product
+    assert product["price"] == 10.0
+
+    # Повне представлення не змінилось
+    full = (await client.get(f"/products/{ids_by_price[0]}")).json()
+    assert {"category", "brand", "description", "in_stock"} <= set(full)
+
+
+@pytest.mark.asyncio
+async def test_get_products_unknown_field(client):
+    assert (await client.get("/products/", params={"fields": "id,password"})).status_code == 400
+    assert (await client.get("/products/", params={"embed": "orders"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_brands_without_products(client, product_factory):
+    product = await product_factory()
+    brand_id = product.brand_id
+
+    response = await client.get(f"/brands/{brand_id}", params={"embed": ""})
+    assert response.status_code == 200
+    assert "products" not in response.json()
+    etag = response.headers["ETag"]
+
+    # Склад товарів бренду не входить в таке представлення - ETag не змінюється
+    await product_factory(brand_id=brand_id)
+    response_cache.clear()
+    cached = await client.get(f"/brands/{brand_id}", params={"embed": ""}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_get_users_sparse_fields(client, user_factory):
+    user = await user_factory()
+    response = await client.get(f"/users/{user.id}", params={"fields": "email", "embed": ""})
+    assert response.status_code == 200
+    assert response.json() == {"id": user.id, "email": user.email}
+
+
+@pytest.mark.asyncio
+async def test_get_products_invalid_cursor(client):
+    response = await client.get("/products/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_products_non_scalar_cursor(client):
+    # Коректний base64 і JSON потрібної довжини, але значення - не скаляр
+    for values in ([{"a": 1}], [[1, 2]]):
+        for path in ("/products/", "/brands/", "/users/", "/orders/"):
+            response = await client.get(path, params={"after": encode_cursor(values)})
+            assert response.status_code == 400, (path, values)
+            assert response.json()["detail"] == "Invalid pagination cursor."
+
+
+@pytest.mark.asyncio
+async def test_get_product_cached_until_brand_changes(client, product_factory):
+    product = await product_factory()
+    product_id, brand_id = product.id, product.brand_id
+    before = (await client.get("/cache/stats")).json()
+
+    first = await client.get(f"/products/{product_id}")
+    assert first.headers["X-Cache"] == "MISS"
+    second = await client.get(f"/products/{product_id}")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+    # PATCH бренду має викинути з кешу товари, в які він вбудований
+    await client.patch(f"/brands/{brand_id}", json={"name": "Renamed Brand"})
+    third = await client.get(f"/products/{product_id}")
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json()["brand"]["name"] == "Renamed Brand"
+
+    stats = (await client.get("/cache/stats")).json()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
+
+
+def test_cache_skips_responses_invalidated_during_query():
+    cache = LRUCache()
+    value = CachedResponse(body=b"{}")
+    # GET взяв покоління, прочитав старий знімок, а запис тим часом інвалідував тег
+    generation = cache.generation()
+    cache.invalidate("product:1")
+    cache.set("/products/1?", value, {"product:1", "brand:2"}, since=generation)
+    cache.set("/products/2?", value, {"product:2", "brand:2"}, since=generation)
+    assert cache.get("/products/1?") is None
+    assert cache.get("/products/2?") is value
+    assert cache.stats()["stale_skips"] == 1
+
+    generation = cache.generation()
+    cache.clear()
+    cache.set("/products/2?", value, {"product:2"}, since=generation)
+    assert cache.get("/products/2?") is None
+    cache.set("/products/2?", value, {"product:2"}, since=cache.generation())
+    assert cache.get("/products/2?") is value
+
+
+@pytest.mark.asyncio
+async def test_get_product_etag(client, product_factory):
+    product = await product_factory()
+    product_id = product.id
+
+    first = await client.get(f"/products/{product_id}")
+    etag = first.headers["ETag"]
+
+    cached = await client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    # Без кешу відповідь 304 дає легкий запит версій
+    response_cache.clear()
+    uncached = await client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert uncached.status_code == 304
+
+    await client.patch(f"/products/{product_id}", json={"price": 1.5})
+    changed = await client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_get_products_collection_etag(client, product_factory):
+    await product_factory()
+    etag = (await client.get("/products/")).headers["ETag"]
+
+    response_cache.clear()
+    assert (await client.get("/products/", headers={"If-None-Match": etag})).status_code == 304
+
+    await product_factory()
+    response_cache.clear()
+    assert (await client.get("/products/", headers={"If-None-Match": etag})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_search_products(client, product_factory, brand_factory):
+    brand = await brand_factory(name="Nike")
+    air = await product_factory(name="Air Max 90", description="Classic running shoe", brand_id=brand.id)
+    pegasus = await product_factory(name="Pegasus 40", description="Daily trainer", brand_id=brand.id)
+    await product_factory(name="Ultraboost", description="Running shoe")
+    air_id, pegasus_id = air.id, pegasus.id
+
+    # Префіксний пошук по назві
+    response = await client.get("/products/search", params={"q": "peg"})
+    assert [p["id"] for p in response.json()] == [pegasus_id]
+
+    # Назва бренду теж індексується; слова поєднуються через AND
+    response = await client.get("/products/search", params={"q": "nike run"})
+    assert [p["id"] for p in response.json()] == [air_id]
+
+    # Перейменування бренду підхоплюється тригером
+    await client.patch(f"/brands/{brand.id}", json={"name": "Swoosh"})
+    response = await client.get("/products/search", params={"q": "swoosh", "limit": 1})
+    assert len(response.json()) == 1
+    rest = await client.get("/products/search", params={
+        "q": "swoosh", "limit": 1, "after": response.headers["X-Next-Cursor"]
+    })
+    assert {response.json()[0]["id"], rest.json()[0]["id"]} == {air_id, pegasus_id}
+
+    await client.delete(f"/products/{pegasus_id}")
+    response = await client.get("/products/search", params={"q": "pegasus"})
+    assert response.json() == []
+
+
 @pytest.mark.asyncio
 async def test_update_product_patch(client, product_factory):
     product = await product_factory()
@@ -207,6 +475,40 @@ async def test_update_product_patch(client, product_factory):
     assert data["in_stock"] is False
 
 
+@pytest.mark.asyncio
+async def test_batch_products(client, db_session, product_factory, category_factory, brand_factory):
+    category = await category_factory()
+    brand = await brand_factory()
+    keep = await product_factory(name="Keep", category_id=category.id, brand_id=brand.id)
+    gone = await product_factory(name="Gone", category_id=category.id, brand_id=brand.id)
+    other = await product_factory(name="Other", price=5.0, category_id=category.id, brand_id=brand.id)
+    keep_id, gone_id, other_id = keep.id, gone.id, other.id
+    new_product = {"name": "Fresh", "price": 10, "category_id": category.id, "brand_id": brand.id}
+
+    response = await client.post("/products/batch", json={
+        "create": [
+            new_product,
+            {**new_product, "name": "Keep"},  # назва вже зайнята
+            {**new_product, "name": "Gone"},  # звільняється видаленням в цьому ж батчі
+        ],
+        "update": [
+            {"id": keep_id, "price": 77.5}, {"id": 999999, "price": 1},
+            {"id": other_id, "name": None},  # NOT NULL - помилка елемента, а не 409 на весь батч
+            {"id": other_id, "price": 1}, {"id": other_id, "price": 2},  # той самий id двічі
+        ],
+        "delete": [gone_id],
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data["create"]] == ["created", "conflict", "created"]
+    assert [r["status"] for r in data["update"]] == ["updated", "not_found", "invalid", "invalid", "invalid"]
+    assert data["update"][2]["detail"] == "Fields name cannot be null."
+    assert [r["status"] for r in data["delete"]] == ["deleted"]
+
+    rows = dict((await db_session.execute(select(Product.name, Product.price))).all())
+    assert rows == {"Keep": 77.5, "Fresh": 10.0, "Gone": 10.0, "Other": 5.0}
+
+
 @pytest.mark.asyncio
 async def test_delete_product(client, product_factory):
     product = await product_factory()
@@ -245,6 +547,35 @@ async def test_get_orders(client, user_factory):
     assert len(response.json()) >= 1
 
 
+@pytest.mark.asyncio
+async def test_get_orders_ndjson_stream(client, user_factory):
+    user = await user_factory()
+    for _ in range(3):
+        await client.post("/orders/", json={"user_id": user.id, "status": "new"})
+
+    response = await client.get("/orders/", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert all(line["user"]["id"] == user.id for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_get_order_etag_changes_with_items(client, user_factory, product_factory):
+    user = await user_factory()
+    product = await product_factory()
+    order_id = (await client.post("/orders/", json={"user_id": user.id, "status": "new"})).json()["id"]
+
+    etag = (await client.get(f"/orders/{order_id}")).headers["ETag"]
+    not_modified = await client.get(f"/orders/{order_id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    await client.post("/order_items/", json={"order_id": order_id, "product_id": product.id, "quantity": 1})
+    modified = await client.get(f"/orders/{order_id}", headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+
+
 @pytest.mark.asyncio
 async def test_patch_order(client, user_factory):
     user = await user_factory()
@@ -258,6 +589,39 @@ async def test_patch_order(client, user_factory):
     assert response.json()["status"] == "shipped"
 
 
+@pytest.mark.asyncio
+async def test_checkout(client, user_factory, product_factory):
+    user = await user_factory()
+    first = await product_factory(price=100.0)
+    second = await product_factory(price=12.5)
+
+    response = await client.post("/orders/checkout", json={
+        "user_id": user.id,
+        "shipping_address": "Kyiv, Street 1",
+        "items": [
+            {"product_id": first.id, "quantity": 1},
+            {"product_id": second.id, "quantity": 3},
+        ],
+    })
+    assert response.status_code == 201
+    data = response.json()
+    assert data["status"] == "new"
+    assert data["user"]["id"] == user.id
+    assert data["total_amount"] == 137.5
+    assert sorted((i["product_id"], i["quantity"], i["unit_price"]) for i in data["items"]) == sorted([
+        (first.id, 1, 100.0), (second.id, 3, 12.5)
+    ])
+
+
+@pytest.mark.asyncio
+async def test_checkout_unknown_product(client, user_factory):
+    user = await user_factory()
+    response = await client.post("/orders/checkout", json={
+        "user_id": user.id, "items": [{"product_id": 999999, "quantity": 1}]
+    })
+    assert response.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_delete_order(client, user_factory):
     user = await user_factory()
@@ -331,4 +695,553 @@ async def test_delete_order_item(client, user_factory, product_factory):
 
     # Видалення
     response = await client.delete(f"/order_items/{item_id}")
-    assert response.status_code == 204
\ No newline at end of file
+    assert response.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_order_total_follows_item_writes(client, user_factory, product_factory):
+    user = await user_factory()
+    product = await product_factory(price=10.25)
+    order_resp = await client.post("/orders/", json={"user_id": user.id, "status": "new"})
+    order_id = order_resp.json()["id"]
+
+    item_resp = await client.post("/order_items/", json={
+        "order_id": order_id, "product_id": product.id, "quantity": 2
+    })
+    assert item_resp.json()["order"]["total_amount"] == 20.5
+    item_id = item_resp.json()["id"]
+
+    patch_resp = await client.patch(f"/order_items/{item_id}", json={"quantity": 3})
+    assert patch_resp.json()["order"]["total_amount"] == 30.75
+
+    await client.delete(f"/order_items/{item_id}")
+    order = await client.get(f"/orders/{order_id}")
+    assert order.json()["total_amount"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_create_order_item_unknown_order(client, product_factory):
+    product = await product_factory()
+    response = await client.post("/order_items/", json={
+        "order_id": 999999, "product_id": product.id, "quantity": 1
+    })
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_db_storage_profile(client, monkeypatch):
+    # Lifespan підключає робочий engine з профілем production
+    storage = (await client.get("/db/storage")).json()
+    assert storage["journal_mode"] == "WAL"
+    assert storage["synchronous"] == "NORMAL"
+    assert storage["foreign_keys"] == 1
+    assert storage["busy_timeout"] == 5000
+
+    monkeypatch.setenv("SQLITE_PROFILE", "legacy")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT", "250")
+    monkeypatch.setenv("SQLITE_FOREIGN_KEYS", "on")
+    profile = sqlite_profile_from_env()
+    assert (profile.journal_mode, profile.busy_timeout, profile.foreign_keys) == ("DELETE", 250, True)
+
+    monkeypatch.setenv("SQLITE_PROFILE", "turbo")
+    with pytest.raises(ValueError):
+        sqlite_profile_from_env()
+
+
+@pytest.mark.asyncio
+async def test_create_all_adds_version_to_legacy_tables(tmp_path):
+    # База, створена до колонки version: create_all у lifespan має її дописати
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    await database.connect()
+    try:
+        async with database.engine.begin() as conn:
+            await conn.exec_driver_sql("CREATE TABLE brands (id INTEGER PRIMARY KEY, name VARCHAR(50))")
+            await conn.exec_driver_sql("INSERT INTO brands (name) VALUES ('Legacy')")
+        for _ in range(2):
+            async with database.engine.begin() as conn:
+                await conn.run_sync(BaseModel.metadata.create_all)
+        async with database.read_session_maker() as session:
+            assert (await session.execute(text("SELECT name, version FROM brands"))).all() == [("Legacy", 0)]
+            assert (await session.execute(text("SELECT count(version) FROM products"))).scalar() == 0
+    finally:
+        await database.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_create_all_adds_indexes_to_legacy_tables(tmp_path):
+    # Таблиці з базової схеми ./test.db: індекси, додані в моделі пізніше, має дописати create_all
+    path = tmp_path / "legacy.db"
+    path.write_bytes((Path(__file__).parent.parent / "test.db").read_bytes())
+    database = Database(f"sqlite+aiosqlite:///{path}")
+    await database.connect()
+    try:
+        for _ in range(2):
+            async with database.engine.begin() as conn:
+                await conn.run_sync(BaseModel.metadata.create_all)
+        async with database.read_session_maker() as session:
+            indexes = set((await session.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index'")
+            )).scalars())
+            plan = (await session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM products WHERE category_id = 1 AND in_stock = 1 ORDER BY price"
+            ))).all()
+            orders_plan = (await session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM orders WHERE user_id = 1 ORDER BY order_date DESC, id DESC"
+            ))).all()
+    finally:
+        await database.disconnect()
+    assert {"ix_products_category_stock_price", "ix_products_brand_price", "ix_products_price"} <= indexes
+    assert "ix_order_items_order_id" in indexes
+    assert "ix_orders_order_date" in indexes
+    # Історія замовлень користувача - seek по індексу без сортування всієї таблиці
+    assert "ix_orders_user_order_date" in " ".join(row[-1] for row in orders_plan)
+    assert "ix_products_category_stock_price" in " ".join(row[-1] for row in plan)
+
+
+def _dependency_calls(dependant) -> set:
+    calls = set()
+    for dependency in dependant.dependencies:
+        calls.add(dependency.call)
+        calls |= _dependency_calls(dependency)
+    return calls
+
+
+def test_routes_pick_session_by_method():
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        calls = _dependency_calls(route.dependant)
+        if db.get_session in calls:
+            pytest.fail(f"{route.path} uses the generic session")
+        if route.methods == {"GET"}:
+            assert db.get_write_session not in calls, route.path
+        elif db.get_read_session in calls:
+            pytest.fail(f"{sorted(route.methods)} {route.path} writes through the read-only pool")
+
+
+@pytest.mark.asyncio
+async def test_read_engine_is_read_only(client):
+    # Lifespan підключає робочий файловий engine: один писач і окремий пул читачів
+    assert db.read_engine is not db.engine
+    assert db.engine.pool.size() == 1
+    async with db.read_session_maker() as session:
+        assert (await session.execute(text("PRAGMA query_only"))).scalar() == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            await session.execute(text("INSERT INTO categories (name) VALUES ('ro')"))
+
+
+@pytest.mark.asyncio
+async def test_group_commit(client, db_engine, user_factory, product_factory, monkeypatch):
+    user = await user_factory()
+    product = await product_factory(price=5.0)
+    user_id, product_id = user.id, product.id
+
+    session_maker = async_sessionmaker(db_engine, expire_on_commit=False, class_=AsyncSession)
+    committer = GroupCommitter(session_maker, GroupCommitSettings(max_delay=0.05, max_batch=16))
+    monkeypatch.setattr(db, "committer", committer)
+    try:
+        # Паралельні запити потрапляють в одну транзакцію
+        responses = await asyncio.gather(*(
+            client.post("/orders/", json={"user_id": user_id, "status": "new"}) for _ in range(10)
+        ))
+        assert [r.status_code for r in responses] == [201] * 10
+        assert len({r.json()["id"] for r in responses}) == 10
+        assert committer.units == 10
+        assert committer.batches == 1
+
+        # Помилка однієї одиниці не відкочує сусідні
+        order_id = responses[0].json()["id"]
+        items = await asyncio.gather(*(
+            client.post("/order_items/", json={"order_id": order_id, "product_id": pid, "quantity": 2})
+            for pid in (product_id, product_id + 1000, product_id)
+        ))
+        assert [r.status_code for r in items] == [201, 404, 201]
+        assert items[2].json()["order"]["total_amount"] == 20.0
+    finally:
+        await committer.close()
+
+    order = (await client.get(f"/orders/{order_id}")).json()
+    assert order["total_amount"] == 20.0
+    assert len(order["items"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_db_pool_metrics(client):
+    pools = (await client.get("/db/pool")).json()
+    assert pools["writer"]["size"] == 1
+    # Lifespan вже брав з'єднання писача (create_all, звіт профілю)
+    assert pools["writer"]["checkouts"] >= 1
+    assert sum(pools["writer"]["wait_ms"].values()) == pools["writer"]["checkouts"]
+    assert pools["reader"]["size"] == db.read_pool_size
+
+
+@pytest.mark.asyncio
+async def test_db_pool_timeout(tmp_path):
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool=PoolSettings(timeout=0.05))
+    await database.connect()
+    try:
+        async with database.engine.connect():
+            assert database.pool_metrics()["writer"]["checked_out"] == 1
+            with pytest.raises(PoolTimeoutError):
+                async with database.engine.connect():
+                    pass
+        writer = database.pool_metrics()["writer"]
+        assert (writer["timeouts"], writer["checked_out"], writer["idle"]) == (1, 0, 1)
+    finally:
+        await database.disconnect()
+
+
+def test_pool_settings_from_env(monkeypatch):
+    assert pool_settings_from_env("postgresql+asyncpg://app@db/shop").recycle == 1800
+    assert pool_settings_from_env("sqlite+aiosqlite:///./shop.db").pre_ping is False
+
+    monkeypatch.setenv("DB_POOL_SIZE", "5")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "2.5")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "true")
+    settings = pool_settings_from_env("postgresql+asyncpg://app@db/shop")
+    assert (settings.size, settings.max_overflow, settings.timeout, settings.pre_ping) == (5, 20, 2.5, True)
+
+
+def _samples(text_body: str) -> dict[str, float]:
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text_body.splitlines() if line and not line.startswith("#")
+    }
+
+
+@pytest.mark.asyncio
+async def test_metrics(client, product_factory):
+    product = await product_factory()
+    product_id = product.id
+    route_count = 'http_request_duration_seconds_count{method="GET",route="/products/{product_id}",status="200"}'
+    statements = 'db_statements_total{route="/products/{product_id}"}'
+
+    # Тестовий engine інструментований у conftest (db_engine)
+    before = _samples((await client.get("/metrics")).text)
+    for _ in range(2):
+        assert (await client.get(f"/products/{product_id}")).status_code == 200
+    await client.get("/no/such/path")
+    response = await client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = _samples(response.text)
+    assert after[route_count] - before.get(route_count, 0) == 2
+    # Запити з БД - лише в першому, другий віддається з кешу відповідей
+    assert after[statements] > before.get(statements, 0)
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}' in after
+    # Сам /metrics ще виконується під час збору
+    assert after["http_requests_in_flight"] == 1
+    assert 'db_pool_checked_out{pool="writer"}' in after
+
+
+def _server_timing(header: str) -> dict[str, float]:
+    return {
+        part.split(";")[0].strip(): float(part.split("dur=")[1].split(";")[0])
+        for part in header.split(",")
+    }
+
+
+@pytest.mark.asyncio
+async def test_server_timing(client, product_factory, monkeypatch, caplog):
+    for _ in range(3):
+        await product_factory()
+    response_cache.clear()
+
+    response = await client.get("/brands/?embed=products")
+    header = response.headers["server-timing"]
+    timing = _server_timing(header)
+    assert list(timing) == ["db", "orm", "validate", "encode", "total"]
+    # Сторінка брендів + selectinload товарів
+    assert 'db;dur=' in header and 'desc="2 statements"' in header
+    assert all(value > 0 for value in timing.values())
+    assert timing["db"] + timing["orm"] + timing["validate"] + timing["encode"] <= timing["total"]
+
+    # Відповідь з кешу - без БД і серіалізації
+    cached = _server_timing((await client.get("/brands/?embed=products")).headers["server-timing"])
+    assert cached["db"] == cached["orm"] == cached["validate"] == cached["encode"] == 0
+
+    monkeypatch.setattr(metrics.server_timing_settings, "header", False)
+    monkeypatch.setattr(metrics.server_timing_settings, "log", True)
+    with caplog.at_level(logging.INFO, logger="uvicorn.error"):
+        response = await client.get("/brands/")
+    assert "server-timing" not in response.headers
+    assert "Server-Timing GET /brands/ 200: db;dur=" in caplog.text
+
+
+# Всі GET-ендпоінти, включно з умовним запитом (ETag не збігається) і вкладеними зв'язками
+BUDGET_URLS = [
+    "/products/", "/products/1", "/products/?category_id=1&sort=price", "/products/search?q=category",
+    "/orders/", "/orders/1", "/order_items/", "/order_items/1", "/users/", "/users/1", "/users/1/orders",
+    "/brands/", "/brands/1", "/categories/", "/categories/1",
+    "/reports/sales?by=product&date_from=2000-01-01", "/reports/sales?by=brand&granularity=total",
+]
+
+
+@pytest.mark.asyncio
+async def test_query_budgets_do_not_grow_with_data(client, db_engine):
+    """Кількість інструкцій на запит однакова для 3 і 40 рядків на сторінці - N+1 тут не пройде."""
+    counts = {}
+    for size in (3, 40):
+        for table in reversed(BaseModel.metadata.sorted_tables):
+            async with db_engine.begin() as conn:
+                await conn.execute(table.delete())
+        await generate_data(db_engine, GenerateConfig(
+            categories=size, brands=size, products=size * 3, users=size, orders=size * 2, max_lines=4
+        ))
+        checkout = {"user_id": 1, "items": [{"product_id": i, "quantity": 1} for i in range(1, size + 1)]}
+        requests = [("GET", url, {"headers": {"If-None-Match": '"stale"'}}) for url in BUDGET_URLS]
+        requests.append(("POST", "/orders/checkout", {"json": checkout}))
+        for method, url, kwargs in requests:
+            response_cache.clear()
+            before = dict(DB_STATEMENTS.values)
+            # У тестах перевищення @query_budget - виняток з запиту (QUERY_BUDGET_STRICT)
+            response = await client.request(method, url, **kwargs)
+            assert response.status_code in (200, 201), url
+            counts.setdefault((method, url), []).append(
+                sum(value - before.get(labels, 0) for labels, value in DB_STATEMENTS.values.items())
+            )
+    assert {key: values for key, values in counts.items() if len(set(values)) > 1} == {}
+
+
+@pytest.mark.asyncio
+async def test_query_budget_exceeded(client, monkeypatch, caplog):
+    route = next(r for r in app.routes if getattr(r, "path", None) == "/users/" and "GET" in r.methods)
+    monkeypatch.setattr(route.endpoint, "query_budget", 0)
+    response_cache.clear()
+
+    with pytest.raises(QueryBudgetExceeded, match="GET /users/ ran 1 SQL statements, budget is 0"):
+        await client.get("/users/")
+
+    # Поза тестами - лише попередження в лозі
+    monkeypatch.setattr(query_budget_settings, "strict", False)
+    response_cache.clear()
+    assert (await client.get("/users/")).status_code == 200
+    assert "Query budget exceeded: GET /users/" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_health_is_cached(client, monkeypatch):
+    # Lifespan уже зробив першу пробу - /health її лише читає
+    before = health_monitor.last
+    statements = dict(DB_STATEMENTS.values)
+    response = await client.get("/health")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok"
+    assert body["probe_ms"] == before.latency_ms
+    assert body["loop_lag_ms"] >= 0
+    assert set(body["pools"]) == {"writer", "reader"}
+    assert body["pools"]["writer"]["size"] == 1
+    assert DB_STATEMENTS.values == statements
+
+    # Впала проба - 503 з причиною
+    monkeypatch.setattr(health_monitor, "last", ProbeResult(False, 1000.0, time.time(), "timed out after 1.0s"))
+    response = await client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["error"] == "timed out after 1.0s"
+
+    # Фонова задача зависла - результат застарів
+    monkeypatch.setattr(health_monitor, "last", ProbeResult(True, 1.0, time.time() - 3600))
+    assert (await client.get("/health")).json()["status"] == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_health_probe_timeout(tmp_path):
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'health.db'}", pool=PoolSettings(read_size=1))
+    await database.connect()
+    try:
+        monitor = HealthMonitor(database, HealthSettings(interval=0.01, timeout=0.05))
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        assert monitor.snapshot()["status"] == "ok"
+        await monitor.stop()
+
+        # Зайняте з'єднання - проба чекає на пул і падає по таймауту, не блокуючи /health
+        async with database.read_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            result = await monitor.probe_once()
+    finally:
+        await database.disconnect()
+    assert not result.ok
+    assert result.error == "timed out after 0.05s"
+
+
+@pytest.mark.asyncio
+async def test_health_deep(client):
+    response = await client.get("/health/deep")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok"
+    assert set(body["checks"]) == {"writer", "reader"}
+    assert all(check["ok"] for check in body["checks"].values())
+    assert body["storage"]["journal_mode"] == "WAL"
+
+
+@pytest.mark.asyncio
+async def test_sales_rollups_follow_order_items(client, user_factory, brand_factory, category_factory,
+                                                product_factory):
+    user = await user_factory()
+    brand, category = await brand_factory(), await category_factory()
+    shoe = await product_factory(price=10.0, brand_id=brand.id, category_id=category.id)
+    shirt = await product_factory(price=2.5, brand_id=brand.id)
+    shoe_id, shirt_id, brand_id, category_id = shoe.id, shirt.id, brand.id, category.id
+
+    order = (await client.post("/orders/", json={"user_id": user.id, "status": "new"})).json()
+    item = (await client.post("/order_items/", json={
+        "order_id": order["id"], "product_id": shoe_id, "quantity": 2
+    })).json()
+    await client.post("/order_items/", json={"order_id": order["id"], "product_id": shirt_id, "quantity": 4})
+    await client.patch(f"/order_items/{item['id']}", json={"quantity": 3})
+    await client.post("/orders/checkout", json={
+        "user_id": user.id, "items": [{"product_id": shoe_id, "quantity": 1}, {"product_id": shirt_id}]
+    })
+    removed = (await client.post("/order_items/", json={
+        "order_id": order["id"], "product_id": shirt_id, "quantity": 5
+    })).json()
+    assert (await client.delete(f"/order_items/{removed['id']}")).status_code == 204
+
+    day = order["order_date"][:10]
+    rows = (await client.get("/reports/sales", params={"by": "product", "date_from": day})).json()
+    assert rows == [
+        {"day": day, "id": shoe_id, "name": shoe.name, "units": 4, "revenue": 40.0},
+        {"day": day, "id": shirt_id, "name": shirt.name, "units": 5, "revenue": 12.5},
+    ]
+    by_brand = (await client.get("/reports/sales", params={"by": "brand", "granularity": "total"})).json()
+    assert [(row["id"], row["units"], row["revenue"]) for row in by_brand] == [(brand_id, 9, 52.5)]
+    by_category = (await client.get("/reports/sales", params={"by": "category", "id": category_id})).json()
+    assert [(row["units"], row["revenue"]) for row in by_category] == [(4, 40.0)]
+
+    # Порожній період і некоректний діапазон
+    assert (await client.get("/reports/sales", params={"date_to": "2000-01-01"})).json() == []
+    response = await client.get("/reports/sales", params={"date_from": "2000-01-02", "date_to": "2000-01-01"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_user_orders_paginated(client, db_session, user_factory):
+    user, other = await user_factory(), await user_factory()
+    user_id = user.id
+    # Замовлення через API (server_default, часто в ту саму секунду) і з явною датою - інший формат рядка в SQLite
+    created = [(await client.post("/orders/", json={"user_id": user_id, "status": "new"})).json() for _ in range(4)]
+    older = [
+        Order(user_id=user_id, status="old", total_amount=0, order_date=datetime(2020, 1, 1, 12)) for _ in range(3)
+    ]
+    db_session.add_all([*older, Order(user_id=other.id, status="new", total_amount=0)])
+    await db_session.commit()
+
+    # Користувач більше не тягне замовлення
+    assert "orders" not in (await client.get(f"/users/{user_id}")).json()
+
+    pages, after = [], None
+    while True:
+        params = {"limit": 3, **({"after": after} if after else {})}
+        response = await client.get(f"/users/{user_id}/orders", params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+    rows = [row for page in pages for row in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    # Новіші першими, однаковий час - за id; жоден рядок не загубився і не повторився
+    assert [row["id"] for row in rows] == (
+        sorted((order["id"] for order in created), reverse=True) + sorted((o.id for o in older), reverse=True)
+    )
+    assert rows[-1]["order_date"] == "2020-01-01T12:00:00"
+
+    assert (await client.get(f"/users/{other.id + 1000}/orders")).status_code == 404
+    assert (await client.get(f"/users/{other.id}/orders")).json()[0]["status"] == "new"
+
+
+@pytest.mark.asyncio
+async def test_user_passwords_are_hashed(client, db_session, user_payload, user_factory):
+    created = (await client.post("/users/", json=user_payload)).json()
+    stored = await db_session.scalar(select(User.password).where(User.id == created["id"]))
+    assert stored.startswith("pbkdf2_sha256$1000$") and user_payload["password"] not in stored
+
+    check = {"email": user_payload["email"], "password": user_payload["password"]}
+    assert (await client.post("/users/verify-password", json=check)).status_code == 204
+    assert (await client.post("/users/verify-password", json={**check, "password": "wrong"})).status_code == 401
+    unknown = {**check, "email": "nobody@example.com"}
+    assert (await client.post("/users/verify-password", json=unknown)).status_code == 401
+
+    await client.patch(f"/users/{created['id']}", json={"password": "another-secret"})
+    changed = {**check, "password": "another-secret"}
+    assert (await client.post("/users/verify-password", json=changed)).status_code == 204
+
+    # Пароль, записаний до хешування (фабрика пише напряму), перехешовується при першій перевірці
+    legacy = await user_factory(password="plain-password")
+    legacy_id = legacy.id
+    check = {"email": legacy.email, "password": "plain-password"}
+    assert (await client.post("/users/verify-password", json=check)).status_code == 204
+    db_session.expire_all()
+    assert (await db_session.scalar(select(User.password).where(User.id == legacy_id))).startswith("pbkdf2_sha256$")
+    assert (await client.post("/users/verify-password", json=check)).status_code == 204
+
+    # Зіпсований хеш у БД - невдала перевірка, а не 500
+    broken = await user_factory(password="pbkdf2_sha256$many$!!$??")
+    assert password_hasher.needs_rehash(broken.password)
+    check = {"email": broken.email, "password": "whatever-secret"}
+    assert (await client.post("/users/verify-password", json=check)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_update_missing_user_does_not_hash(client, user_payload, monkeypatch):
+    async def fail(password):
+        raise AssertionError("hashed a password for a missing user")
+
+    monkeypatch.setattr(users_router, "hash_password", fail)
+    assert (await client.put("/users/999999", json=user_payload)).status_code == 404
+    assert (await client.patch("/users/999999", json={"password": "another-secret"})).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_backpressure(client, user_payload, monkeypatch):
+    hasher = PasswordHasher(PasswordHashSettings(iterations=1_000, workers=1, max_queue=1))
+    monkeypatch.setattr(users_router, "password_hasher", hasher)
+    release = threading.Event()
+    monkeypatch.setattr(passwords, "hash_password_sync", lambda password, iterations: release.wait(5) and "hashed")
+
+    # Один хеш рахується, один чекає в черзі, третій - одразу 503
+    running = [asyncio.create_task(hasher.hash("x")) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    assert _samples(registry.render())["password_hash_queue_depth"] == 1
+    response = await client.post("/users/", json=user_payload)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+    release.set()
+    assert await asyncio.gather(*running) == ["hashed", "hashed"]
+    samples = _samples(registry.render())
+    assert samples["password_hash_in_flight"] == samples["password_hash_queue_depth"] == 0
+    assert samples["password_hash_rejected_total"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_counts_cancelled_jobs(monkeypatch):
+    hasher = PasswordHasher(PasswordHashSettings(iterations=1_000, workers=1, max_queue=1))
+    release = threading.Event()
+    monkeypatch.setattr(passwords, "hash_password_sync", lambda password, iterations: release.wait(5) and "hashed")
+    try:
+        # Запит скасовано (клієнт відключився), але хеш далі рахується в пулі і займає місце
+        abandoned = asyncio.create_task(hasher.hash("x"))
+        await asyncio.sleep(0.05)
+        abandoned.cancel()
+        await asyncio.gather(abandoned, return_exceptions=True)
+        assert hasher.pending == 1
+
+        queued = asyncio.create_task(hasher.hash("y"))
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHashingBusy):
+            await hasher.hash("z")
+
+        release.set()
+        assert await queued == "hashed"
+        await asyncio.sleep(0.05)
+        assert hasher.pending == 0
+    finally:
+        release.set()
+        hasher.close()
+    hasher.close()